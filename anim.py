@@ -0,0 +1,186 @@
+import os
+import time
+from PIL import Image, ImageOps
+
+import ui
+
+# Animations run from ui timers, between keys: a key that arrives mid-animation is read
+# first, and whatever the screen draws for it replaces the animation. Progress follows the
+# clock, so a slow frame skips ahead instead of stretching the animation.
+
+# ---------------- CONFIG ----------------
+FPS = float(os.environ.get("PAGER_FPS", "30"))  # 0 turns animations off
+SLIDE_TIME = 0.12       # selection bar and list scroll
+TRANSITION_TIME = 0.18  # screen push/pop
+
+FULL, REGION, FINAL_ONLY = 0, 1, 2  # quality levels, lowered when frames miss their budget
+_quality = {"level": FULL, "cost": 0.0}  # cost: moving average of seconds per frame
+_last_move = {"time": 0.0}  # time.monotonic() of the last list_move()
+
+def budget():
+    return 1.0 / FPS
+
+def enabled():
+    return FPS > 0 and _quality["level"] < FINAL_ONLY
+
+def _measure(cost):
+    """Track the frame cost and move between quality levels. Without animations the list
+    moves are still measured, so the level recovers when the load goes away."""
+    q = _quality
+    q["cost"] = cost if q["cost"] == 0 else 0.7 * q["cost"] + 0.3 * cost
+    if q["cost"] > budget():
+        q["level"] = min(q["level"] + 1, FINAL_ONLY)
+        q["cost"] = 0.0  # judge the new level on its own frames
+    elif q["cost"] < budget() / 2 and q["level"] > FULL:
+        q["level"] -= 1
+        q["cost"] = 0.0
+
+def _ease(t):
+    return 1 - (1 - t) ** 3
+
+# ---------------- ENGINE ----------------
+_running = None
+
+class Animation:
+    """Sends frame(t) for t going from 0 to 1 over duration seconds, then finish().
+    box is the part of the screen frame(t) changes; at the REGION level only box is sent.
+    Stops by itself as soon as something else becomes the current frame."""
+
+    def __init__(self, disp, duration, frame, finish, target, box=None):
+        self.disp = disp
+        self.duration = duration
+        self.frame = frame
+        self.finish = finish
+        self.target = target  # ui.current_image() while the animation is valid
+        self.box = box
+        self.start = None
+        self.timer = None
+
+    def run(self):
+        global _running
+        stop()
+        _running = self
+        self.start = time.monotonic()
+        self.timer = ui.call_later(budget(), self._step)  # frame(0) is what is on screen already
+
+    def _step(self):
+        self.timer = None
+        if ui.current_image() is not self.target:
+            self.stop()
+            return
+        if ui.asleep():
+            # No frames for a panel that is off: the last one goes out when it wakes
+            self.stop()
+            self.finish()
+            return
+        if ui.input_pending():
+            self.timer = ui.call_later(0, self._step)  # the key goes first
+            return
+        t = (time.monotonic() - self.start) / self.duration
+        began = time.perf_counter()
+        if t >= 1 or _quality["level"] == FINAL_ONLY:
+            self.stop()
+            self.finish()
+            _measure(time.perf_counter() - began)
+            return
+        box = self.box if _quality["level"] == REGION else None
+        ui.show(self.disp, self.frame(_ease(t)), box)
+        cost = time.perf_counter() - began
+        _measure(cost)
+        self.timer = ui.call_later(max(budget() - cost, 0), self._step)
+
+    def stop(self):
+        global _running
+        ui.cancel(self.timer)
+        self.timer = None
+        if _running is self:
+            _running = None
+
+def stop():
+    if _running is not None:
+        _running.stop()
+
+def finish():
+    """Jump the running animation to its last frame, e.g. before the screen is left."""
+    animation = _running
+    if animation is not None:
+        animation.stop()
+        if ui.current_image() is animation.target:
+            animation.finish()
+
+# ---------------- LIST MOVES ----------------
+def list_move(disp, render, old, new, top, row_height, rows, width=240):
+    """Present a list screen at new = (selected, scroll), sliding the selection bar from old
+    and scrolling the rows when scroll moved by one. render(selected, scroll) builds the
+    screen image, selected=-1 without a highlighted row."""
+    target = render(*new)
+    (old_sel, old_scroll), (new_sel, new_scroll) = old, new
+    shift = new_scroll - old_scroll
+    # Moves closer together than a slide (key repeat) jump to their target: a slide sends
+    # nothing for a budget() first, so each key would cut the last one off unseen
+    now = time.monotonic()
+    repeat = now - _last_move["time"] < SLIDE_TIME
+    _last_move["time"] = now
+    if not enabled() or old == new or abs(shift) > 1 or ui.asleep() or repeat:
+        began = time.perf_counter()
+        ui.present(disp, target)
+        if FPS > 0:
+            _measure(time.perf_counter() - began)
+        return
+    bottom = top + rows * row_height
+    box = (0, top, width, bottom)
+    old_plain = render(-1, old_scroll)
+    new_plain = render(-1, new_scroll) if shift else old_plain
+    y_old = top + (old_sel - old_scroll) * row_height
+    y_new = top + (new_sel - new_scroll) * row_height
+    if not shift:
+        box = (0, min(y_old, y_new), width, max(y_old, y_new) + row_height)
+
+    def frame(t):
+        image = target.copy()
+        if shift:
+            # Rows move by t of a row: the part of the old list still visible, then the new one
+            d = max(int(row_height * t), 1)
+            if shift > 0:  # the next row comes in at the bottom
+                image.paste(old_plain.crop((0, top + d, width, bottom)), (0, top))
+                image.paste(new_plain.crop((0, bottom - row_height, width, bottom - row_height + d)), (0, bottom - d))
+            else:
+                image.paste(old_plain.crop((0, top, width, bottom - d)), (0, top + d))
+                image.paste(new_plain.crop((0, top + row_height - d, width, top + row_height)), (0, top))
+        else:
+            image.paste(old_plain.crop(box), box[:2])
+        y = int(y_old + (y_new - y_old) * t)
+        bar = (0, y, width, min(y + row_height, bottom))
+        image.paste(ImageOps.invert(image.crop(bar)), bar[:2])  # white bar, black text
+        return image
+
+    ui.set_frame(disp, target)
+    Animation(disp, SLIDE_TIME, frame, ui.resend, target, box).run()
+
+# ---------------- SCREEN TRANSITIONS ----------------
+def transition_next(previous, direction):
+    """Slide the next frame in over previous, from the right for direction 1 (push) and
+    from the left for -1 (pop)."""
+    if previous is None or not enabled():
+        ui.expect_transition(None)
+        return
+
+    def start(disp, image, encoded):
+        if image is previous or not enabled():
+            return False
+        width = image.size[0]
+
+        def frame(t):
+            dx = int(width * t)
+            canvas = Image.new("RGB", image.size, "BLACK")
+            canvas.paste(previous, (-dx * direction, 0))
+            canvas.paste(image, ((width - dx) * direction, 0))
+            return canvas
+
+        Animation(disp, TRANSITION_TIME, frame, ui.resend, image).run()
+        return True
+
+    ui.expect_transition(start)
+
+def cancel_transition():
+    ui.expect_transition(None)
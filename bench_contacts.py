@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""Scaling numbers for the contact store on synthetic address books.
+
+For every size an address book is generated with gen_contacts.py (or taken
+from --file) in a scratch directory, then measured through the same module
+functions and screens the pager uses, so the numbers follow whatever store
+contactlist/contactdetails/addcontact implement:
+
+  load        contactlist.load_contacts() from the file (parse and sort), its peak
+              memory and what the loaded contacts keep
+  open        entering the Contacts screen until the first frame, and the
+              memory the screen keeps between visits
+  filter      per keystroke while typing and deleting a filter, until the screen
+              waits for the next key (its 50 ms pause per key included)
+  fuzzy       the same for a misspelt filter, ranked by the typo-tolerant tiers
+  lookup      contactdetails.load_contact() by nickname
+  reload      contactstore.reload() after a provisioning-style rewrite of the file
+              with --changes contacts inserted, renamed and deleted each
+  insert      the Finish key of Add Contact until the screen returned
+
+    python3 bench_contacts.py 1000 10000 100000
+    python3 bench_contacts.py --file big_contacts.json
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from PIL import ImageFont
+
+import ui
+import nav
+import gen_contacts
+import contactlist
+import contactdetails
+import contactstore
+from addcontact import add_contact
+from lib.virtualdisplay import VirtualDisplay
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf"
+
+
+def load_font():
+    try:
+        return ImageFont.truetype(FONT_PATH, 28)
+    except OSError:
+        return ImageFont.load_default()
+
+
+class TimedKeys:
+    """ui.key_source that hands out keys in order. A key counts as handled when the
+    screen asks for the next one; latency is measured from delivery to then."""
+
+    def __init__(self, keys):
+        self.keys = list(keys)
+        self.given = None
+        self.latencies = []  # (key, seconds)
+
+    def done(self):
+        if self.given is not None:
+            self.latencies.append((self.given[0], time.perf_counter() - self.given[1]))
+            self.given = None
+
+    def __call__(self, timeout):
+        self.done()
+        if not self.keys:
+            return "\x03"
+        key = self.keys.pop(0)
+        self.given = (key, time.perf_counter())
+        return key
+
+
+def run(screen, keys, *args):
+    script = TimedKeys(keys)
+    ui.key_source = script
+    screen(*args)
+    script.done()  # the last key may have closed the screen
+    return script.latencies
+
+
+def ms(seconds):
+    return seconds * 1000
+
+
+def peak_memory(fn):
+    """(peak, kept) bytes allocated by fn(), kept = still allocated afterwards."""
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    kept, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak, kept
+
+
+# ---------------- MEASUREMENTS ----------------
+def bench(filter_text, fuzzy_text, lookups, changes, font):
+    names = [c["nickname"] for c in contactlist.load_contacts()]
+    results = {"contacts": len(names)}
+
+    def cold_load():
+        contactstore.invalidate()
+        return contactlist.load_contacts()
+
+    start = time.perf_counter()
+    cold_load()
+    results["load ms"] = ms(time.perf_counter() - start)
+    peak, kept = peak_memory(cold_load)
+    results["load peak MB"] = peak / 1e6
+    results["contacts kept MB"] = kept / 1e6
+
+    disp = VirtualDisplay()
+
+    def open_screen():
+        contactstore.invalidate()
+        nav.invalidate(contactlist.SCREEN)
+        run(contactlist.menu_loop, ["\x03"], disp, font)
+        return nav.screen(contactlist.SCREEN).state
+
+    frames = len(disp.frame_times)
+    start = time.perf_counter()
+    open_screen()
+    results["open ms"] = ms(disp.frame_times[frames] - start)
+    nav.invalidate(contactlist.SCREEN)
+    results["open kept MB"] = peak_memory(open_screen)[1] / 1e6
+
+    keys = list(filter_text) + ["\x7f"] * len(filter_text)
+    latencies = run(contactlist.menu_loop, keys, disp, font)
+    filter_ms = [ms(t) for k, t in latencies]
+    results["filter key ms (median)"] = statistics.median(filter_ms)
+    results["filter key ms (max)"] = max(filter_ms)
+
+    keys = list(fuzzy_text) + ["\x7f"] * len(fuzzy_text)
+    fuzzy_ms = [ms(t) for k, t in run(contactlist.menu_loop, keys, disp, font)]
+    results["fuzzy key ms (median)"] = statistics.median(fuzzy_ms)
+    results["fuzzy key ms (max)"] = max(fuzzy_ms)
+
+    rng = random.Random(1)
+    samples = []
+    for name in rng.sample(names, min(lookups, len(names))):
+        start = time.perf_counter()
+        contact = contactdetails.load_contact(name)
+        samples.append(ms(time.perf_counter() - start))
+        assert contact is not None and contact["nickname"] == name
+    results["lookup ms"] = statistics.median(samples)
+
+    contacts = list(contactlist.load_contacts())
+    rng.shuffle(contacts)
+    del contacts[:changes]
+    for contact in contacts[:changes]:
+        contact["nickname"] += " Renamed"
+    contacts += [{"nickname": "Reload %d" % i, "address": gen_contacts.onion_address(rng)} for i in range(changes)]
+    with open("Contacts.json.tmp", "w") as f:
+        json.dump(contacts, f)
+    os.replace("Contacts.json.tmp", "Contacts.json")
+    start = time.perf_counter()
+    contactstore.reload()
+    results["reload ms"] = ms(time.perf_counter() - start)
+    assert len(contactlist.load_contacts()) == len(contacts)
+
+    address = gen_contacts.onion_address(rng)
+    keys = (list(address) + ["down", "\r"] + list("BenchInsert") + ["down", "\r"]
+            + list("12345") + ["down", "\r", "down", "\r"])
+    latencies = run(add_contact, keys, disp, font)
+    results["insert ms"] = ms(latencies[-1][1])
+    assert contactdetails.load_contact("BenchInsert") is not None
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sizes", type=int, nargs="*", default=[1000, 10000, 100000])
+    parser.add_argument("--file", action="append", default=[], help="measure this address book as well")
+    parser.add_argument("--filter", default="ada", help="filter text typed on the Contacts screen")
+    parser.add_argument("--fuzzy", default="jnesen", help="misspelt filter text typed on the Contacts screen")
+    parser.add_argument("--lookups", type=int, default=20)
+    parser.add_argument("--changes", type=int, default=10, help="contacts changed per kind for reload")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    ui.DIM_AFTER = 0
+    font = load_font()
+    workdir = tempfile.mkdtemp(prefix="pager-contacts-")
+    books = [(str(size), size) for size in args.sizes] + [(os.path.abspath(f), None) for f in args.file]
+    os.chdir(workdir)
+    rows = []
+    try:
+        for label, size in books:
+            if size is None:
+                shutil.copy(label, "Contacts.json")
+            else:
+                gen_contacts.write("Contacts.json", size, args.seed)
+            rows.append((label, bench(args.filter, args.fuzzy, args.lookups, args.changes, font)))
+            print(label, "done", file=sys.stderr)
+    finally:
+        os.chdir(HERE)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    fields = list(rows[0][1])
+    print("%-24s" % "" + "".join("%14s" % label for label, _ in rows))
+    for field in fields:
+        print("%-24s" % field + "".join("%14.1f" % r[field] if isinstance(r[field], float) else "%14d" % r[field]
+                                         for _, r in rows))
+
+
+if __name__ == "__main__":
+    main()
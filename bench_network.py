@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""Time the network screen against fake_nmcli.py instead of a real radio.
+
+Measures time-to-list (entering the Network screen until the SSID list is on
+screen), time-to-connect (Enter on a network until the result is shown) and
+cleanup_connections() with many stale profiles. With the cryptography
+package installed it also times a reconnect through the known-network
+cache. --check runs the behaviour checks first and stops on the first
+failure.
+
+    python3 bench_network.py --ssids 300 --scan-delay 0.8 --profiles 200 --workers 1 4 8
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from PIL import ImageFont
+
+import ui
+import anim
+import network
+import known_networks
+from lib.virtualdisplay import VirtualDisplay
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf"
+
+
+def load_font():
+    try:
+        return ImageFont.truetype(FONT_PATH, 28)
+    except OSError:
+        return ImageFont.load_default()
+
+
+class ScriptedKeys:
+    """Stands in for the terminal (ui.key_source). Hands out keys in order and remembers when."""
+
+    def __init__(self, keys):
+        self.keys = list(keys)
+        self.times = []
+
+    def __call__(self, timeout):
+        key = self.keys.pop(0) if self.keys else "left"
+        self.times.append(time.perf_counter())
+        return key
+
+
+def run_screen(keys):
+    """Run network_manager with scripted keys. Returns (display, keys, start time)."""
+    disp = VirtualDisplay(keep_frames=True)
+    script = ScriptedKeys(keys)
+    ui.key_source = script
+    start = time.perf_counter()
+    network.network_manager(disp, load_font())
+    return disp, script, start
+
+
+def reset_state(state_file, profiles):
+    if os.path.exists(state_file):
+        os.remove(state_file)
+    os.environ["FAKE_NMCLI_PROFILES"] = str(profiles)
+
+
+# ---------------- MEASUREMENTS ----------------
+def time_to_list():
+    disp, _, start = run_screen(["left"])
+    return disp.frame_times[0] - start
+
+
+def time_to_connect():
+    # Enter on the first entry ("Hotspot", open) then leave
+    disp, script, _ = run_screen(["\r", "left"])
+    return disp.frame_times[1] - script.times[0]
+
+
+def time_to_reconnect():
+    # Second entry ("Pager-Base", secured) is already known: one Enter, no password screen
+    disp, script, _ = run_screen(["down", "\r", "left"])
+    return disp.frame_times[2] - script.times[1]
+
+
+def learn_network(state_file, workdir):
+    """Unlock a scratch cache and connect to Pager-Base once so it becomes known."""
+    known_networks.KNOWN_NETWORKS_FILE = os.path.join(workdir, "known_networks.json")
+    known_networks.purge()
+    known_networks.unlock("123456")
+    network.REMEMBER_NETWORKS = True
+    run_screen(["down", "\r", "p", "w", "down", "\r", "left"])
+    return known_networks.lookup("Pager-Base") == "pw"
+
+
+def time_cleanup(state_file, profiles, workers):
+    reset_state(state_file, profiles)
+    network.CLEANUP_WORKERS = workers
+    start = time.perf_counter()
+    network.cleanup_connections()
+    return time.perf_counter() - start
+
+
+# ---------------- CHECKS ----------------
+def check(cond, msg):
+    if not cond:
+        print("FAIL:", msg)
+        sys.exit(1)
+    print("ok:  ", msg)
+
+
+def run_checks(state_file, ssids):
+    network._scan_cache["time"] = 0
+    nets = network.scan_wifi(max_age=0)
+    names = [n[0] for n in nets]
+    check(len(nets) == ssids, f"scan returns {ssids} SSIDs without the hidden entry")
+    check("net:000" in names, "escaped ':' inside an SSID survives parsing")
+    check(all(n[0].strip() for n in nets), "blank SSIDs are skipped")
+
+    check(network.connect_to("Hotspot"), "open network connects")
+    os.environ["FAKE_NMCLI_FAIL"] = "Pager-Base"
+    check(not network.connect_to("Pager-Base", "secret"), "failing connect reports failure")
+    del os.environ["FAKE_NMCLI_FAIL"]
+
+    reset_state(state_file, 25)
+    network.CLEANUP_WORKERS = 4
+    network.cleanup_connections()
+    check(sorted(network.get_connection_profiles()) == ["lo", "preconfigured"],
+          "parallel cleanup leaves only 'preconfigured' and 'lo'")
+
+    fps, anim.FPS = anim.FPS, 0  # count whole frames, not the slide in between
+    try:
+        disp, _, _ = run_screen(["down", "down", "left"])
+    finally:
+        anim.FPS = fps
+    check(len(disp.frame_times) == 3, "list screen draws once per key")
+
+    if known_networks.available():
+        check(learn_network(state_file, os.path.dirname(state_file)), "successful connect is remembered")
+        _, script, _ = run_screen(["down", "\r", "left"])
+        check(len(script.times) == 3, "known network reconnects without the password screen")
+        network.cleanup_connections()
+        check(known_networks.lookup("Pager-Base") == "pw", "cleanup keeps saved networks")
+        check("Pager-Base" in network.get_connection_profiles(), "cleanup keeps their profiles")
+        known_networks.lock()  # aborted login or a wrong passcode
+        network.cleanup_connections()
+        check("Pager-Base" in network.get_connection_profiles(), "cleanup while locked deletes no profile")
+        check(known_networks.unlock("123456") and known_networks.lookup("Pager-Base") == "pw",
+              "cleanup while locked keeps the cache")
+        network.cleanup_connections(forget=True)
+        check(known_networks.lookup("Pager-Base") is None, "forget purges the known-network cache")
+        check(not os.path.exists(known_networks.KNOWN_NETWORKS_FILE), "forget removes the cache file")
+        network.REMEMBER_NETWORKS = False
+
+
+def report(name, samples):
+    ms = [s * 1000 for s in samples]
+    print(f"{name:<28} median {statistics.median(ms):8.1f} ms   min {min(ms):8.1f}   max {max(ms):8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ssids", type=int, default=300)
+    parser.add_argument("--scan-delay", type=float, default=0.0)
+    parser.add_argument("--connect-delay", type=float, default=0.0)
+    parser.add_argument("--delete-delay", type=float, default=0.1, help="seconds a profile delete waits on NetworkManager")
+    parser.add_argument("--profiles", type=int, default=100, help="stale profiles for the cleanup run")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="CLEANUP_WORKERS values to compare")
+    parser.add_argument("--cache-ttl", type=float, default=0.0, help="network.SCAN_CACHE_TTL")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--up-delay", type=float, default=0.0, help="'connection up' latency")
+    parser.add_argument("--check", action="store_true", help="run behaviour checks before timing")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="fake_nmcli")
+    state_file = os.path.join(workdir, "state.json")
+    os.environ["FAKE_NMCLI_STATE"] = state_file
+    os.environ["FAKE_NMCLI_SSIDS"] = str(args.ssids)
+    os.environ["FAKE_NMCLI_SCAN_DELAY"] = str(args.scan_delay)
+    os.environ["FAKE_NMCLI_CONNECT_DELAY"] = str(args.connect_delay)
+    os.environ["FAKE_NMCLI_DELETE_DELAY"] = str(args.delete_delay)
+    os.environ["FAKE_NMCLI_UP_DELAY"] = str(args.up_delay)
+    network.NMCLI = os.path.join(HERE, "fake_nmcli.py")
+    network.SCAN_CACHE_TTL = args.cache_ttl
+
+    if args.check:
+        run_checks(state_file, args.ssids)
+
+    reset_state(state_file, 0)
+    network._scan_cache["time"] = 0
+    report("time-to-list", [time_to_list() for _ in range(args.runs)])
+    report("time-to-connect", [time_to_connect() for _ in range(args.runs)])
+    if known_networks.available() and learn_network(state_file, workdir):
+        report("time-to-reconnect (known)", [time_to_reconnect() for _ in range(args.runs)])
+        network.cleanup_connections(forget=True)
+        network.REMEMBER_NETWORKS = False
+    for workers in args.workers:
+        report(f"cleanup {args.profiles} profiles x{workers}",
+               [time_cleanup(state_file, args.profiles, workers) for _ in range(args.runs)])
+
+
+if __name__ == "__main__":
+    main()
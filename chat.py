@@ -0,0 +1,148 @@
+import time
+from PIL import Image, ImageDraw
+
+import ui
+from ui import get_key, present
+from chatstore import MessageLog
+from textlayout import wrap, text_width
+
+# ---------------- CONFIG ----------------
+# rotate(90) keeps the 240x280 canvas, so only rows 20..260 reach the panel
+SCREEN_TOP = 20
+SCREEN_BOTTOM = 260
+HEADER_BOTTOM = SCREEN_TOP + 38
+INPUT_TOP = SCREEN_BOTTOM - 36
+TEXT_SIZE = 18
+LINE_SPACING = 22
+MARGIN = 6
+POLL_INTERVAL = 0.25
+
+# ---------------- TRANSPORT ----------------
+class LoopbackTransport:
+    """Local transport for testing: every sent message comes back as a reply after `delay` seconds."""
+
+    def __init__(self, delay=1.0):
+        self.delay = delay
+        self.pending = []  # (deliver_at, address, text)
+
+    def send(self, address, text):
+        self.pending.append((time.monotonic() + self.delay, address, "echo: " + text))
+        return True
+
+    def poll(self):
+        """Incoming (address, text) pairs that arrived since the last poll."""
+        now = time.monotonic()
+        due = [p for p in self.pending if p[0] <= now]
+        self.pending = [p for p in self.pending if p[0] > now]
+        return [(address, text) for _, address, text in due]
+
+transport = LoopbackTransport()
+
+def set_transport(t):
+    """Replace the chat transport. It needs send(address, text) and poll() -> [(address, text)]."""
+    global transport
+    transport = t
+
+# ---------------- DRAW ----------------
+def draw_chat(disp, font, small, contact, log, bottom, draft):
+    """Draw the messages ending at index bottom. Only the messages that fit are read from the log."""
+    image = Image.new("RGB", (240, 280), "BLACK")
+    draw = ImageDraw.Draw(image)
+    width = 240 - 2 * MARGIN
+
+    w = text_width(font, contact["nickname"])
+    draw.text(((240 - w) // 2, SCREEN_TOP + 2), contact["nickname"], fill="WHITE", font=font)
+    draw.line([0, HEADER_BOTTOM - 2, 240, HEADER_BOTTOM - 2], fill="WHITE")
+
+    # Walk backwards from the newest visible message until the area is full
+    y = INPUT_TOP - 4
+    i = bottom
+    while i >= 0 and y > HEADER_BOTTOM:
+        msg = log.get(i)
+        mine = msg["from"] == "me"
+        for line in reversed(wrap(small, msg["text"], width - 20)):
+            y -= LINE_SPACING
+            if y < HEADER_BOTTOM:
+                break
+            x = 240 - MARGIN - text_width(small, line) if mine else MARGIN
+            draw.text((x, y), line, fill="WHITE" if mine else "GRAY", font=small)
+        y -= 4
+        i -= 1
+
+    if not len(log):
+        draw.text((MARGIN, HEADER_BOTTOM + 8), "No messages", fill="GRAY", font=small)
+
+    # Draft input, showing the end when it is too long
+    input_y = INPUT_TOP
+    draw.rectangle([0, input_y, 240, SCREEN_BOTTOM], fill="WHITE")
+    shown = draft
+    while shown and text_width(small, shown + "_") > width:
+        shown = shown[1:]
+    draw.text((MARGIN, input_y + 8), shown + "_" if draft else "Type a message", fill="BLACK", font=small)
+
+    present(disp, image)
+
+# ---------------- CHAT LOOP ----------------
+def chat_screen(disp, font, contact):
+    small = font.font_variant(size=TEXT_SIZE)
+    log = MessageLog(contact["address"])
+    bottom = len(log) - 1  # newest visible message
+    draft = ""
+    timer = None
+
+    def redraw():
+        draw_chat(disp, font, small, contact, log, bottom, draft)
+
+    def poll():
+        nonlocal bottom, timer
+        following = bottom == len(log) - 1
+        changed = False
+        for address, text in transport.poll():
+            if address == contact["address"]:
+                log.append("them", text)
+                changed = True
+            else:
+                MessageLog(address).append("them", text)
+        if changed:
+            if following:
+                bottom = len(log) - 1
+            if ui.asleep():
+                ui.on_wake(redraw)  # messages are logged, the screen is drawn when it wakes
+            else:
+                redraw()
+        timer = ui.call_later(POLL_INTERVAL, poll)
+
+    draw_chat(disp, font, small, contact, log, bottom, draft)
+    timer = ui.call_later(POLL_INTERVAL, poll)
+
+    while True:
+        key = get_key()
+        if key == "\x03":  # Ctrl+C
+            break
+        elif key in ("left", "\x1b"):
+            if not draft:
+                break
+            draft = ""
+        elif key == "up":
+            if bottom > 0:
+                bottom -= 1
+        elif key == "down":
+            if bottom < len(log) - 1:
+                bottom += 1
+        elif key == "\r":
+            if draft:
+                log.append("me", draft)
+                transport.send(contact["address"], draft)
+                draft = ""
+                bottom = len(log) - 1
+        elif key == "\x7f":  # backspace
+            draft = draft[:-1]
+        elif len(key) == 1 and key.isprintable():
+            draft += key
+        else:
+            continue
+
+        draw_chat(disp, font, small, contact, log, bottom, draft)
+
+    ui.cancel(timer)
+    ui.cancel_wake(redraw)
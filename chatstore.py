@@ -0,0 +1,90 @@
+import os
+import json
+import time
+import struct
+import hashlib
+from collections import OrderedDict
+
+import vault
+
+CHAT_DIR = "Chats"
+PAGE_SIZE = 16      # messages read from disk at once
+CACHED_PAGES = 8    # pages kept in memory per open log
+
+OFFSET = struct.Struct("<Q")
+
+def _decode(record):
+    if vault.is_token(record):
+        try:
+            record = vault.decrypt(record)
+        except ValueError:  # locked, or written under a destroyed key
+            return {"t": 0, "from": "them", "text": "(encrypted)"}
+    return json.loads(record)
+
+class MessageLog:
+    """Append-only message history of one contact.
+
+    <id>.log holds one JSON record per line, <id>.idx the byte offset of every
+    record as 8-byte integers. Message i is found with one seek into the index
+    and one into the log, so the size of the history does not matter. While the
+    vault is unlocked each record is written encrypted; records are decrypted a
+    page at a time, when the page is first shown."""
+
+    def __init__(self, address, directory=None):
+        directory = directory or CHAT_DIR
+        os.makedirs(directory, exist_ok=True)
+        name = hashlib.sha1(address.encode()).hexdigest()[:20]
+        self.log_path = os.path.join(directory, name + ".log")
+        self.idx_path = os.path.join(directory, name + ".idx")
+        self.count = os.path.getsize(self.idx_path) // OFFSET.size if os.path.exists(self.idx_path) else 0
+        self.pages = OrderedDict()
+
+    def __len__(self):
+        return self.count
+
+    # ---------------- WRITE ----------------
+    def append(self, sender, text):
+        """Add a message. sender is "me" or "them". Returns its index."""
+        record = json.dumps({"t": int(time.time()), "from": sender, "text": text}).encode()
+        if vault.is_unlocked():
+            record = vault.encrypt(record)
+        with open(self.log_path, "ab") as f:
+            offset = f.seek(0, os.SEEK_END)
+            f.write(record + b"\n")
+        with open(self.idx_path, "ab") as f:
+            f.write(OFFSET.pack(offset))
+        self.pages.pop(self.count // PAGE_SIZE, None)  # last page grew
+        self.count += 1
+        return self.count - 1
+
+    # ---------------- READ ----------------
+    def _offsets(self, start, stop):
+        with open(self.idx_path, "rb") as f:
+            f.seek(start * OFFSET.size)
+            data = f.read((stop - start) * OFFSET.size)
+        return [OFFSET.unpack_from(data, i)[0] for i in range(0, len(data), OFFSET.size)]
+
+    def _load_page(self, page):
+        start = page * PAGE_SIZE
+        stop = min(start + PAGE_SIZE, self.count)
+        offsets = self._offsets(start, min(stop + 1, self.count))  # plus the next page's start
+        with open(self.log_path, "rb") as f:
+            f.seek(offsets[0])
+            if stop < self.count:
+                data = f.read(offsets[-1] - offsets[0])
+            else:
+                data = f.read()
+        messages = [_decode(line) for line in data.splitlines() if line]
+        self.pages[page] = messages
+        while len(self.pages) > CACHED_PAGES:
+            self.pages.popitem(last=False)
+        return messages
+
+    def get(self, i):
+        page = i // PAGE_SIZE
+        messages = self.pages.get(page)
+        if messages is None:
+            messages = self._load_page(page)
+        else:
+            self.pages.move_to_end(page)
+        return messages[i - page * PAGE_SIZE]
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Run the framebuffer backend against a plain file standing in for /dev/fbN and check
+that every frame lands in it pixel for pixel, and that a region touches nothing else.
+
+The file gets the panel's layout, 240x280 little-endian RGB565 as fbtft and DRM's
+fbdev emulation use. Exits non-zero on the first mismatch. No hardware needed.
+
+    python3 check_fb.py
+"""
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+from PIL import Image
+
+from lib import rgb565
+from lib.fbdisplay import FramebufferDisplay
+
+
+def read_frame(path, disp):
+    """The file decoded back to RGB888, (height, width, 3)."""
+    with open(path, "rb") as f:
+        pixels = np.frombuffer(f.read(disp.width * disp.height * 2), dtype="<u2")
+    return rgb565.decode(pixels.astype(">u2").tobytes(), disp.width, disp.height)
+
+
+def expected(image):
+    """image as it comes back from RGB565."""
+    return rgb565.decode(rgb565.encode(np.asarray(image)).tobytes(), image.size[0], image.size[1])
+
+
+def st7789(image, madctl):
+    """The panel's portrait memory after image was sent with this MADCTL, as the ST7789
+    places it: MV exchanges rows and columns, then MX mirrors the columns, MY the rows."""
+    pixels = np.asarray(image)
+    if madctl & 0x20:
+        pixels = pixels.transpose(1, 0, 2)
+    if madctl & 0x40:
+        pixels = pixels[:, ::-1]
+    if madctl & 0x80:
+        pixels = pixels[::-1]
+    return Image.fromarray(np.ascontiguousarray(pixels))
+
+
+def check(name, ok, disp):
+    print("%-20s %s  frame_bytes=%d" % (name, "ok  " if ok else "FAIL", disp.frame_bytes))
+    return ok
+
+
+def main():
+    fd, path = tempfile.mkstemp(prefix="pager-fb-")
+    os.close(fd)
+    disp = FramebufferDisplay(path)
+    disp.Init()
+    frame = disp.width * disp.height * 2
+    portrait = Image.new("RGB", (disp.width, disp.height), "RED")
+    portrait.paste((10, 200, 90), (20, 30, 120, 90))
+    landscape = Image.new("RGB", (disp.height, disp.width), "BLUE")
+    landscape.paste((250, 200, 0), (0, 0, 40, 20))  # top left marker: any mirror or wrong turn moves it
+    region = Image.new("RGB", (40, 30), "GREEN")
+    try:
+        disp.ShowImage(portrait)
+        ok = check("ShowImage portrait", (read_frame(path, disp) == expected(portrait)).all()
+                   and disp.frame_bytes == frame, disp)
+        disp.ShowEncoded(disp.EncodeImage(portrait.transpose(Image.FLIP_LEFT_RIGHT)))
+        ok = ok and check("ShowEncoded", (read_frame(path, disp) == expected(portrait.transpose(Image.FLIP_LEFT_RIGHT))).all(), disp)
+        disp.ShowImage(portrait)
+        disp.ShowImageRegion(region, 10, 20)
+        want = portrait.copy()
+        want.paste(region, (10, 20))
+        ok = ok and check("ShowImageRegion", (read_frame(path, disp) == expected(want)).all()
+                          and disp.frame_bytes == 40 * 30 * 2, disp)
+        disp.ShowImage(landscape)
+        ok = ok and check("ShowImage landscape", (read_frame(path, disp) == expected(st7789(landscape, 0x70))).all(), disp)
+        disp.clear()
+        ok = ok and check("clear", (read_frame(path, disp) == [248, 252, 248]).all(), disp)
+        if not ok:
+            sys.exit(1)
+
+        n = 50
+        encoded = disp.EncodeImage(portrait)
+        for name, show in (("ShowImage", lambda: disp.ShowImage(portrait)),
+                           ("ShowEncoded", lambda: disp.ShowEncoded(encoded)),
+                           ("ShowImageRegion", lambda: disp.ShowImageRegion(region, 10, 20))):
+            start = time.perf_counter()
+            for _ in range(n):
+                show()
+            print("%-20s %.3f ms/frame driver time" % (name, (time.perf_counter() - start) * 1000 / n))
+    finally:
+        disp.module_exit()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
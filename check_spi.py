@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Run the real LCD_1inch69 driver against a virtual SPI device and check that every
+frame reaches the panel exactly once.
+
+The virtual device follows the DC line like the ST7789 does: bytes with DC low
+are commands, bytes with DC high are parameters or, after RAMWR (0x2C), pixel
+data. Each RAMWR must be followed by exactly the bytes of the window set with
+CASET/RASET, and the driver's frame_bytes must agree. Exits non-zero on the
+first mismatch. No hardware or spidev needed.
+
+    python3 check_spi.py
+"""
+import sys
+import time
+from PIL import Image
+
+from lib import LCD_1inch69
+
+CASET, RASET, RAMWR = 0x2A, 0x2B, 0x2C
+
+
+class VirtualSPI:
+    """Records the command stream and the pixel bytes of every RAMWR."""
+
+    def __init__(self):
+        self.dc = False
+        self.cmd = None
+        self.params = []
+        self.window = {}
+        self.writes = []        # [window_bytes, pixel_bytes] per RAMWR
+        self.max_speed_hz = 0
+        self.mode = 0
+
+    def _byte(self, b):
+        if not self.dc:
+            self.cmd = b
+            self.params = []
+            if b == RAMWR:
+                (x0, x1), (y0, y1) = self.window[CASET], self.window[RASET]
+                self.writes.append([(x1 - x0 + 1) * (y1 - y0 + 1) * 2, 0])
+            return
+        if self.cmd == RAMWR:
+            self.writes[-1][1] += 1
+            return
+        self.params.append(b)
+        if self.cmd in (CASET, RASET) and len(self.params) == 4:
+            p = self.params
+            self.window[self.cmd] = ((p[0] << 8) | p[1], (p[2] << 8) | p[3])
+
+    def writebytes(self, data):
+        for b in data:
+            self._byte(b)
+
+    def writebytes2(self, data):
+        data = bytes(data)
+        if self.dc and self.cmd == RAMWR:
+            self.writes[-1][1] += len(data)  # pixel data, no need to walk it byte by byte
+        else:
+            self.writebytes(data)
+
+    def close(self):
+        pass
+
+
+class VirtualLCD(LCD_1inch69.LCD_1inch69):
+    """The driver with its GPIO pins replaced; DC is forwarded to the virtual SPI device."""
+
+    def gpio_mode(self, Pin, Mode, pull_up=None, active_state=True):
+        return Pin
+
+    def gpio_pwm(self, Pin):
+        return Pin
+
+    def digital_write(self, Pin, value):
+        if Pin == self.DC_PIN:
+            self.SPI.dc = bool(value)
+
+    def bl_DutyCycle(self, duty):
+        pass
+
+
+def check(disp, name, show, expected):
+    before = len(disp.SPI.writes)
+    show()
+    disp.spi_wait()
+    writes = disp.SPI.writes[before:]
+    ok = (len(writes) == 1 and writes[0][0] == writes[0][1] == expected
+          and disp.frame_bytes == expected)
+    print("%-20s %s  RAMWR=%d bytes=%s frame_bytes=%d" % (
+        name, "ok  " if ok else "FAIL", len(writes), [w[1] for w in writes], disp.frame_bytes))
+    return ok
+
+
+def main():
+    disp = VirtualLCD(spi=VirtualSPI())
+    disp.Init()
+    portrait = Image.new("RGB", (disp.width, disp.height), "RED")
+    landscape = Image.new("RGB", (disp.height, disp.width), "BLUE")
+    region = Image.new("RGB", (40, 30), "GREEN")
+    frame = disp.width * disp.height * 2
+
+    cases = [
+        ("ShowImage landscape", lambda: disp.ShowImage(landscape), frame),
+        ("ShowImage portrait", lambda: disp.ShowImage(portrait), frame),
+        ("ShowEncoded", lambda: disp.ShowEncoded(disp.EncodeImage(portrait)), frame),
+        ("ShowImageRegion", lambda: disp.ShowImageRegion(region, 10, 20), 40 * 30 * 2),
+        ("clear", disp.clear, frame),
+    ]
+    for name, show, expected in cases:
+        if not check(disp, name, show, expected):
+            sys.exit(1)
+
+    n = 50
+    start_bytes, start = disp.bytes_sent, time.perf_counter()
+    for _ in range(n):
+        disp.ShowImage(landscape)
+    disp.spi_wait()
+    elapsed = time.perf_counter() - start
+    print("%d landscape frames: %d bytes (%d per frame), %.2f ms/frame driver time" % (
+        n, disp.bytes_sent - start_bytes, (disp.bytes_sent - start_bytes) // n, elapsed * 1000 / n))
+    if disp.bytes_sent - start_bytes != n * frame:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,108 +1,83 @@
-import os
-import json
 import time
 from PIL import Image, ImageDraw, ImageFont
+from ui import get_key, present
+import nav
+import contactstore
+from widgets import View, Label, Button
+from chat import chat_screen
+from textlayout import centered_x, wrap, scroll_window
 
 # ---------------- FONT SETUP ----------------
 Font = None  # will be set from main program
 line_height = 40
 top_margin = 40
 bottom_margin = 40
+address_lines = 5  # wrapped address lines per screen, more scroll with up/down
 
 CONTACTS_FILE = "Contacts.json"
 
 # ---------------- CONTACT LOOKUP ----------------
 def load_contact(nickname):
-    if not os.path.exists(CONTACTS_FILE):
-        return None
-    with open(CONTACTS_FILE, "r") as f:
-        try:
-            contacts = json.load(f)
-        except json.JSONDecodeError:
-            return None
-    for c in contacts:
-        if c["nickname"].lower() == nickname.lower():
-            return c
-    return None
-
-# ---------------- PLACEHOLDER HANDLERS ----------------
-def chat_handler(nickname):
-    print(f"Chat triggered for {nickname}")
+    contacts = contactstore.load(CONTACTS_FILE)
+    i = contacts.find(nickname)  # binary search, the store is sorted by nickname
+    return contacts[i] if i >= 0 else None
+
+# ---------------- HANDLERS ----------------
+def chat_handler(disp, font, contact):
+    """Open the chat with contact. Returns True when the details frame came back from cache."""
+    return nav.call(disp, "Chat", chat_screen, disp, font, contact)
 
 def call_handler(nickname):
     print(f"Call triggered for {nickname}")
 
-# helper text sizing
-def text_size(draw, text, font):
-    bbox = draw.textbbox((0,0), text, font=font)
-    return bbox[2]-bbox[0], bbox[3]-bbox[1]
-
 # ---------------- DRAW FUNCTIONS ----------------
-def draw_main_screen(disp, contact, focus_index):
-    global Font, line_height, top_margin, bottom_margin
-
-    image = Image.new("RGB", (240, 280), "BLACK")
-    draw = ImageDraw.Draw(image)
-
-    # Centered nickname
-    w, _ = text_size(draw, contact["nickname"], Font)
-    draw.text(((240 - w)//2, top_margin), contact["nickname"], fill="WHITE", font=Font)
-
-    # Number below nickname
+def build_main_screen(disp, contact):
+    """View of nickname, number and the three buttons; returns (view, buttons)."""
     number_y = top_margin + line_height
-    if "number" in contact:
-        num_text = str(contact["number"])
-        w, _ = text_size(draw, num_text, Font)
-        draw.text(((240 - w)//2, number_y), num_text, fill="WHITE", font=Font)
-
-    # Show Address button under number
     show_y = number_y + line_height + 10
-    if focus_index == 0:
-        draw.rectangle([4, show_y, 240-4, show_y+line_height], fill="WHITE")
-        draw.text((10, show_y+6), "Show Address", fill="BLACK", font=Font)
-    else:
-        draw.rectangle([4, show_y, 240-4, show_y+line_height], outline="WHITE")
-        draw.text((10, show_y+6), "Show Address", fill="WHITE", font=Font)
-
-    # Chat and Call buttons horizontally at bottom
     btn_y = 280 - line_height - bottom_margin
     btn_width = (240 - 12) // 2
-    # Chat
-    if focus_index == 1:
-        draw.rectangle([4, btn_y, 4 + btn_width, btn_y+line_height], fill="WHITE")
-        draw.text((10, btn_y+6), "Chat", fill="BLACK", font=Font)
-    else:
-        draw.rectangle([4, btn_y, 4 + btn_width, btn_y+line_height], outline="WHITE")
-        draw.text((10, btn_y+6), "Chat", fill="WHITE", font=Font)
-    # Call
     call_x = 8 + btn_width
-    if focus_index == 2:
-        draw.rectangle([call_x, btn_y, call_x + btn_width, btn_y+line_height], fill="WHITE")
-        draw.text((call_x + 6, btn_y+6), "Call", fill="BLACK", font=Font)
-    else:
-        draw.rectangle([call_x, btn_y, call_x + btn_width, btn_y+line_height], outline="WHITE")
-        draw.text((call_x + 6, btn_y+6), "Call", fill="WHITE", font=Font)
-
-    disp.ShowImage(image.rotate(90))
-
-def draw_address_screen(disp, address):
+    number = str(contact["number"]) if "number" in contact else ""
+    buttons = [
+        Button((4, show_y, 240 - 3, show_y + line_height + 1), "Show Address", Font),
+        Button((4, btn_y, 4 + btn_width + 1, btn_y + line_height + 1), "Chat", Font),
+        Button((call_x, btn_y, call_x + btn_width + 1, btn_y + line_height + 1), "Call", Font),
+    ]
+    view = View(disp,
+                Label((0, top_margin, 240, number_y), contact["nickname"], Font, align="center"),
+                Label((0, number_y, 240, show_y), number, Font, align="center"),
+                *buttons)
+    return view, buttons
+
+def focus(buttons, focus_index):
+    for i, button in enumerate(buttons):
+        button.focus(i == focus_index)
+
+def draw_address_screen(disp, address, scroll=0):
+    """Address wrapped by pixel width, address_lines at a time. Returns the wrapped line count."""
     global line_height
     image = Image.new("RGB", (240, 280), "BLACK")
     draw = ImageDraw.Draw(image)
 
-    lines = []
-    max_chars_per_line = 20
-    for i in range(0, len(address), max_chars_per_line):
-        lines.append(address[i:i+max_chars_per_line])
+    lines = wrap(Font, address, 240 - 12)
+    shown, more_above, more_below = scroll_window(lines, scroll, address_lines)
 
-    total_height = len(lines) * line_height
+    total_height = len(shown) * line_height
     start_y = max((280 - total_height)//2, 10)
 
-    for idx, line in enumerate(lines):
-        w, _ = text_size(draw, line, Font)
-        draw.text(((240 - w)//2, start_y + idx*line_height), line, fill="WHITE", font=Font)
+    for idx, line in enumerate(shown):
+        draw.text((centered_x(Font, line), start_y + idx*line_height), line, fill="WHITE", font=Font)
 
-    disp.ShowImage(image.rotate(90))
+    # Scroll hints
+    if more_above:
+        draw.polygon([(120, start_y - 12), (112, start_y - 4), (128, start_y - 4)], fill="WHITE")
+    if more_below:
+        y = start_y + total_height
+        draw.polygon([(120, y + 8), (112, y), (128, y)], fill="WHITE")
+
+    present(disp, image)
+    return len(lines)
 
 # ---------------- CONTACT DETAILS FUNCTION ----------------
 def contact_details(nickname, disp, font):
@@ -114,31 +89,18 @@ def contact_details(nickname, disp, font):
         print(f"No contact found for {nickname}")
         return
 
-    focus_index = 0
-    draw_main_screen(disp, contact, focus_index)
-
-    # Simple SSH input
-    import termios, tty, sys
-    def get_key():
-        fd = sys.stdin.fileno()
-        old = termios.tcgetattr(fd)
-        try:
-            tty.setraw(fd)
-            ch = sys.stdin.read(1)
-            if ch == '\x1b':
-                ch2 = sys.stdin.read(1)
-                if ch2 == '[':
-                    ch3 = sys.stdin.read(1)
-                    if ch3 == 'A': return "up"
-                    elif ch3 == 'B': return "down"
-                    elif ch3 == 'D': return "left"
-                    elif ch3 == 'C': return "right"
-                return ''
-            return ch
-        finally:
-            termios.tcsetattr(fd, termios.TCSADRAIN, old)
+    screen = nav.screen("Contact")
+    resume = nav.resume_state("Contact")  # warm restart: the button that had focus
+    focus_index = resume["focus"] if resume is not None else 0
+    view, buttons = build_main_screen(disp, contact)
+    focus(buttons, focus_index)
+    if resume is not None and screen.restore(disp):
+        view.adopt()  # the snapshot frame is on screen already
+    else:
+        view.update()
 
     while True:
+        screen.resume = {"focus": focus_index}
         key = get_key()
         if key == "\x03":  # Ctrl+C
             break
@@ -148,18 +110,28 @@ def contact_details(nickname, disp, font):
             focus_index = (focus_index + 1) % 3
         elif key in ("\r", " "):
             if focus_index == 0:  # Show Address
-                draw_address_screen(disp, contact["address"])
+                screen.resume = None  # not resumable, a restart comes back to the list
+                scroll = 0
+                total = draw_address_screen(disp, contact["address"], scroll)
                 while True:
                     k = get_key()
                     if k in ("\x1b", "left", "\r", " "):
                         break
-                draw_main_screen(disp, contact, focus_index)
+                    elif k == "up" and scroll > 0:
+                        scroll -= 1
+                    elif k == "down" and scroll < total - address_lines:
+                        scroll += 1
+                    else:
+                        continue
+                    draw_address_screen(disp, contact["address"], scroll)
             elif focus_index == 1:
-                chat_handler(nickname)
+                if chat_handler(disp, font, contact):
+                    continue
             elif focus_index == 2:
                 call_handler(nickname)
         elif key in ("\x1b", "left"):
             break
 
-        draw_main_screen(disp, contact, focus_index)
+        focus(buttons, focus_index)
+        view.update()  # the two buttons whose focus changed, or everything after a sub-screen
         time.sleep(0.05)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""Bulk import and export of contacts as CSV, vCard or JSON lines.
+
+Rows are streamed through a generator pipeline (read, validate, dedupe) and
+written together with the existing contacts in one pass to a temporary file
+that replaces Contacts.json (see contactstore.write), so a roster of any size costs one rewrite and
+memory for the index only. Addresses must be valid v3 onion addresses; rows
+whose address or number is already known (in the file or earlier in the
+input) are skipped. An encrypted store asks for the passcode.
+
+    python3 contactio.py import roster.csv
+    python3 contactio.py import team.vcf --dry-run
+    python3 contactio.py export backup.jsonl
+    python3 contactio.py export - --format csv
+"""
+import argparse
+import base64
+import binascii
+import csv
+import getpass
+import hashlib
+import itertools
+import json
+import os
+import sys
+
+import contactstore
+import vault
+
+CONTACTS_FILE = contactstore.CONTACTS_FILE
+FORMATS = ("csv", "vcard", "jsonl")
+EXTENSIONS = {".csv": "csv", ".vcf": "vcard", ".vcard": "vcard", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+FIELDS = ("nickname", "address", "number")
+VCARD_ADDRESS = "X-ONION"  # vCard property holding the address
+
+# ---------------- VALIDATION ----------------
+def valid_onion(address):
+    """True for a v3 onion address: 56 base32 characters of key, checksum and version 3."""
+    if not address.endswith(".onion") or len(address) != 62:
+        return False
+    try:
+        raw = base64.b32decode(address[:-6].upper())
+    except (binascii.Error, ValueError):
+        return False
+    pubkey, checksum, version = raw[:32], raw[32:34], raw[34:]
+    return version == b"\x03" and checksum == hashlib.sha3_256(b".onion checksum" + pubkey + version).digest()[:2]
+
+def normalize(row):
+    """Contact dict from a parsed row, or None when the row is unusable."""
+    nickname = (row.get("nickname") or "").strip()
+    address = (row.get("address") or "").strip().lower()
+    if not nickname or not valid_onion(address):
+        return None
+    contact = {"nickname": nickname, "address": address}
+    number = row.get("number")
+    if number not in (None, ""):
+        try:
+            contact["number"] = int(str(number).strip())
+        except ValueError:
+            return None
+    return contact
+
+# ---------------- READERS ----------------
+def read_csv(f):
+    """Rows of a CSV file with a nickname,address,number header (number optional)."""
+    yield from csv.DictReader(f)
+
+def read_jsonl(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = {}
+            yield row if isinstance(row, dict) else {}
+
+def _vcard_lines(f):
+    """Lines with folded continuations joined."""
+    line = None
+    for raw in f:
+        raw = raw.rstrip("\r\n")
+        if raw[:1] in (" ", "\t") and line is not None:
+            line += raw[1:]
+            continue
+        if line is not None:
+            yield line
+        line = raw
+    if line is not None:
+        yield line
+
+def _vcard_unescape(value):
+    return value.replace("\\n", " ").replace("\\N", " ").replace("\\,", ",").replace("\\;", ";").replace("\\\\", "\\")
+
+def read_vcard(f):
+    """One row per BEGIN:VCARD..END:VCARD: FN is the nickname, TEL the number, the address
+    comes from X-ONION or else the first URL/IMPP ending in .onion."""
+    row = None
+    for line in _vcard_lines(f):
+        name, _, value = line.partition(":")
+        prop = name.split(";")[0].upper()
+        if prop == "BEGIN":
+            row = {}
+        elif row is None:
+            continue
+        elif prop == "END":
+            yield row
+            row = None
+        elif prop == "FN":
+            row["nickname"] = _vcard_unescape(value)
+        elif prop == "TEL":
+            row.setdefault("number", value.replace("tel:", "").strip())
+        elif prop == VCARD_ADDRESS:
+            row["address"] = value
+        elif prop in ("URL", "IMPP") and "address" not in row:
+            host = value.split("//")[-1].split(":")[-1].strip("/")
+            if host.endswith(".onion"):
+                row["address"] = host
+
+READERS = {"csv": read_csv, "vcard": read_vcard, "jsonl": read_jsonl}
+
+# ---------------- WRITERS ----------------
+def write_csv(contacts, f):
+    writer = csv.DictWriter(f, FIELDS, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(contacts)
+
+def write_jsonl(contacts, f):
+    for contact in contacts:
+        f.write(json.dumps(contact) + "\n")
+
+def _vcard_escape(value):
+    return value.replace("\\", "\\\\").replace(",", "\\,").replace(";", "\\;").replace("\n", "\\n")
+
+def write_vcard(contacts, f):
+    for contact in contacts:
+        f.write("BEGIN:VCARD\nVERSION:4.0\n")
+        f.write("FN:%s\n" % _vcard_escape(contact["nickname"]))
+        if "number" in contact:
+            f.write("TEL:%s\n" % contact["number"])
+        f.write("%s:%s\nEND:VCARD\n" % (VCARD_ADDRESS, contact["address"]))
+
+WRITERS = {"csv": write_csv, "vcard": write_vcard, "jsonl": write_jsonl}
+
+def guess_format(path):
+    fmt = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Unknown contact format for {path}, pass --format")
+    return fmt
+
+# ---------------- PIPELINE ----------------
+class ImportStats:
+    def __init__(self):
+        self.added = 0
+        self.duplicate = 0
+        self.invalid = 0
+
+    def __str__(self):
+        return f"{self.added} added, {self.duplicate} duplicates, {self.invalid} invalid"
+
+def dedupe(contacts, store, stats):
+    """contacts whose address and number are new to store and to the rows before them."""
+    addresses = set(map(store.address, range(len(store))))
+    numbers = set(store.numbers)
+    numbers.discard(contactstore.NO_NUMBER)
+    for contact in contacts:
+        number = contact.get("number")
+        if contact["address"] in addresses or number in numbers:
+            stats.duplicate += 1
+            continue
+        addresses.add(contact["address"])
+        if number is not None:
+            numbers.add(number)
+        yield contact
+
+def validate(rows, stats):
+    for row in rows:
+        contact = normalize(row)
+        if contact is None:
+            stats.invalid += 1
+            continue
+        yield contact
+
+def import_contacts(rows, path=CONTACTS_FILE, dry_run=False):
+    """Add the valid, new contacts among rows (dicts as the readers yield them) to path
+    in a single write. Returns ImportStats."""
+    stats = ImportStats()
+    store = contactstore.read_store(path)
+    fresh = dedupe(validate(rows, stats), store, stats)
+
+    def counted():
+        for contact in fresh:
+            stats.added += 1
+            yield contact
+
+    if dry_run:
+        for _ in counted():
+            pass
+        return stats
+    added = counted()
+    first = next(added, None)
+    if first is None:
+        return stats  # nothing new, leave the file alone
+    contactstore.write(path, itertools.chain(store, [first], added))
+    return stats
+
+def import_file(source, fmt=None, path=CONTACTS_FILE, dry_run=False):
+    """import_contacts() from a CSV, vCard or JSON lines file ("-" for stdin)."""
+    fmt = fmt or guess_format(source)
+    if source == "-":
+        return import_contacts(READERS[fmt](sys.stdin), path, dry_run)
+    with open(source, "r", newline="" if fmt == "csv" else None, encoding="utf-8") as f:
+        return import_contacts(READERS[fmt](f), path, dry_run)
+
+def export_file(target, fmt=None, path=CONTACTS_FILE):
+    """Write all contacts of path to target ("-" for stdout). Returns the contact count."""
+    fmt = fmt or guess_format(target)
+    store = contactstore.read_store(path)
+    if target == "-":
+        WRITERS[fmt](iter(store), sys.stdout)
+    else:
+        with open(target, "w", newline="" if fmt == "csv" else None, encoding="utf-8") as f:
+            WRITERS[fmt](iter(store), f)
+    return len(store)
+
+# ---------------- CLI ----------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("import", "export"))
+    parser.add_argument("file", help='roster to read or write, "-" for stdin/stdout')
+    parser.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    parser.add_argument("--contacts", default=CONTACTS_FILE, help="contact store to update or read")
+    parser.add_argument("--dry-run", action="store_true", help="only count what an import would add")
+    args = parser.parse_args()
+    try:
+        if contactstore.sealed(args.contacts) and not vault.unlock(getpass.getpass("Passcode: ")):
+            sys.exit("Error: wrong passcode")
+        if args.command == "import":
+            print(import_file(args.file, args.format, args.contacts, args.dry_run), file=sys.stderr)
+        else:
+            count = export_file(args.file, args.format, args.contacts)
+            print(f"{count} contacts exported", file=sys.stderr)
+    except (OSError, ValueError, KeyError) as e:
+        sys.exit(f"Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
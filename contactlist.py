@@ -1,146 +1,189 @@
 import os
-import json
-import time
-from PIL import Image, ImageDraw, ImageFont
+
+import nav
+import contactstore
+from widgets import ListView, View, Label
 
 CONTACTS_FILE = "Contacts.json"
+SCREEN = "Contacts"  # navigation stack entry, same name as the main menu item
 line_height = 40
 top_padding = 60
 visible_items = 4
+lookahead = 12  # filter matches ranked beyond the visible rows, more once the selection gets there
 
 # ---------------- CONTACT LOADING ----------------
 def load_contacts():
-    if not os.path.exists(CONTACTS_FILE):
-        return []
-    with open(CONTACTS_FILE, "r") as f:
-        try:
-            contacts = json.load(f)
-            contacts.sort(key=lambda c: c["nickname"].lower())
-            return contacts
-        except json.JSONDecodeError:
-            print("Error: Contacts.json malformed")
-            return []
+    """All contacts as a ContactStore, sorted by nickname. Shared until Contacts.json changes."""
+    return contactstore.load(CONTACTS_FILE)
 
-# ---------------- INPUT ----------------
-import termios, tty, sys
-def get_key():
-    fd = sys.stdin.fileno()
-    old = termios.tcgetattr(fd)
+def contacts_mtime():
     try:
-        tty.setraw(fd)
-        ch = sys.stdin.read(1)
-        if ch == '\x1b':
-            ch2 = sys.stdin.read(1)
-            if ch2 == '[':
-                ch3 = sys.stdin.read(1)
-                if ch3 == 'A': return "up"
-                elif ch3 == 'B': return "down"
-                elif ch3 == 'D': return "left"
-                elif ch3 == 'C': return "right"
-            return ''
-        return ch
-    finally:
-        termios.tcsetattr(fd, termios.TCSADRAIN, old)
-
-# ---------------- DRAW ----------------
-def draw_menu(contact_names, selected_index, scroll_index, disp):
-    image = Image.new("RGB", (240, 280), "BLACK")
-    draw = ImageDraw.Draw(image)
-    start_y = top_padding
-
-    for i in range(visible_items):
-        idx = scroll_index + i
-        if idx >= len(contact_names):
-            break
-        item = contact_names[idx]
-        y_top = start_y + i * line_height
-        y_bottom = y_top + line_height
-        if idx == selected_index:
-            draw.rectangle([0, y_top, 240, y_bottom], fill="WHITE")
-            draw.text((4, y_top + 6), item, fill="BLACK", font=disp.Font)
-            draw.text((240-20, y_top+6), ">", fill="BLACK", font=disp.Font)
-        else:
-            draw.text((4, y_top + 6), item, fill="WHITE", font=disp.Font)
+        return os.stat(CONTACTS_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+def filtered(contacts, filter_text, count=visible_items + lookahead):
+    """Positions in contacts the list shows for filter_text: the count best matches,
+    best first, or all contacts in list order without a filter."""
+    return contacts.rank(filter_text, count) if filter_text else range(len(contacts))
+
+# ---------------- LIVE RELOAD ----------------
+_live = None  # update of the open list, set while menu_loop runs
+
+def remap(contacts, moved, filter_text, view, selected_index, scroll_index):
+    """(filter_text, view, selected_index, scroll_index) for contacts after a reload.
+    The selected contact stays selected if it still matches, moved comes from contactstore."""
+    old = view[selected_index] if 0 <= selected_index < len(view) else -1
+    target = moved[old] if 0 <= old < len(moved) else -1
+    view = filtered(contacts, filter_text, max(len(view), visible_items + lookahead))
+    if target >= 0 and target in view:  # a range, or the few ranked matches
+        selected_index = view.index(target)
+    selected_index = max(min(selected_index, len(view) - 1), 0)
+    scroll_index = min(scroll_index, selected_index, max(len(view) - visible_items, 0))
+    scroll_index = max(scroll_index, selected_index - visible_items + 1)
+    return filter_text, view, selected_index, scroll_index
+
+def _on_contacts_changed(contacts, moved):
+    if _live is not None:
+        _live(contacts, moved)
+        return
+    screen = nav.screen(SCREEN)
+    state = screen.state
+    if state is None:
+        return
+    filter_text, view, selected_index, scroll_index = remap(
+        contacts, moved, state["filter_text"], state["view"], state["selected_index"], state["scroll_index"])
+    state.update(mtime=contacts_mtime(), contacts=contacts, filter_text=filter_text, view=view,
+                 selected_index=selected_index, scroll_index=scroll_index)
+    screen.valid = False  # cached frame shows the old list
 
-    disp.ShowImage(image.rotate(90))
+contactstore.subscribe(_on_contacts_changed)
 
-def draw_no_match(disp):
-    image = Image.new("RGB", (240, 280), "BLACK")
-    draw = ImageDraw.Draw(image)
-    msg = "No matches"
-    bbox = draw.textbbox((0,0), msg, font=disp.Font)
-    w = bbox[2]-bbox[0]
-    h = bbox[3]-bbox[1]
-    draw.text(((240 - w)//2, (280 - h)//2), msg, fill="WHITE", font=disp.Font)
-    disp.ShowImage(image.rotate(90))
-    time.sleep(1)
+# ---------------- INPUT ----------------
+from ui import get_key
+
+# ---------------- VIEW ----------------
+def build_view(disp):
+    """The contact list widget, the line shown instead while a filter matches nothing,
+    and the view holding them; items are set by menu_loop."""
+    contact_list = ListView((0, top_padding, 240, top_padding + visible_items * line_height + 1),
+                            disp.Font, visible_items, line_height)
+    no_match = Label((0, top_padding + 6, 240, top_padding + line_height), "No matches", disp.Font,
+                     fill="GRAY", align="center")
+    no_match.visible = False
+    return contact_list, no_match, View(disp, contact_list, no_match)
 
 # ---------------- MENU LOOP ----------------
 from contactdetails import contact_details
 def menu_loop(disp, font):
+    global _live
     disp.Font = font  # attach font for draw functions
-    contacts = load_contacts()
-    if not contacts:
-        print("No contacts found.")
-        return
+    screen = nav.screen(SCREEN)
+
+    # Contacts stay loaded between visits until the file changes or the screen is invalidated
+    if screen.state is None or screen.state["mtime"] != contacts_mtime():
+        screen.invalidate()
+        mtime = contacts_mtime()
+        contacts = load_contacts()
+        if not contacts:
+            print("No contacts found.")
+            return
+        screen.state = {"mtime": mtime, "contacts": contacts, "filter_text": "",
+                        "view": range(len(contacts)), "selected_index": 0, "scroll_index": 0}
+
+    state = screen.state
+    contacts = state["contacts"]
+    filter_text = state["filter_text"]
+    view = state["view"]  # positions in contacts shown in the list, never a copy of the names
+
+    def label(i):
+        return contacts.name(view[i])
+
+    contact_list, no_match, list_view = build_view(disp)
+    resume = nav.resume_state(SCREEN)  # warm restart: filter and position as they were
+    if resume is not None and resume["filter"]:
+        filter_text = resume["filter"]
+        view = filtered(contacts, filter_text, max(resume["selected"] + lookahead, visible_items + lookahead))
+    no_match.visible = not view
+    if resume is not None:
+        contact_list.set_items(label, len(view))
+        contact_list.select(resume["selected"], resume["scroll"])
+    else:
+        contact_list.set_items(label, len(view), state["selected_index"], state["scroll_index"])
+    screen.resume = {"selected": contact_list.selected, "scroll": contact_list.scroll, "filter": filter_text}
+    if nav.resume_next() == "Contact" and view:
+        # The contact that was open comes back first, the list draws when it is left
+        nav.call(disp, "Contact", contact_details, contacts.name(view[contact_list.selected]), disp, font)
+        list_view.update()
+    elif screen.restore(disp):
+        list_view.adopt()
+    else:
+        list_view.update()
+
+    def on_change(new_contacts, moved):
+        # Runs from get_key(), also while a contact opened from this list is on screen
+        nonlocal contacts, filter_text, view
+        contacts = new_contacts
+        filter_text, view, selected_index, scroll_index = remap(
+            contacts, moved, filter_text, view, contact_list.selected, contact_list.scroll)
+        contact_list.set_items(label, len(view), selected_index, scroll_index)
+        no_match.show(not view)
+        state["mtime"] = contacts_mtime()
+        if not nav.stack or nav.stack[-1] is screen:
+            list_view.update()
+        else:
+            screen.valid = False  # redraw instead of restoring when we get back
+
+    _live = on_change
+    try:
+        while True:
+            screen.resume = {"selected": contact_list.selected, "scroll": contact_list.scroll, "filter": filter_text}
+            key = get_key()
+            typed = False
+
+            if key == "\x03":  # Ctrl+C
+                break
+            elif key in ("\r", " "):
+                if view:
+                    # The list frame comes back from cache afterwards, or is redrawn below
+                    nav.call(disp, "Contact", contact_details, contacts.name(view[contact_list.selected]), disp, font)
+            elif key == "up":
+                contact_list.up()
+            elif key == "down":
+                if filter_text and contact_list.selected == len(view) - 1 and len(view) >= visible_items + lookahead:
+                    # The selection reached the last ranked match: rank the next ones
+                    view = filtered(contacts, filter_text, len(view) + visible_items + lookahead)
+                    contact_list.set_items(label, len(view), contact_list.selected, contact_list.scroll)
+                contact_list.down()
+            elif key in ("left", "\x1b"):
+                 if filter_text:
+                     # If a filter is active, just clear it
+                     filter_text = ""
+                     view = range(len(contacts))
+                     contact_list.set_items(label, len(view))
+                     no_match.show(False)
+                 else:
+                 # No filter → exit contacts menu
+                     break
+
+            elif key == "\x7f":  # backspace
+                if filter_text:
+                    filter_text = filter_text[:-1]
+                    typed = True
+            elif len(key) == 1 and key.isprintable():
+                filter_text += key
+                typed = True
+
+            # Apply filter: the best match on top and selected. Without any the filter
+            # stays, backspace brings the matches back
+            if typed:
+                view = filtered(contacts, filter_text)
+                contact_list.set_items(label, len(view))
+                no_match.show(not view)
+
+            list_view.update()  # only what changed; nothing after a restore from cache
+    finally:
+        _live = None
 
-    all_names = [c["nickname"] for c in contacts]
-    filter_text = ""
-    filtered_names = all_names.copy()
-    selected_index = 0
-    scroll_index = 0
-
-    draw_menu(filtered_names, selected_index, scroll_index, disp)
-
-    while True:
-        key = get_key()
-
-        if key == "\x03":  # Ctrl+C
-            break
-        elif key in ("\r", " "):
-            if filtered_names:
-                contact_details(filtered_names[selected_index], disp, font)
-        elif key == "up":
-            if selected_index > 0:
-                selected_index -= 1
-                if selected_index < scroll_index:
-                    scroll_index -= 1
-        elif key == "down":
-            if selected_index < len(filtered_names) - 1:
-                selected_index += 1
-                if selected_index >= scroll_index + visible_items:
-                    scroll_index += 1
-        elif key in ("left", "\x1b"):
-             if filter_text:
-                 # If a filter is active, just clear it
-                 filter_text = ""
-                 filtered_names = all_names.copy()
-                 selected_index = 0
-                 scroll_index = 0
-             else:
-             # No filter → exit contacts menu
-                 break
-
-        elif key == "\x7f":  # backspace
-            if filter_text:
-                filter_text = filter_text[:-1]
-        elif len(key) == 1 and key.isprintable():
-            filter_text += key
-
-        # Apply filter
-        if filter_text:
-            norm = filter_text.lower().replace(" ", "").replace("-", "")
-            filtered_names = [n for n in all_names if norm in n.lower().replace(" ", "").replace("-", "")]
-            if not filtered_names:
-                draw_no_match(disp)
-                filtered_names = all_names.copy()
-                filter_text = ""
-                selected_index = 0
-                scroll_index = 0
-                continue
-
-        if selected_index >= len(filtered_names):
-            selected_index = len(filtered_names) - 1
-
-        draw_menu(filtered_names, selected_index, scroll_index, disp)
-        time.sleep(0.05)
+    state.update(contacts=contacts, filter_text=filter_text, view=view,
+                 selected_index=contact_list.selected, scroll_index=contact_list.scroll)
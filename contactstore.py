@@ -0,0 +1,476 @@
+import os
+import re
+import json
+from array import array
+from bisect import bisect_right
+from heapq import merge
+from itertools import islice
+from operator import itemgetter
+
+import vault
+
+CONTACTS_FILE = "Contacts.json"
+NO_NUMBER = -1  # numbers column entry of a contact without a number
+CHUNK = 256  # contacts per encrypted record, Contacts.json holds one record per line when sealed
+RANK_SCAN = 5000  # matches rank() scores per tier at most, a tier with more is ranked among its first ones
+TYPO_MIN = 4  # shortest filter that also matches with one typo
+MERGE_ABOVE = 16  # apply() merges everything once more than 1/16 of the contacts changed
+
+def search_key(text):
+    """What the Contacts filter matches: lower case, without spaces and hyphens."""
+    return text.lower().replace(" ", "").replace("-", "")
+
+def _typos(needle):
+    """Patterns for needle with one letter wrong, missing, extra or swapped. Each starts
+    with a literal, which re searches for quickly; a wrong first letter is covered by
+    the one where it is missing."""
+    variants = set()
+    for i in range(len(needle)):
+        head, tail = re.escape(needle[:i]), re.escape(needle[i + 1:])
+        variants.add(head + tail)
+        if i:
+            variants.add(head + "[^\n]" + tail)
+            variants.add(head + "[^\n]" + re.escape(needle[i:]))
+        if i + 1 < len(needle):
+            variants.add(re.escape(needle[:i] + needle[i + 1] + needle[i] + needle[i + 2:]))
+    return sorted(variants)
+
+def _offsets(strings):
+    """Start of every string in "\\n".join(strings), plus the end."""
+    offsets = array("I", [0])
+    end = 0
+    for string in strings:
+        end += len(string) + 1
+        offsets.append(end)
+    return offsets
+
+def _pack(strings):
+    """One string holding all of strings separated by newlines, plus the start offset of each."""
+    blob = "\n".join(strings)
+    if blob.count("\n") != max(len(strings) - 1, 0):  # a newline inside a value would split it
+        blob = "\n".join(s.replace("\n", " ") for s in strings)
+    return blob, _offsets(strings)
+
+def _splice(blob, at, plan, added):
+    """blob and offsets as _pack() makes them, rebuilt from plan: ranges of the old entries,
+    copied as one slice each, and indexes into added for the new strings."""
+    blob += "\n"
+    parts, offsets, end = [], array("I", [0]), 0
+    for piece in plan:
+        if type(piece) is range:
+            first, last = at[piece.start], at[piece.stop]
+            parts.append(blob[first:last])
+            for offset in at[piece.start + 1:piece.stop + 1]:
+                offsets.append(offset - first + end)
+            end += last - first
+        else:
+            parts.append(added[piece] + "\n")
+            end += len(added[piece]) + 1
+            offsets.append(end)
+    return "".join(parts)[:-1], offsets
+
+def _number(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return NO_NUMBER
+
+# ---------------- STORE ----------------
+class ContactStore:
+    """All contacts in display order (nickname, case-insensitive), kept column-wise.
+
+    Nicknames, their filter form and addresses each live in one string with an
+    offset array, numbers in an array('q'). A contact costs its characters plus
+    20 bytes instead of a dict with three boxed values. Screens work on index views
+    (range or array of positions) instead of copied name lists; store[i]
+    builds the contact dict only when one is needed."""
+
+    __slots__ = ("_names", "_name_at", "_search", "_search_at", "_addresses", "_address_at", "numbers")
+
+    def __init__(self, contacts=()):
+        names, addresses, numbers = [], [], []
+        for contact in sorted(contacts, key=lambda contact: contact["nickname"].lower()):
+            names.append(contact["nickname"])
+            addresses.append(contact["address"])
+            numbers.append(contact.get("number", NO_NUMBER))
+        self._fill(names, addresses, numbers)
+
+    def _fill(self, names, addresses, numbers):
+        """Set the columns from lists already in display order."""
+        self._names, self._name_at = _pack(names)
+        self._search = search_key(self._names)  # the filter form of all names at once
+        self._search_at = _offsets(self._search.split("\n"))
+        self._addresses, self._address_at = _pack(addresses)
+        try:
+            self.numbers = array("q", numbers)
+        except (TypeError, OverflowError):  # numbers stored as strings or out of range
+            self.numbers = array("q", [_number(number) for number in numbers])
+
+    def _column(self, blob):
+        return blob.split("\n") if len(self) else []
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def name(self, i):
+        return self._names[self._name_at[i]:self._name_at[i + 1] - 1]
+
+    def address(self, i):
+        return self._addresses[self._address_at[i]:self._address_at[i + 1] - 1]
+
+    def number(self, i):
+        number = self.numbers[i]
+        return None if number == NO_NUMBER else number
+
+    def __getitem__(self, i):
+        """Contact i as the dict the screens use ("number" only when it has one)."""
+        contact = {"nickname": self.name(i), "address": self.address(i)}
+        if self.numbers[i] != NO_NUMBER:
+            contact["number"] = self.numbers[i]
+        return contact
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def find(self, nickname):
+        """Index of the contact with this nickname (case-insensitive), -1 if there is none."""
+        key = nickname.lower()
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.name(mid).lower() < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < len(self) and self.name(lo).lower() == key else -1
+
+    def search(self, text):
+        """Indexes of the contacts whose nickname contains text, compared as search_key().
+        A scan of one string with str.find, no per-contact Python work."""
+        needle = search_key(text)
+        if not needle:
+            return range(len(self))
+        blob, at = self._search, self._search_at
+        out = array("l")
+        pos = blob.find(needle)
+        while pos != -1:
+            i = bisect_right(at, pos) - 1
+            out.append(i)
+            pos = blob.find(needle, at[i + 1])
+        return out
+
+    # ---------------- RANKING ----------------
+    def rank(self, text, k):
+        """Indexes of the k contacts matching text best, best first. Tiers, each only
+        looked at while the ones before gave fewer than k: nicknames starting with text
+        (in list order), containing it (earliest, shortest first), containing its letters
+        in order (closest together first), and from four letters on containing it with
+        one letter wrong, missing, extra or swapped. Every tier is a scan of the filter
+        form of all names at once, scoring its first RANK_SCAN matches."""
+        needle = search_key(text)
+        if not needle:
+            return range(min(k, len(self)))
+        at = self._search_at
+
+        def earliest(i, start, end):
+            return start, at[i + 1] - at[i]
+
+        def closest(i, start, end):
+            return end - start, start
+
+        best = array("l")
+        for i in self._prefixed(needle):
+            if len(best) == k:
+                break
+            best.append(i)
+        seen = set(best)
+        tiers = [([re.escape(needle)], earliest)]
+        if len(needle) > 1:
+            tiers.append((["[^\n]*?".join(re.escape(letter) for letter in needle)], closest))
+        if len(needle) >= TYPO_MIN:
+            tiers.append((_typos(needle), earliest))
+        for patterns, score in tiers:
+            if len(best) >= k:
+                break
+            scores = {}
+            for count, (i, start, end) in enumerate(self._matches(patterns)):
+                if count == RANK_SCAN:
+                    break
+                if i in seen:
+                    continue
+                value = score(i, start, end)
+                if i not in scores or value < scores[i]:
+                    scores[i] = value
+            for i in sorted(scores, key=lambda i: (scores[i], i))[:k - len(best)]:
+                best.append(i)
+                seen.add(i)
+        return best
+
+    def _prefixed(self, needle):
+        """Contacts whose filter form starts with needle, in list order."""
+        blob, at = self._search, self._search_at
+        if blob.startswith(needle):
+            yield 0
+        needle = "\n" + needle
+        pos = blob.find(needle)
+        while pos != -1:
+            yield bisect_right(at, pos)  # the contact starting right after the newline
+            pos = blob.find(needle, pos + 1)
+
+    def _matches(self, patterns):
+        """(index, start, end) of the first match of each of patterns in the filter form
+        of each contact, pattern after pattern."""
+        blob, at = self._search, self._search_at
+        for pattern in patterns:
+            pattern = re.compile(pattern)
+            match = pattern.search(blob)
+            while match:
+                i = bisect_right(at, match.start()) - 1
+                yield i, match.start() - at[i], match.end() - at[i]
+                match = pattern.search(blob, at[i + 1])
+
+    # ---------------- CHANGES ----------------
+    def diff(self, contacts):
+        """What turns this store into contacts, matched by address: (inserts, updates, deletes).
+        inserts are contact dicts, updates (index, contact dict) pairs, deletes indexes."""
+        at = {}
+        for i, address in enumerate(self._column(self._addresses)):
+            at[address] = i
+        names = self._column(self._names)
+        inserts, updates, seen = [], [], set()
+        for contact in contacts:
+            i = at.get(contact["address"])
+            if i is None or i in seen:  # a repeated address is a contact of its own, like in __init__
+                inserts.append(contact)
+                continue
+            seen.add(i)
+            if (contact["nickname"] != names[i]
+                    or _number(contact.get("number", NO_NUMBER)) != self.numbers[i]):
+                updates.append((i, contact))
+        deletes = [i for i in range(len(self)) if i not in seen]
+        return inserts, updates, deletes
+
+    def apply(self, inserts=(), updates=(), deletes=()):
+        """A new store with a diff() applied, and where every index of this store went
+        (array, -1 for deleted). Unchanged contacts are never turned into dicts: runs of
+        them are copied over as slices of the columns and only the changed ones are
+        placed by binary search. A diff touching a good part of the store is merged
+        in one pass instead."""
+        if len(inserts) + len(updates) > len(self) // MERGE_ABOVE:
+            return self._merged(inserts, updates, deletes)
+        gone = set(deletes)
+        added = []  # (lower-case nickname, old index or -1, contact dict)
+        for i, contact in updates:
+            gone.add(i)
+            added.append((contact["nickname"].lower(), i, contact))
+        for contact in inserts:
+            added.append((contact["nickname"].lower(), -1, contact))
+        added.sort(key=lambda entry: entry[0])
+
+        # Where the store changes, in order: (p, 0, j) added[j] goes before old index p,
+        # (i, 1, i) old index i goes
+        edits = []
+        for j, (lower, _, _) in enumerate(added):
+            edits.append((self._after(lower), 0, j))
+        for i in gone:
+            edits.append((i, 1, i))
+        edits.sort()
+        edits.append((len(self), 1, None))
+
+        plan = []  # the new store in order: ranges of old indexes, indexes into added
+        moved = array("l", [-1]) * len(self)
+        start = pos = 0
+        for p, is_gone, j in edits:
+            if p > start:
+                plan.append(range(start, p))
+                moved[start:p] = array("l", range(pos, pos + p - start))
+                pos += p - start
+            start = p
+            if is_gone:
+                start += 1
+            else:
+                plan.append(j)
+                if added[j][1] >= 0:
+                    moved[added[j][1]] = pos
+                pos += 1
+
+        names, searches, addresses, numbers = [], [], [], []
+        for _, _, contact in added:
+            names.append(contact["nickname"].replace("\n", " "))
+            searches.append(search_key(names[-1]))
+            addresses.append(contact["address"].replace("\n", " "))
+            numbers.append(_number(contact.get("number", NO_NUMBER)))
+        store = ContactStore.__new__(ContactStore)
+        store._names, store._name_at = _splice(self._names, self._name_at, plan, names)
+        store._search, store._search_at = _splice(self._search, self._search_at, plan, searches)
+        store._addresses, store._address_at = _splice(self._addresses, self._address_at, plan, addresses)
+        store.numbers = array("q")
+        for piece in plan:
+            if type(piece) is range:
+                store.numbers += self.numbers[piece.start:piece.stop]
+            else:
+                store.numbers.append(numbers[piece])
+        return store, moved
+
+    def _after(self, key):
+        """How many contacts sort before or equal to key (a lower-case nickname)."""
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if key < self.name(mid).lower():
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    def _merged(self, inserts, updates, deletes):
+        """apply() for large diffs: all contacts merged into new columns."""
+        changed = {i: contact for i, contact in updates}
+        gone = set(deletes).union(changed)
+        names = self._column(self._names)
+        addresses = self._column(self._addresses)
+        kept = ((names[i].lower(), 0, i) for i in range(len(self)) if i not in gone)
+        added = [(contact["nickname"].lower(), 1, i, contact) for i, contact in changed.items()]
+        added += [(contact["nickname"].lower(), 1, -1, contact) for contact in inserts]
+        added.sort(key=itemgetter(0))
+        moved = array("l", [-1]) * len(self)
+        new_names, new_addresses, new_numbers = [], [], []
+        for pos, entry in enumerate(merge(kept, added, key=itemgetter(0))):
+            i = entry[2]
+            if entry[1] == 0:
+                new_names.append(names[i])
+                new_addresses.append(addresses[i])
+                new_numbers.append(self.numbers[i])
+            else:
+                contact = entry[3]
+                new_names.append(contact["nickname"])
+                new_addresses.append(contact["address"])
+                new_numbers.append(_number(contact.get("number", NO_NUMBER)))
+            if i >= 0:
+                moved[i] = pos
+        store = ContactStore.__new__(ContactStore)
+        store._fill(new_names, new_addresses, new_numbers)
+        return store, moved
+
+# ---------------- FILE ----------------
+def read_contacts(path):
+    """The contact dicts of path, plain JSON or sealed by the vault.
+    Raises ValueError when the file is sealed and the vault locked. Not lazy: every
+    record is decrypted here, as the store is sorted by nickname across all of them."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not vault.is_token(data):
+        return json.loads(data)
+    contacts = []
+    for token in data.split():
+        contacts += json.loads(vault.decrypt(token))
+    return contacts
+
+def sealed(path):
+    try:
+        with open(path, "rb") as f:
+            return vault.is_token(f.read(64))
+    except OSError:
+        return False
+
+def write(path, contacts):
+    """Replace path with contacts (any iterable of dicts) in one rename, so readers and the
+    contact watcher never see half a file. Streamed in CHUNK-sized records, one per line:
+    encrypted while the vault is unlocked, a line of the JSON list otherwise. One
+    json.dumps() per record, per contact it costs several times as much."""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        contacts = iter(contacts)
+        chunk = list(islice(contacts, CHUNK))
+        if vault.is_unlocked():
+            while True:
+                f.write(vault.encrypt(json.dumps(chunk).encode()) + b"\n")
+                chunk = list(islice(contacts, CHUNK))
+                if not chunk:
+                    break
+        else:
+            f.write(b"[\n")
+            while chunk:
+                f.write(json.dumps(chunk)[1:-1].encode())  # without the brackets of the chunk
+                chunk = list(islice(contacts, CHUNK))
+                f.write(b",\n" if chunk else b"\n")
+            f.write(b"]\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def seal(path=CONTACTS_FILE):
+    """Encrypt a plaintext path in place, e.g. one dropped by provisioning. Returns True if it did."""
+    if not vault.is_unlocked() or not os.path.exists(path) or sealed(path):
+        return False
+    try:
+        contacts = read_contacts(path)
+    except ValueError:
+        return False
+    write(path, contacts)
+    return True
+
+# ---------------- LOADING ----------------
+_cache = {"key": None, "store": None}
+
+def read_store(path=CONTACTS_FILE):
+    """The ContactStore of path, shared by all screens until the file changes. A file that
+    cannot be read raises ValueError (sealed, vault locked), KeyError or TypeError
+    (malformed): what writes the contacts back must not start from an empty store."""
+    try:
+        key = (path, os.stat(path).st_mtime_ns)
+    except OSError:
+        return ContactStore()
+    if _cache["key"] != key:
+        _cache["store"] = ContactStore(read_contacts(path))
+        _cache["key"] = key
+    return _cache["store"]
+
+def load(path=CONTACTS_FILE):
+    """read_store() for the screens, empty when the file cannot be read. Not cached, so
+    the file is read again once the vault is unlocked."""
+    try:
+        return read_store(path)
+    except (ValueError, KeyError, TypeError):
+        print("Error: Contacts.json malformed")
+        return ContactStore()
+
+_listeners = []  # callback(store, moved) after reload() changed the store
+
+def subscribe(callback):
+    """Call callback(store, moved) whenever reload() applied changes. moved maps the
+    indexes of the previous store to the new one (-1: deleted)."""
+    _listeners.append(callback)
+
+def unsubscribe(callback):
+    if callback in _listeners:
+        _listeners.remove(callback)
+
+def reload(path=CONTACTS_FILE):
+    """Parse path once and apply only what changed to the cached store, then tell the
+    subscribers. Returns False when nothing changed or the file could not be read."""
+    store = _cache["store"] if _cache["key"] is not None and _cache["key"][0] == path else None
+    if store is None:
+        return False  # nothing loaded yet, the next load() reads the file anyway
+    try:
+        key = (path, os.stat(path).st_mtime_ns)
+        contacts = read_contacts(path)
+        inserts, updates, deletes = store.diff(contacts)
+    except OSError:
+        inserts, updates, deletes = (), (), range(len(store))  # file removed: no contacts
+        key = (path, None)
+    except (ValueError, KeyError, TypeError):
+        print("Error: Contacts.json malformed")
+        return False  # most likely caught halfway through a write, keep what we have
+    _cache["key"] = key
+    if not (inserts or updates or deletes):
+        return False
+    store, moved = store.apply(inserts, updates, deletes)
+    _cache["store"] = store
+    for callback in list(_listeners):
+        callback(store, moved)
+    return True
+
+def invalidate():
+    """Forget the cached store, the next load() reads the file again."""
+    _cache["key"] = _cache["store"] = None
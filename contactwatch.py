@@ -0,0 +1,102 @@
+import os
+import ctypes
+import ctypes.util
+import struct
+
+import ui
+import contactstore
+
+# Watches the directory, not the file: a provisioning daemon that writes a temporary
+# file and renames it over Contacts.json replaces the inode a file watch would sit on.
+
+# ---------------- INOTIFY ----------------
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT = struct.Struct("iIII")  # wd, mask, cookie, len, then len bytes of name
+
+SETTLE = 0.1  # seconds without further events before the file is read
+
+_libc = None
+
+def _inotify():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(_libc, "inotify_init1"):
+            raise OSError("inotify not supported")
+    return _libc
+
+# ---------------- WATCHER ----------------
+class ContactWatcher:
+    """Reloads path through contactstore.reload() when it is written, replaced or removed.
+    Runs from the ui event loop; bursts of events are read once, SETTLE seconds later."""
+
+    def __init__(self, path=contactstore.CONTACTS_FILE):
+        libc = _inotify()
+        self.path = path
+        self.name = os.fsencode(os.path.basename(path))
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        directory = os.fsencode(os.path.dirname(os.path.abspath(path)))
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE
+        if libc.inotify_add_watch(self.fd, directory, mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, "inotify_add_watch failed", path)
+        self.timer = None
+        ui.add_reader(self.fd, self.on_readable)
+
+    def fileno(self):
+        return self.fd
+
+    def on_readable(self):
+        try:
+            data = os.read(self.fd, 4096)
+        except BlockingIOError:
+            return
+        pos = 0
+        touched = False
+        while pos < len(data):
+            size = EVENT.unpack_from(data, pos)[3]
+            name = data[pos + EVENT.size:pos + EVENT.size + size].rstrip(b"\0")
+            pos += EVENT.size + size
+            touched = touched or name == self.name
+        if touched:
+            ui.cancel(self.timer)
+            self.timer = ui.call_later(SETTLE, self._reload)
+
+    def _reload(self):
+        self.timer = None
+        contactstore.reload(self.path)
+        contactstore.seal(self.path)  # a plaintext drop is encrypted right away, its rename lands here again
+
+    def close(self):
+        ui.cancel(self.timer)
+        ui.remove_reader(self.fd)
+        os.close(self.fd)
+
+_watcher = None
+
+def start(path=contactstore.CONTACTS_FILE):
+    """Watch path for the rest of the session. Returns False where inotify is unavailable,
+    screens then still notice a changed file when they load it."""
+    global _watcher
+    if _watcher is not None:
+        return True
+    try:
+        _watcher = ContactWatcher(path)
+    except (OSError, AttributeError) as e:
+        print(f"Contact watcher disabled: {e}")
+        return False
+    return True
+
+def stop():
+    global _watcher
+    if _watcher is not None:
+        _watcher.close()
+        _watcher = None
@@ -0,0 +1,89 @@
+# ---------------- T9 ----------------
+T9_KEYS = {
+    "2": "abc", "3": "def", "4": "ghi", "5": "jkl",
+    "6": "mno", "7": "pqrs", "8": "tuv", "9": "wxyz",
+}
+T9_DIGIT = {ch: digit for digit, letters in T9_KEYS.items() for ch in letters}
+
+def t9_digits(text):
+    """Digit sequence typing text on a phone keypad. Digits stay digits, other characters are dropped."""
+    out = []
+    for ch in text.lower():
+        if ch.isdigit():
+            out.append(ch)
+        elif ch in T9_DIGIT:
+            out.append(T9_DIGIT[ch])
+    return "".join(out)
+
+# ---------------- TRIE ----------------
+class DigitTrie:
+    """Prefix tree over digit strings. Every node keeps the first `keep` values inserted below it
+    and a count, so a lookup is one step per digit and never walks the subtree."""
+
+    __slots__ = ("children", "values", "count", "keep")
+
+    def __init__(self, keep=16):
+        self.children = {}
+        self.values = []
+        self.count = 0
+        self.keep = keep
+
+    def insert(self, digits, value):
+        node = self
+        node._add(value)
+        for d in digits:
+            child = node.children.get(d)
+            if child is None:
+                child = node.children[d] = DigitTrie(self.keep)
+            node = child
+            node._add(value)
+
+    def _add(self, value):
+        self.count += 1
+        if len(self.values) < self.keep:
+            self.values.append(value)
+
+    def find(self, digits):
+        """Node for a digit prefix, or None when nothing starts with it."""
+        node = self
+        for d in digits:
+            node = node.children.get(d)
+            if node is None:
+                return None
+        return node
+
+    def lookup(self, digits):
+        """(total matches, first `keep` values) for a digit prefix."""
+        node = self.find(digits)
+        if node is None:
+            return 0, []
+        return node.count, node.values
+
+# ---------------- CONTACT INDEX ----------------
+class ContactDigitIndex:
+    """Number-prefix and T9 nickname lookups over a list of contacts (in display order)."""
+
+    def __init__(self, contacts, keep=16):
+        self.contacts = contacts
+        self.numbers = DigitTrie(keep)
+        self.names = DigitTrie(keep)
+        for i, c in enumerate(contacts):
+            if "number" in c:
+                self.numbers.insert(str(c["number"]), i)
+            self.names.insert(t9_digits(c["nickname"]), i)
+
+    def candidates(self, digits, limit=16):
+        """Contact indexes for typed digits: number matches first, then T9 name matches."""
+        if not digits:
+            return []
+        _, by_number = self.numbers.lookup(digits)
+        _, by_name = self.names.lookup(digits)
+        seen = set()
+        out = []
+        for i in by_number + by_name:
+            if i not in seen:
+                seen.add(i)
+                out.append(i)
+                if len(out) >= limit:
+                    break
+        return out
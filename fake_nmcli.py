@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""Stand-in for nmcli so network.py can run off-device.
+
+Point the pager at it with PAGER_NMCLI=./fake_nmcli.py. Behaviour is set
+through environment variables:
+
+    FAKE_NMCLI_STATE          JSON file holding saved profiles (default /tmp/fake_nmcli.json)
+    FAKE_NMCLI_SSIDS          number of SSIDs a scan returns (default 20)
+    FAKE_NMCLI_SCAN_DELAY     seconds a '--rescan yes' takes (default 0)
+    FAKE_NMCLI_CONNECT_DELAY  seconds a connect takes (default 0)
+    FAKE_NMCLI_DELETE_DELAY   seconds a profile delete takes (default 0)
+    FAKE_NMCLI_UP_DELAY       seconds 'connection up' on a saved profile takes (default 0)
+    FAKE_NMCLI_FAIL           'always', or a comma separated list of SSIDs that refuse to connect
+    FAKE_NMCLI_PROFILES       stale profiles to create when the state file is missing (default 0)
+
+'monitor' prints the device state lines of the real one whenever a connect, 'connection
+up' or delete changes the active network, until it is killed.
+"""
+import fcntl
+import json
+import os
+import sys
+import time
+import zlib
+
+STATE_FILE = os.environ.get("FAKE_NMCLI_STATE", "/tmp/fake_nmcli.json")
+
+
+def env_float(name, default=0.0):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def escape(field):
+    return field.replace("\\", "\\\\").replace(":", "\\:")
+
+
+# ---------------- STATE ----------------
+def load_state(f):
+    f.seek(0)
+    try:
+        return json.load(f)
+    except json.JSONDecodeError:
+        stale = int(env_float("FAKE_NMCLI_PROFILES"))
+        profiles = ["preconfigured", "lo"] + [f"stale-{i}" for i in range(stale)]
+        return {"profiles": profiles, "active": None}
+
+
+def save_state(f, state):
+    f.seek(0)
+    f.truncate()
+    json.dump(state, f)
+
+
+def with_state(fn):
+    """Run fn(state) under an exclusive lock so parallel calls stay consistent. Only the
+    state file is locked: the simulated delays sleep outside, as parallel calls overlap."""
+    fd = os.open(STATE_FILE, os.O_RDWR | os.O_CREAT, 0o600)
+    with os.fdopen(fd, "r+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        state = load_state(f)
+        result = fn(state)
+        save_state(f, state)
+        return result
+
+
+# ---------------- SCAN ----------------
+def scan_results():
+    """Deterministic scan list. Every 7th SSID carries a ':' to exercise escaping."""
+    count = int(env_float("FAKE_NMCLI_SSIDS", 20))
+    networks = [("Hotspot", "", 90), ("Pager-Base", "WPA2", 80)]
+    for i in range(max(count - len(networks), 0)):
+        ssid = f"net:{i:03d}" if i % 7 == 0 else f"Network-{i:03d}"
+        security = "" if i % 3 == 0 else "WPA2"
+        networks.append((ssid, security, 100 - i % 100))
+    networks.append(("", "WPA2", 10))  # hidden network noise entry
+    return networks[:count + 1]
+
+
+# ---------------- COMMANDS ----------------
+def cmd_connection_show(args):
+    for name in with_state(lambda s: list(s["profiles"])):
+        print(f"{escape(name)}:0000-{zlib.crc32(name.encode()) % 10000:04d}:802-11-wireless:")
+    return 0
+
+
+def cmd_connection_delete(args):
+    time.sleep(env_float("FAKE_NMCLI_DELETE_DELAY"))
+    name = args[0] if args else ""
+
+    def delete(state):
+        if name in state["profiles"]:
+            state["profiles"].remove(name)
+            if state.get("active") == name:
+                state["active"] = None
+            return True
+        return False
+
+    if with_state(delete):
+        print(f"Connection '{name}' successfully deleted.")
+        return 0
+    print(f"Error: unknown connection '{name}'.", file=sys.stderr)
+    return 10
+
+
+def cmd_connection_up(args):
+    time.sleep(env_float("FAKE_NMCLI_UP_DELAY"))
+    name = args[1] if args[:1] == ["id"] else (args[0] if args else "")
+    def up(state):
+        if name not in state["profiles"]:
+            return False
+        state["active"] = name
+        return True
+
+    if not with_state(up):
+        print(f"Error: unknown connection '{name}'.", file=sys.stderr)
+        return 10
+    print("Connection successfully activated (D-Bus active path: /org/freedesktop/NetworkManager/ActiveConnection/1)")
+    return 0
+
+
+def cmd_wifi_list(args, fields):
+    if "--rescan" in args and args[args.index("--rescan") + 1:][:1] != ["no"]:
+        time.sleep(env_float("FAKE_NMCLI_SCAN_DELAY"))
+    active = with_state(lambda s: s.get("active"))
+    for ssid, security, signal in scan_results():
+        values = {"IN-USE": "*" if ssid == active else " ", "SSID": escape(ssid),
+                  "SECURITY": security, "SIGNAL": str(signal)}
+        print(":".join(values.get(field, "") for field in fields))
+    return 0
+
+
+def cmd_wifi_connect(args):
+    time.sleep(env_float("FAKE_NMCLI_CONNECT_DELAY"))
+    ssid = args[0] if args else ""
+    known = {s for s, _, _ in scan_results()}
+    fail = os.environ.get("FAKE_NMCLI_FAIL", "")
+    if ssid not in known:
+        print(f"Error: No network with SSID '{ssid}' found.", file=sys.stderr)
+        return 10
+    if fail == "always" or ssid in fail.split(","):
+        print("Error: Connection activation failed: Secrets were required, but not provided.", file=sys.stderr)
+        return 4
+
+    def add(state):
+        if ssid not in state["profiles"]:
+            state["profiles"].append(ssid)
+        state["active"] = ssid
+
+    with_state(add)
+    print(f"Device 'wlan0' successfully activated with '{ssid}'.")
+    return 0
+
+
+def cmd_device(args):
+    state = "connected" if with_state(lambda s: s.get("active")) else "disconnected"
+    print(f"wlan0:wifi:{state}")
+    print("lo:loopback:unmanaged")
+    return 0
+
+
+def cmd_monitor(args):
+    active = with_state(lambda s: s.get("active"))
+    while True:
+        time.sleep(0.2)
+        now = with_state(lambda s: s.get("active"))
+        if now == active:
+            continue
+        if active:
+            print("wlan0: deactivating")
+            print("wlan0: disconnected")
+            print("There's no primary connection")
+        if now:
+            print("wlan0: connecting (prepare)")
+            print("wlan0: connecting (getting IP configuration)")
+            print("wlan0: connected")
+            print(f"'{now}' is now the primary connection")
+            print("Connectivity is now 'full'")
+        sys.stdout.flush()
+        active = now
+
+
+def main(argv):
+    # Drop global options such as -t and -f FIELDS
+    args = []
+    fields = ["SSID", "SECURITY", "SIGNAL"]
+    i = 0
+    while i < len(argv):
+        if argv[i] == "-t":
+            i += 1
+        elif argv[i] == "-f":
+            fields = argv[i + 1].split(",") if i + 1 < len(argv) else fields
+            i += 2
+        else:
+            args.append(argv[i])
+            i += 1
+
+    if args[:2] == ["connection", "show"]:
+        return cmd_connection_show(args[2:])
+    if args[:2] == ["connection", "delete"]:
+        return cmd_connection_delete(args[2:])
+    if args[:2] == ["connection", "up"]:
+        return cmd_connection_up(args[2:])
+    if args[:3] in (["dev", "wifi", "list"], ["device", "wifi", "list"]):
+        return cmd_wifi_list(args[3:], fields)
+    if args[:3] in (["dev", "wifi", "connect"], ["device", "wifi", "connect"]):
+        return cmd_wifi_connect(args[3:])
+    if args in (["dev"], ["device"], ["device", "status"]):
+        return cmd_device(args[1:])
+    if args[:1] == ["monitor"]:
+        return cmd_monitor(args[1:])
+    print(f"Error: fake nmcli does not support: {' '.join(argv)}", file=sys.stderr)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
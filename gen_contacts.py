@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Write a synthetic address book in the Contacts.json format.
+
+Addresses are well-formed v3 onion addresses (56 base32 characters with a
+valid checksum and version byte, random keys), nicknames are unique first
+names with a surname or number where needed, numbers are unique. The file is
+written entry by entry, but keeping names and numbers unique holds all of them in
+memory: about 150 bytes per contact, some 150 MB for a million.
+
+    python3 gen_contacts.py 100000 -o big_contacts.json --seed 1
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+
+FIRST = ("Ada Alan Alice Amir Anna Arne Aya Bao Bea Ben Bjorn Carla Chen Chloe Dana David Diego Elif Ella "
+         "Emil Eva Farah Felix Finn Greta Hana Hugo Ida Igor Ines Ivan Jana Jonas Juan Kai Kemal Lea Leo "
+         "Lina Luca Magnus Maja Marta Mateo Mia Nadia Nils Nora Olga Omar Oskar Paula Pedro Priya Rosa "
+         "Sami Sara Sofia Tariq Theo Timo Una Vera Viktor Wei Yara Yusuf Zoe Zofia").split()
+LAST = ("Berg Costa Dahl Diaz Eriksen Fischer Garcia Haas Ito Jensen Kaya Kim Kowalski Lind Lopez Meyer "
+        "Moreau Nagy Novak Park Petrov Rossi Sato Silva Singh Smith Tanaka Vogel Wagner Weber Yilmaz").split()
+
+
+def onion_address(rng):
+    """A syntactically valid v3 onion address for a random (not real) ed25519 key."""
+    pubkey = bytes(rng.getrandbits(8) for _ in range(32))
+    version = b"\x03"
+    checksum = hashlib.sha3_256(b".onion checksum" + pubkey + version).digest()[:2]
+    return base64.b32encode(pubkey + checksum + version).decode().lower() + ".onion"
+
+
+def nicknames(rng):
+    """Unique nicknames: plain first names first, then with surnames, then numbered."""
+    seen = {}  # name -> next free number for it
+    while True:
+        name = rng.choice(FIRST)
+        if name in seen:
+            name = name + " " + rng.choice(LAST)
+        base = name
+        while name in seen:
+            seen[base] += 1
+            name = "%s %d" % (base, seen[base])
+        seen[name] = 1
+        yield name
+
+
+def contacts(count, seed=None):
+    rng = random.Random(seed)
+    numbers = rng.sample(range(10000, 10000 + max(count * 20, 90000)), count)
+    names = nicknames(rng)
+    for number in numbers:
+        yield {"nickname": next(names), "address": onion_address(rng), "number": number}
+
+
+def write(path, count, seed=None):
+    with open(path, "w") as f:
+        f.write("[\n")
+        for i, contact in enumerate(contacts(count, seed)):
+            f.write(("    " if i == 0 else ",\n    ") + json.dumps(contact))
+        f.write("\n]\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("count", type=int)
+    parser.add_argument("-o", "--output", default="Contacts.json")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    write(args.output, args.count, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import logging
+
+import PIL
+from PIL import Image, ImageFont
+
+# draw.text() has FreeType rasterise every glyph of a string again on each call. Here the
+# glyph bitmaps of each font and size live in a file that is memory-mapped at startup, and
+# strings are put together from them: the first frames after boot do no FreeType work.
+# This holds for fonts laid out on whole pixels without kerning (the hinted monospace
+# fonts the pager uses); any other font, and any unusual draw.text() argument, goes to
+# FreeType as before.
+
+# ---------------- CONFIG ----------------
+CACHE_DIR = os.environ.get("PAGER_GLYPH_CACHE", "GlyphCache")  # "" turns the cache off
+FORMAT = 1  # bump when the file layout changes
+MAGIC = b"PGLY"
+HEADER = struct.Struct("<4sI")  # magic, length of the JSON index; glyph bitmaps follow
+CHARSET = "".join(map(chr, range(32, 127))) + "…"  # rasterised when a cache file is built
+
+_fonts = {}  # (path, size) -> GlyphFont, one per session
+
+# ---------------- FONT ----------------
+class GlyphFont(ImageFont.FreeTypeFont):
+    """A FreeTypeFont whose getmask2()/getbbox()/getlength() use cached glyphs. Glyphs
+    missing from the cache are rasterised once, and written back by flush()."""
+
+    def __init__(self, path, size, cache_path):
+        super().__init__(path, size)
+        self.cache_path = cache_path
+        self.key = _key(path, size)
+        self.glyphs = {}  # char -> (offset or image, width, height, dx, dy, advance)
+        self.images = {}  # char -> core image, made on first use
+        self.usable = False  # whole-pixel advances, no kerning
+        self.grown = False
+        self._map = None
+        if not self._open():
+            self._build()
+
+    def _open(self):
+        try:
+            with open(self.cache_path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+        try:
+            magic, length = HEADER.unpack_from(mapped)
+            index = json.loads(mapped[HEADER.size:HEADER.size + length]) if magic == MAGIC else None
+        except (struct.error, ValueError):
+            index = None
+        if not index or index.get("key") != self.key:
+            mapped.close()
+            return False  # other font file, size, format or Pillow: build it again
+        start = HEADER.size + length
+        self._map = mapped
+        self.usable = index["usable"]
+        self.glyphs = {char: (start + entry[0],) + tuple(entry[1:]) for char, entry in index["glyphs"].items()}
+        return True
+
+    def _build(self):
+        """Rasterise CHARSET and write the cache file."""
+        advances = {char: ImageFont.FreeTypeFont.getlength(self, char) for char in CHARSET}
+        self.usable = all(a == int(a) for a in advances.values()) and not any(
+            ImageFont.FreeTypeFont.getlength(self, a + b) != advances[a] + advances[b]
+            for a in CHARSET for b in CHARSET)
+        if not self.usable:
+            logging.info("Glyph cache not used for %s %s: kerning or fractional advances", self.path, self.size)
+        else:
+            for char in CHARSET:
+                self._rasterise(char)
+        self.grown = True
+        self.save()
+
+    def _rasterise(self, char):
+        mask, (dx, dy) = ImageFont.FreeTypeFont.getmask2(self, char, "L")
+        image = Image.new("L", mask.size)
+        image.im.paste(mask, (0, 0) + mask.size)
+        self.glyphs[char] = (image.tobytes(),) + mask.size + (dx, dy, int(ImageFont.FreeTypeFont.getlength(self, char)))
+        self.grown = True
+
+    def _image(self, char):
+        image = self.images.get(char)
+        if image is None:
+            data, width, height = self.glyphs[char][:3]
+            if isinstance(data, int):
+                data = memoryview(self._map)[data:data + width * height]
+            image = self.images[char] = Image.frombuffer("L", (width, height), data, "raw", "L", 0, 1).im
+        return image
+
+    def _layout(self, text):
+        """[(char, x, y, width, height)] of the glyphs of text and their bounding box, or
+        None when text needs FreeType."""
+        glyphs = self.glyphs
+        missing = [char for char in set(text) if char not in glyphs]
+        if missing:
+            if any(char in "\n\r\t" for char in missing):
+                return None
+            for char in missing:
+                self._rasterise(char)
+        placed = []
+        pen = 0
+        left = top = right = bottom = None
+        for char in text:
+            _, width, height, dx, dy, advance = glyphs[char]
+            x = pen + dx
+            placed.append((char, x, dy, width, height))
+            left = x if left is None else min(left, x)
+            top = dy if top is None else min(top, dy)
+            right = x + width if right is None else max(right, x + width)
+            bottom = dy + height if bottom is None else max(bottom, dy + height)
+            pen += advance
+        return placed, (left, top, right, bottom)
+
+    def _cached(self, text, mode, direction, features, language, stroke_width, anchor, start=None):
+        """Whether a call with these arguments gives the same result from the cache."""
+        return (self.usable and text and isinstance(text, str) and mode in ("", "L")
+                and direction is None and features is None and language is None
+                and not stroke_width and anchor in (None, "la") and (not start or not any(start)))
+
+    def getmask2(self, text, mode="", direction=None, features=None, language=None,
+                 stroke_width=0, anchor=None, ink=0, start=None, *args, **kwargs):
+        layout = None
+        if not args and self._cached(text, mode, direction, features, language, stroke_width, anchor, start):
+            layout = self._layout(text)
+        if layout is None:
+            return super().getmask2(text, mode, direction, features, language, stroke_width,
+                                    anchor, ink, start, *args, **kwargs)
+        placed, (left, top, right, bottom) = layout
+        mask = Image.core.fill("L", (right - left, bottom - top), 0)
+        for char, x, y, width, height in placed:
+            if width and height:
+                # Ink blended over what is there, as FreeType's rendering does where glyphs overhang
+                mask.paste(255, (x - left, y - top, x - left + width, y - top + height), self._image(char))
+        return mask, (left, top)
+
+    def getbbox(self, text, mode="", direction=None, features=None, language=None,
+                stroke_width=0, anchor=None):
+        layout = None
+        if self._cached(text, mode, direction, features, language, stroke_width, anchor):
+            layout = self._layout(text)
+        if layout is None:
+            return super().getbbox(text, mode, direction, features, language, stroke_width, anchor)
+        return layout[1]
+
+    def getlength(self, text, mode="", direction=None, features=None, language=None):
+        if not self._cached(text, mode, direction, features, language, 0, None) or "\n" in text:
+            return super().getlength(text, mode, direction, features, language)
+        glyphs = self.glyphs
+        for char in set(text) - glyphs.keys():
+            self._rasterise(char)
+        return float(sum(glyphs[char][5] for char in text))
+
+    def font_variant(self, font=None, size=None, index=None, encoding=None, layout_engine=None):
+        if font is None and index is None and encoding is None and layout_engine is None:
+            return truetype(self.path, self.size if size is None else size)  # chat.py's smaller text
+        return super().font_variant(font, size, index, encoding, layout_engine)
+
+    def save(self):
+        """Write the cache file if glyphs were added since it was read."""
+        if not self.grown:
+            return
+        index = {}
+        blobs = []
+        offset = 0
+        for char, entry in self.glyphs.items():
+            data, width, height = entry[:3]
+            if isinstance(data, int):
+                data = self._map[data:data + width * height]
+            index[char] = [offset] + list(entry[1:])
+            blobs.append(data)
+            offset += len(data)
+        head = json.dumps({"key": self.key, "usable": self.usable, "glyphs": index}).encode()
+        tmp = self.cache_path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(HEADER.pack(MAGIC, len(head)))
+                f.write(head)
+                for data in blobs:
+                    f.write(data)
+            os.replace(tmp, self.cache_path)
+        except OSError as e:
+            logging.warning("Glyph cache not written: %s", e)
+            return
+        self.grown = False
+
+def _key(path, size):
+    """What the cached bitmaps depend on; a cache file with another key is rebuilt."""
+    st = os.stat(path)
+    return [FORMAT, PIL.__version__, os.path.abspath(path), st.st_size, st.st_mtime_ns, size]
+
+# ---------------- LOADING ----------------
+def truetype(path, size):
+    """ImageFont.truetype(path, size), drawn from the glyph cache when it is enabled."""
+    if not CACHE_DIR:
+        return ImageFont.truetype(path, size)
+    if (path, size) in _fonts:
+        return _fonts[path, size]
+    name = "%s-%s.glyphs" % (os.path.splitext(os.path.basename(path))[0], size)
+    try:
+        font = GlyphFont(path, size, os.path.join(CACHE_DIR, name))
+    except OSError as e:
+        logging.warning("Glyph cache disabled for %s: %s", path, e)
+        return ImageFont.truetype(path, size)
+    _fonts[path, size] = font
+    return font
+
+def flush():
+    """Persist glyphs first seen this session (e.g. accented nicknames)."""
+    for font in _fonts.values():
+        font.save()
+
+# ---------------- CLI ----------------
+def main():
+    """Build the cache of a font and compare a cold FreeType draw with a cached one."""
+    path = sys.argv[1] if len(sys.argv) > 1 else "/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf"
+    sizes = [int(s) for s in sys.argv[2:]] or [28, 20]
+    text = "Show Address"
+    for size in sizes:
+        began = time.perf_counter()
+        font = truetype(path, size)
+        loaded = time.perf_counter() - began
+        plain = ImageFont.truetype(path, size)
+        timings = []
+        for f in (plain, font):
+            began = time.perf_counter()
+            for _ in range(200):
+                f.getmask2(text, "L")
+            timings.append((time.perf_counter() - began) / 200 * 1e6)
+        print(f"{size}px: ready in {loaded * 1000:.1f} ms, {len(font.glyphs)} glyphs, "
+              f"usable={font.usable}; {text!r} FreeType {timings[0]:.0f} us, cached {timings[1]:.0f} us")
+    flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import time
+
+import nav
+from ui import get_key
+from widgets import Widget, ListView, View
+from contactlist import load_contacts, contacts_mtime
+from contactdetails import contact_details, call_handler
+from digitindex import ContactDigitIndex
+from textlayout import text_width
+
+line_height = 40
+top_padding = 60
+visible_items = 4
+SCREEN = "Keypad"
+
+# ---------------- INDEX ----------------
+def get_index():
+    """Digit index over all contacts, rebuilt only when Contacts.json changed."""
+    screen = nav.screen(SCREEN)
+    if screen.state is None or screen.state["mtime"] != contacts_mtime():
+        mtime = contacts_mtime()
+        screen.state = {"mtime": mtime, "index": ContactDigitIndex(load_contacts())}
+    return screen.state["index"]
+
+# ---------------- VIEW ----------------
+class DialHeader(Widget):
+    """Typed digits above a rule, newest on the right when they do not fit."""
+
+    def __init__(self, font):
+        super().__init__((0, 0, 240, top_padding - 5))
+        self.font = font
+        self.digits = ""
+
+    def set(self, digits):
+        self._set(digits=digits)
+
+    def paint(self, view, image, draw):
+        shown = self.digits if self.digits else "Dial"
+        while text_width(self.font, shown) > 232:
+            shown = shown[1:]
+        w = text_width(self.font, shown)
+        draw.text(((240 - w) // 2, 20), shown, fill="WHITE" if self.digits else "GRAY", font=self.font)
+        draw.line([0, top_padding - 6, 240, top_padding - 6], fill="WHITE")
+
+def build_view(disp):
+    header = DialHeader(disp.Font)
+    matches_list = ListView((0, top_padding, 240, top_padding + visible_items * line_height + 1),
+                            disp.Font, visible_items, line_height)
+    return header, matches_list, View(disp, header, matches_list)
+
+# ---------------- KEYPAD LOOP ----------------
+def keypad_screen(disp, font):
+    disp.Font = font
+    index = get_index()
+    digits = ""
+    matches = []
+    header, matches_list, view = build_view(disp)
+    matches_list.set_items(lambda i: index.contacts.name(matches[i]), 0)
+    view.update()
+
+    while True:
+        key = get_key()
+
+        if key == "\x03":  # Ctrl+C
+            break
+        elif key in ("left", "\x1b"):
+            if not digits:
+                break
+            digits = ""
+        elif key == "\x7f":  # backspace
+            digits = digits[:-1]
+        elif len(key) == 1 and key.isdigit():
+            digits += key
+        elif key == "up":
+            matches_list.up()
+        elif key == "down":
+            matches_list.down()
+        elif key in ("\r", " "):
+            if matches:
+                nickname = index.contacts.name(matches[matches_list.selected])
+                nav.call(disp, "Contact", contact_details, nickname, disp, font)
+                view.update()  # nothing to send when the keypad frame came back from cache
+            elif digits:
+                call_handler(digits)
+            continue
+        else:
+            continue
+
+        if key not in ("up", "down"):
+            # Digits changed: one trie step for numbers and one for T9 names
+            matches = index.candidates(digits)
+            header.set(digits)
+            matches_list.set_items(matches_list.label, len(matches))
+
+        view.update()
+        time.sleep(0.05)
@@ -0,0 +1,101 @@
+import os
+import json
+import base64
+import hashlib
+import logging
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # cache stays disabled without the cryptography package
+    Fernet = None
+
+# ---------------- CONFIG ----------------
+KNOWN_NETWORKS_FILE = "known_networks.json"
+KDF_ROUNDS = 100000
+
+_fernet = None
+_salt = None
+_networks = {}  # ssid -> password
+
+# ---------------- KEY ----------------
+def available():
+    return Fernet is not None
+
+def unlock(passcode):
+    """Derive the cache key from the login passcode and load saved networks.
+    Returns False when the cache cannot be used (no cryptography, wrong passcode)."""
+    global _fernet, _salt, _networks
+    if not available() or passcode is None:
+        return False
+
+    stored = _read_file()
+    salt = base64.b64decode(stored["salt"]) if stored else os.urandom(16)
+    key = hashlib.pbkdf2_hmac("sha256", passcode.encode(), salt, KDF_ROUNDS)
+    fernet = Fernet(base64.urlsafe_b64encode(key))
+
+    networks = {}
+    if stored:
+        try:
+            networks = json.loads(fernet.decrypt(stored["token"].encode()))
+        except (InvalidToken, ValueError):
+            logging.warning("Known networks cache could not be decrypted")
+            return False
+
+    _fernet = fernet
+    _networks = networks
+    _salt = salt
+    return True
+
+def is_unlocked():
+    return _fernet is not None
+
+def lock():
+    """Forget the key and the networks in memory, as before the login."""
+    global _fernet, _networks
+    _fernet = None
+    _networks = {}
+
+# ---------------- STORAGE ----------------
+def _read_file():
+    if not os.path.exists(KNOWN_NETWORKS_FILE):
+        return None
+    with open(KNOWN_NETWORKS_FILE, "r") as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            return None
+
+def _save():
+    token = _fernet.encrypt(json.dumps(_networks).encode()).decode()
+    tmp = KNOWN_NETWORKS_FILE + ".tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump({"salt": base64.b64encode(_salt).decode(), "token": token}, f)
+    os.replace(tmp, KNOWN_NETWORKS_FILE)
+
+# ---------------- LOOKUP ----------------
+def lookup(ssid):
+    """Saved password for ssid ("" for open networks), or None if unknown."""
+    if not is_unlocked():
+        return None
+    return _networks.get(ssid)
+
+def saved():
+    """SSIDs of the saved networks, none while locked."""
+    return list(_networks) if is_unlocked() else []
+
+def remember(ssid, password):
+    if not is_unlocked():
+        return
+    _networks[ssid] = password or ""
+    _save()
+
+def forget(ssid):
+    if is_unlocked() and _networks.pop(ssid, None) is not None:
+        _save()
+
+def purge():
+    """Drop every saved network, on disk and in memory."""
+    _networks.clear()
+    if os.path.exists(KNOWN_NETWORKS_FILE):
+        os.remove(KNOWN_NETWORKS_FILE)
@@ -1,16 +1,22 @@
 
 import time
 from . import lcdconfig
+from . import rgb565
 
 class LCD_1inch69(lcdconfig.RaspberryPi):
     width = 240
     height = 280 
+    frame_bytes = 0     # bytes of the last frame or region sent
+    bytes_sent = 0
+    frames_sent = 0
     
     def command(self, cmd):
+        self.spi_wait()   # DC must not change while a frame is still on the bus
         self.digital_write(self.DC_PIN, False)
         self.spi_writebyte([cmd])   
         
     def data(self, val):
+        self.spi_wait()
         self.digital_write(self.DC_PIN, True)
         self.spi_writebyte([val])   
         
@@ -114,6 +120,20 @@ class LCD_1inch69(lcdconfig.RaspberryPi):
 
         self.command(0x29)
   
+    def Sleep(self):
+        """Sleep in (0x10): display and oscillator off, frame memory kept."""
+        self.command(0x10)
+        time.sleep(0.005)
+
+    def Wake(self):
+        """Sleep out (0x11). The panel shows its frame memory again, writes may follow after 5 ms."""
+        self.command(0x11)
+        time.sleep(0.005)
+
+    def IdleMode(self, on):
+        """Idle mode (0x39) shows 8 colours at lower power, 0x38 leaves it."""
+        self.command(0x39 if on else 0x38)
+
     def SetWindows(self, Xstart, Ystart, Xend, Yend, horizontal = 0):
         if horizontal:  
             #set the X coordinates
@@ -145,47 +165,58 @@ class LCD_1inch69(lcdconfig.RaspberryPi):
             self.command(0x2C)    
 
 
+    def _back_buffer(self, width, height):
+        """The transfer buffer not in flight, as a (height, width, 2) array. Two frame-sized
+        buffers alternate: one is encoded into while the other is on the SPI bus."""
+        if getattr(self, "_buffers", None) is None:
+            size = self.width * self.height * 2
+            self._buffers = [self.np.empty(size, dtype = self.np.uint8) for _ in range(2)]
+            self._back = 0
+        self._back ^= 1
+        return self._buffers[self._back][:width * height * 2].reshape(height, width, 2)
+
+    def _transmit(self, pix, madctl, Xstart, Ystart, Xend, Yend, horizontal = 0, background = True):
+        """The one place pixels go to the panel: orientation, window, then the frame exactly once.
+        frame_bytes is the size of the last transfer, bytes_sent and frames_sent the totals."""
+        if madctl is not None:
+            self.command(0x36)
+            self.data(madctl)
+        self.SetWindows(Xstart, Ystart, Xend, Yend, horizontal)
+        self.digital_write(self.DC_PIN,True)
+        self.spi_writebuffer(pix, background)
+        self.frame_bytes = memoryview(pix).nbytes
+        self.bytes_sent += self.frame_bytes
+        self.frames_sent += 1
+
     def ShowImage(self, Image):
         """Set buffer to value of Python Imaging Library image."""
         """Write display buffer to physical display"""
         imwidth, imheight = Image.size
+        #RGB888 >> RGB565
+        pix = rgb565.encode(self.np.asarray(Image), out = self._back_buffer(imwidth, imheight))
         if imwidth == self.height and imheight ==  self.width:
-            print("Landscape screen")
-            img = self.np.asarray(Image)
-            pix = self.np.zeros((self.width, self.height,2), dtype = self.np.uint8)
-            #RGB888 >> RGB565
-            pix[...,[0]] = self.np.add(self.np.bitwise_and(img[...,[0]],0xF8),self.np.right_shift(img[...,[1]],5))
-            pix[...,[1]] = self.np.add(self.np.bitwise_and(self.np.left_shift(img[...,[1]],3),0xE0), self.np.right_shift(img[...,[2]],3))
-            pix = pix.flatten().tolist()
-            
-            self.command(0x36)
-            self.data(0x70)
-            self.SetWindows(0, 0, self.height,self.width, 1)
-            self.digital_write(self.DC_PIN,True)
-            for i in range(0,len(pix),4096):
-                self.spi_writebyte(pix[i:i+4096])
+            self._transmit(pix, 0x70, 0, 0, self.height, self.width, 1)
         else :
-            print("Portrait screen")
-            img = self.np.asarray(Image)
-            pix = self.np.zeros((imheight,imwidth , 2), dtype = self.np.uint8)
-            
-            pix[...,[0]] = self.np.add(self.np.bitwise_and(img[...,[0]],0xF8),self.np.right_shift(img[...,[1]],5))
-            pix[...,[1]] = self.np.add(self.np.bitwise_and(self.np.left_shift(img[...,[1]],3),0xE0), self.np.right_shift(img[...,[2]],3))
-            pix = pix.flatten().tolist()
-            
-            self.command(0x36)
-            self.data(0x00)
-            self.SetWindows(0, 0, self.width, self.height, 0)
-            self.digital_write(self.DC_PIN,True)
-        for i in range(0, len(pix), 4096):
-            self.spi_writebyte(pix[i: i+4096])
-        
+            self._transmit(pix, 0x00, 0, 0, self.width, self.height, 0)
+
+    def EncodeImage(self, Image):
+        """RGB565 bytes of a portrait (width x height) image, to be sent later with ShowEncoded."""
+        return rgb565.encode(self.np.asarray(Image)).tobytes()
+
+    def ShowEncoded(self, buf):
+        """Send a frame made by EncodeImage as is, no conversion."""
+        # bytes cannot change under the transfer; other buffers (render worker slots) may be reused
+        self._transmit(buf, 0x00, 0, 0, self.width, self.height, 0, background = isinstance(buf, bytes))
+
+    def ShowImageRegion(self, Image, Xstart, Ystart):
+        """Write a small portrait image to the panel at (Xstart, Ystart) without touching the rest."""
+        imwidth, imheight = Image.size
+        pix = rgb565.encode(self.np.asarray(Image), out = self._back_buffer(imwidth, imheight))
+        self._transmit(pix, 0x00, Xstart, Ystart, Xstart + imwidth, Ystart + imheight, 0)
 
     def clear(self):
         """Clear contents of image buffer"""
-        _buffer = [0xff] * (self.width*self.height*2)
-        self.SetWindows(0, 0, self.width, self.height)
-        self.digital_write(self.DC_PIN,True)
-        for i in range(0, len(_buffer), 4096):
-            self.spi_writebyte(_buffer[i: i+4096])
+        _buffer = self._back_buffer(self.width, self.height)
+        _buffer.fill(0xff)
+        self._transmit(_buffer, None, 0, 0, self.width, self.height)
         
@@ -0,0 +1,162 @@
+import os
+import mmap
+import stat
+import fcntl
+import struct
+import logging
+import numpy as np
+from . import rgb565
+
+# The LCD_1inch69 interface on top of a Linux framebuffer (/dev/fbN) exposed by fbtft or
+# by DRM's fbdev emulation (panel-mipi-dbi). Frames are encoded straight into the mapped
+# framebuffer; the kernel pushes them to the panel with DMA-driven SPI transfers, no Python
+# loop over chunks and no GIL held while the bus is busy. Both drivers flush through
+# deferred I/O, which only sends the lines of the pages that were written: a region
+# written by ShowImageRegion is the damage rectangle the panel receives.
+
+FBIOGET_VSCREENINFO = 0x4600
+FBIOGET_FSCREENINFO = 0x4602
+FBIOBLANK = 0x4611
+FB_BLANK_UNBLANK = 0
+FB_BLANK_POWERDOWN = 4
+VSCREENINFO = struct.Struct("8I3I3I")  # xres ... bits_per_pixel, grayscale, red, green (offset, length, msb_right)
+FSCREENINFO = struct.Struct("16sLIIIIHHHI")  # id, smem_start, smem_len, type, type_aux, visual, pan/wrap steps, line_length
+BACKLIGHT_DIR = "/sys/class/backlight"
+
+
+class FramebufferDisplay:
+    """Drop-in for LCD_1inch69 writing to a framebuffer device. A plain file works as a
+    stand-in (check_fb.py): it gets the width x height RGB565 layout of the panel."""
+    width = 240
+    height = 280
+    frame_bytes = 0     # bytes of the last frame or region written
+    bytes_sent = 0
+    frames_sent = 0
+
+    def __init__(self, path="/dev/fb1", backlight=None):
+        self.path = path
+        self.backlight = backlight  # /sys/class/backlight/<name>, found in Init() if None
+        self.fd = None
+        self.map = None
+        self.fb = None      # (height, width, 2) bytes of the visible frame, low byte first
+        self.line_length = 0
+        self.bgr = False
+        self.regular = False
+
+    # ---------------- SETUP ----------------
+    def _geometry(self):
+        """(xres, yres, line_length, bgr) of the device; the panel's own for a plain file."""
+        if self.regular:
+            return self.width, self.height, self.width * 2, False
+        var = bytearray(160)
+        fcntl.ioctl(self.fd, FBIOGET_VSCREENINFO, var, True)
+        xres, yres, _, _, _, _, bpp, _, red_offset, _, _, green_offset, green_length, _ = VSCREENINFO.unpack_from(var)
+        fix = bytearray(FSCREENINFO.size + 16)
+        fcntl.ioctl(self.fd, FBIOGET_FSCREENINFO, fix, True)
+        line_length = FSCREENINFO.unpack_from(fix)[-1]
+        if bpp != 16 or (green_offset, green_length) != (5, 6) or red_offset not in (0, 11):
+            raise ValueError("%s is not RGB565 (%d bpp)" % (self.path, bpp))
+        return xres, yres, line_length, red_offset == 0
+
+    def Init(self):
+        self.fd = os.open(self.path, os.O_RDWR)
+        self.regular = stat.S_ISREG(os.fstat(self.fd).st_mode)
+        xres, yres, self.line_length, self.bgr = self._geometry()
+        if (xres, yres) != (self.width, self.height):
+            raise ValueError("%s is %dx%d, the panel needs %dx%d (load the overlay with rotate=0)"
+                             % (self.path, xres, yres, self.width, self.height))
+        size = self.line_length * yres
+        if self.regular and os.fstat(self.fd).st_size < size:
+            os.ftruncate(self.fd, size)
+        self.map = mmap.mmap(self.fd, size)
+        lines = np.ndarray((yres, self.line_length), dtype=np.uint8, buffer=self.map)
+        # Reversed last axis: rgb565.encode writes the high byte first, the framebuffer
+        # keeps pixels in little-endian order
+        self.fb = lines[:, :xres * 2].reshape(yres, xres, 2)[..., ::-1]
+        if self.backlight is None:
+            names = sorted(os.listdir(BACKLIGHT_DIR)) if os.path.isdir(BACKLIGHT_DIR) else []
+            self.backlight = os.path.join(BACKLIGHT_DIR, names[0]) if names else ""
+
+    def module_exit(self):
+        if self.map is not None:
+            self.fb = None
+            self.map.close()
+            self.map = None
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    # ---------------- PIXELS ----------------
+    def _written(self, y0, y1, nbytes):
+        """Count a write of rows y0..y1; a file stand-in is synced like the device would flush."""
+        if self.regular:
+            start = y0 * self.line_length // mmap.PAGESIZE * mmap.PAGESIZE
+            self.map.flush(start, y1 * self.line_length - start)
+        self.frame_bytes = nbytes
+        self.bytes_sent += nbytes
+        self.frames_sent += 1
+
+    def _rgb(self, Image):
+        pixels = np.asarray(Image)
+        return pixels[..., ::-1] if self.bgr else pixels
+
+    def ShowImage(self, Image):
+        pixels = self._rgb(Image)
+        if Image.size == (self.height, self.width):
+            # Landscape, turned a quarter clockwise the way LCD_1inch69 shows it with MADCTL
+            # 0x70 (MX, MV, ML: rows and columns exchanged, then the columns mirrored)
+            pixels = np.rot90(pixels, -1)
+        rgb565.encode(pixels, out=self.fb)
+        self._written(0, self.height, self.width * self.height * 2)
+
+    def EncodeImage(self, Image):
+        """RGB565 bytes of a portrait image in the panel's byte order, as LCD_1inch69 makes them."""
+        return rgb565.encode(np.asarray(Image)).tobytes()
+
+    def ShowEncoded(self, buf):
+        """Copy a frame made by EncodeImage (or the render worker) into the framebuffer."""
+        pixels = np.frombuffer(buf, dtype=np.uint8).reshape(self.height, self.width, 2)
+        if self.bgr:
+            pixels = rgb565.encode(rgb565.decode(buf, self.width, self.height)[..., ::-1])
+        self.fb[...] = pixels
+        self._written(0, self.height, self.width * self.height * 2)
+
+    def ShowImageRegion(self, Image, Xstart, Ystart):
+        """Write a small portrait image at (Xstart, Ystart); only its lines are flushed."""
+        imwidth, imheight = Image.size
+        rgb565.encode(self._rgb(Image), out=self.fb[Ystart:Ystart + imheight, Xstart:Xstart + imwidth])
+        self._written(Ystart, Ystart + imheight, imwidth * imheight * 2)
+
+    def clear(self):
+        self.fb.fill(0xff)
+        self._written(0, self.height, self.width * self.height * 2)
+
+    # ---------------- POWER ----------------
+    def _blank(self, mode):
+        if not self.regular:
+            try:
+                fcntl.ioctl(self.fd, FBIOBLANK, mode)
+            except OSError as e:
+                logging.debug("FBIOBLANK not supported: %s", e)
+
+    def Sleep(self):
+        """Panel off, frame memory kept (the driver sends sleep in on powerdown)."""
+        self._blank(FB_BLANK_POWERDOWN)
+
+    def Wake(self):
+        self._blank(FB_BLANK_UNBLANK)
+
+    def IdleMode(self, on):
+        pass  # the framebuffer API has no 8-colour mode, the dimmed backlight has to do
+
+    def bl_DutyCycle(self, duty):
+        """Backlight through /sys/class/backlight, which the driver owns."""
+        if not self.backlight:
+            return
+        try:
+            with open(os.path.join(self.backlight, "max_brightness")) as f:
+                top = int(f.read())
+            with open(os.path.join(self.backlight, "brightness"), "w") as f:
+                f.write(str(round(top * duty / 100)))
+        except (OSError, ValueError) as e:
+            logging.debug("Backlight not set: %s", e)
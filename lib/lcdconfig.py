@@ -30,13 +30,18 @@
 import os
 import sys
 import time
-import spidev
+import threading
 import logging
 import numpy as np
-from gpiozero import *
+try:
+    import spidev
+    from gpiozero import *
+except ImportError:
+    # Off the Pi: the driver still imports, e.g. for check_spi.py with a virtual SPI device
+    spidev = None
 
 class RaspberryPi:
-    def __init__(self,spi=spidev.SpiDev(0,0),spi_freq=40000000,rst = 27,dc = 25,bl = 18,bl_freq=1000,i2c=None,i2c_freq=100000):
+    def __init__(self,spi=spidev.SpiDev(0,0) if spidev else None,spi_freq=40000000,rst = 27,dc = 25,bl = 18,bl_freq=1000,i2c=None,i2c_freq=100000):
         self.np=np
         self.INPUT = False
         self.OUTPUT = True
@@ -54,6 +59,8 @@ class RaspberryPi:
         if self.SPI!=None :
             self.SPI.max_speed_hz = spi_freq
             self.SPI.mode = 0b00
+        self.SPI_CHUNK = self.spi_bufsiz()
+        self._spi_thread = None
 
     def gpio_mode(self,Pin,Mode,pull_up = None,active_state = True):
         if Mode:
@@ -77,9 +84,45 @@ class RaspberryPi:
         return PWMOutputDevice(Pin,frequency = self.BL_freq)
 
     def spi_writebyte(self, data):
+        self.spi_wait()
         if self.SPI!=None :
             self.SPI.writebytes(data)
 
+    def spi_bufsiz(self):
+        """Largest single transfer the spidev driver accepts (module parameter bufsiz)."""
+        try:
+            with open("/sys/module/spidev/parameters/bufsiz") as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return 4096
+
+    def _spi_send(self, view):
+        for i in range(0, len(view), self.SPI_CHUNK):
+            if hasattr(self.SPI, "writebytes2"):
+                self.SPI.writebytes2(view[i: i+self.SPI_CHUNK])
+            else:
+                self.SPI.writebytes(view[i: i+self.SPI_CHUNK].tolist())
+
+    def spi_writebuffer(self, buf, background=False):
+        """Send a large buffer (bytes, bytearray, numpy array) in bufsiz chunks without
+        building lists. With background=True the transfer runs on a thread and the caller
+        may prepare the next frame; buf must stay untouched until spi_wait()."""
+        self.spi_wait()
+        if self.SPI==None :
+            return
+        view = memoryview(buf).cast("B")
+        if background:
+            self._spi_thread = threading.Thread(target=self._spi_send, args=(view,), daemon=True)
+            self._spi_thread.start()
+        else:
+            self._spi_send(view)
+
+    def spi_wait(self):
+        """Block until a background transfer finished."""
+        if self._spi_thread is not None:
+            self._spi_thread.join()
+            self._spi_thread = None
+
     def bl_DutyCycle(self, duty):
         self.BL_PIN.value = duty / 100
         
@@ -93,6 +136,7 @@ class RaspberryPi:
         return 0
 
     def module_exit(self):
+        self.spi_wait()
         logging.debug("spi end")
         if self.SPI!=None :
             self.SPI.close()
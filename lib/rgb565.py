@@ -0,0 +1,20 @@
+import numpy as np
+
+
+def encode(img, out=None):
+    """RGB888 array (h, w, 3) to the panel's big-endian RGB565 bytes as a (h, w, 2) uint8 array.
+    Writes into out when given, so callers can encode straight into a transfer buffer."""
+    if out is None:
+        out = np.empty(img.shape[:2] + (2,), dtype=np.uint8)
+    r = img[..., 0]
+    g = img[..., 1]
+    b = img[..., 2]
+    np.bitwise_or(np.bitwise_and(r, 0xF8), np.right_shift(g, 5), out=out[..., 0])
+    np.bitwise_or(np.bitwise_and(np.left_shift(g, 3), 0xE0), np.right_shift(b, 3), out=out[..., 1])
+    return out
+
+
+def decode(buf, width, height):
+    """RGB565 bytes back to an RGB888 array (h, w, 3), for off-device inspection."""
+    rgb565 = np.frombuffer(buf, dtype=">u2").reshape(height, width)
+    return np.stack([(rgb565 >> 8) & 0xF8, (rgb565 >> 3) & 0xFC, (rgb565 << 3) & 0xF8], axis=-1).astype(np.uint8)
@@ -0,0 +1,73 @@
+import time
+import numpy as np
+from PIL import Image as PILImage
+from . import rgb565
+
+
+class VirtualDisplay:
+    """Off-device stand-in for LCD_1inch69. Keeps frames in memory instead of sending them."""
+    width = 240
+    height = 280
+
+    def __init__(self, keep_frames=False):
+        self.keep_frames = keep_frames
+        self.frames = []          # images, only filled when keep_frames is set
+        self.frame_times = []     # time.perf_counter() of every ShowImage
+        self.region_times = []    # same for ShowImageRegion
+        self.bytes_sent = 0       # RGB565 pixel bytes that would have gone over SPI
+        self.frame_bytes = 0      # bytes of the last frame or region, as on LCD_1inch69
+        self.frames_sent = 0
+        self.last_image = None
+        self.duty = 0
+        self.asleep = False
+        self.idle = False
+
+    def _count(self, nbytes):
+        self.frame_bytes = nbytes
+        self.bytes_sent += nbytes
+        self.frames_sent += 1
+
+    def Init(self):
+        pass
+
+    def clear(self):
+        self.last_image = None
+
+    def ShowImage(self, Image):
+        self.frame_times.append(time.perf_counter())
+        self.last_image = Image.copy()
+        self._count(Image.size[0] * Image.size[1] * 2)
+        if self.keep_frames:
+            self.frames.append(self.last_image)
+
+    def EncodeImage(self, Image):
+        return rgb565.encode(np.asarray(Image.convert("RGB"))).tobytes()
+
+    def ShowEncoded(self, buf):
+        self.frame_times.append(time.perf_counter())
+        self._count(len(buf))
+        self.last_image = PILImage.fromarray(rgb565.decode(buf, self.width, self.height), "RGB")
+        if self.keep_frames:
+            self.frames.append(self.last_image)
+
+    def ShowImageRegion(self, Image, Xstart, Ystart):
+        self.region_times.append(time.perf_counter())
+        self._count(Image.size[0] * Image.size[1] * 2)
+        if self.last_image is not None:
+            self.last_image = self.last_image.copy()
+            self.last_image.paste(Image, (Xstart, Ystart))
+
+    def bl_DutyCycle(self, duty):
+        self.duty = duty
+
+    def Sleep(self):
+        self.asleep = True
+
+    def Wake(self):
+        self.asleep = False
+
+    def IdleMode(self, on):
+        self.idle = on
+
+    def module_exit(self):
+        pass
@@ -1,26 +1,39 @@
 import os
 import sys
-import termios
-import tty
 import time
 import logging
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 sys.path.append("..")
 from lib import LCD_1inch69
+import ui
+import glyphcache
+from ui import get_key, present, toast, wait_toast
+from textlayout import text_size
 
 # ---------------- DISPLAY SETUP ----------------
 RST = 27
 DC = 25
 BL = 18
 
-disp = LCD_1inch69.LCD_1inch69()
+DISPLAY = os.environ.get("PAGER_DISPLAY", "lcd")  # "virtual": in-memory display, for replay.py off the Pi
+FRAMEBUFFER = os.environ.get("PAGER_FB", "/dev/fb1")  # for "fb": the kernel driver's framebuffer does the SPI
+
+if DISPLAY == "virtual":
+    from lib.virtualdisplay import VirtualDisplay
+    disp = VirtualDisplay()
+elif DISPLAY == "fb":
+    from lib.fbdisplay import FramebufferDisplay
+    disp = FramebufferDisplay(FRAMEBUFFER)
+else:
+    disp = LCD_1inch69.LCD_1inch69()
 disp.Init()
 disp.clear()
-disp.bl_DutyCycle(60)
+disp.bl_DutyCycle(ui.BRIGHTNESS)
 
 # ---------------- FONT ----------------
-Font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf", 28)      # title
-FontSmall = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf", 20)  # attempts
+# Glyphs come from the memory-mapped cache, so the first frames need no FreeType work
+Font = glyphcache.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf", 28)      # title
+FontSmall = glyphcache.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf", 20)  # attempts
 
 # ---------------- CONFIG ----------------
 rotation = 90
@@ -30,21 +43,7 @@ border = 0
 max_attempts = 3
 max_chars = 6
 
-# helper text size
-def text_size(draw, text, font):
-    bbox = draw.textbbox((0,0), text, font=font)
-    return bbox[2]-bbox[0], bbox[3]-bbox[1]
-
-# ---------------- SSH-SAFE INPUT ----------------
-def get_key():
-    fd = sys.stdin.fileno()
-    old_settings = termios.tcgetattr(fd)
-    try:
-        tty.setraw(fd)
-        ch = sys.stdin.read(1)
-    finally:
-        termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
-    return ch
+passcode = None  # set on successful login, used to unlock encrypted stores
 
 # ---------------- DRAW FUNCTION ----------------
 def draw_login(password_chars, attempts_left):
@@ -54,7 +53,7 @@ def draw_login(password_chars, attempts_left):
 
     # Title
     title = "PASSCODE"
-    w, h = text_size(draw, title, Font)
+    w, h = text_size(Font, title)
     x = border + (safe_width - w) // 2
     draw.text((x, border + 40), title, fill="WHITE", font=Font)
 
@@ -71,17 +70,16 @@ def draw_login(password_chars, attempts_left):
 
     # Attempts left
     attempts_text = f"Attempts left: {attempts_left}"
-    w, h = text_size(draw, attempts_text, FontSmall)
+    w, h = text_size(FontSmall, attempts_text)
     x = border + (safe_width - w) // 2
     draw.text((x, slot_y + 90), attempts_text, fill="WHITE", font=FontSmall)
 
-    # Rotate and show
-    image = image.rotate(rotation)
-    disp.ShowImage(image)
+    present(disp, image)
 
 # ---------------- LOGIN HANDLE ----------------
 def login_handle(correct_password="123456"):
     """Function callable by other scripts. Returns True on success, False on failure."""
+    global passcode
     attempts_left = max_attempts
     password_chars = []
     draw_login(password_chars, attempts_left)
@@ -99,8 +97,9 @@ def login_handle(correct_password="123456"):
             success = True  # replace with actual check later
             if success:
                 logging.info("Login successful!")
+                passcode = entered_password
                 draw_login(password_chars, attempts_left)
-                time.sleep(0.5)
+                toast(disp, "Unlocked", FontSmall, 0.5, redraw=False)  # shown over the next screen
                 return True
             else:
                 attempts_left -= 1
@@ -110,13 +109,14 @@ def login_handle(correct_password="123456"):
             if password_chars:
                 password_chars.pop()
                 draw_login(password_chars, attempts_left)
-        elif 32 <= ord(key) <= 126 and len(password_chars) < max_chars:
+        elif len(key) == 1 and 32 <= ord(key) <= 126 and len(password_chars) < max_chars:
             password_chars.append(key)
             draw_login(password_chars, attempts_left)
 
     logging.info("Login failed.")
     draw_login(password_chars, 0)
-    time.sleep(1)
+    toast(disp, "Login failed", FontSmall, 1)
+    wait_toast()  # nothing follows on screen, let it be read
     return False
 
 # ---------------- LOGIN LOOP ----------------
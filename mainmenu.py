@@ -1,17 +1,29 @@
 import os
 import sys
-import termios
-import tty
-import time
+import shutil
 import json
-from PIL import Image, ImageDraw, ImageFont
 sys.path.append("..")
 
 from lib import LCD_1inch69
 from contactlist import menu_loop as contacts_menu
 from addcontact import add_contact
+from keypad import keypad_screen
+import login
 from login import login_handle, disp, Font  # reuse display and font
+import network
 from network import network_manager, cleanup_connections
+import known_networks
+import contactstore
+import contactwatch
+import chatstore
+import vault
+import warmstart
+import netstatus
+import ui
+import glyphcache
+from ui import get_key
+import nav
+from widgets import ListView, View
 
 # ---------------- CONFIG ----------------
 rotation = 90
@@ -21,6 +33,14 @@ line_height = 40
 visible_items = 4
 top_padding = 60
 CONTACTS_FILE = "Contacts.json"
+RENDER_PROCESS = os.environ.get("PAGER_RENDER_PROCESS") == "1"  # encode frames in a worker process
+RECORD_FILE = os.environ.get("PAGER_RECORD")  # log the session's keys for replay.py
+# Contacts and chats under the vault key. Opt-in while login accepts any passcode: the first
+# one typed would seal the stores for good and a typo later would lock them out
+ENCRYPT_STORES = os.environ.get("PAGER_ENCRYPT") == "1"
+WATCH_CONTACTS = os.environ.get("PAGER_WATCH_CONTACTS", "1") == "1"  # pick up a replaced Contacts.json live
+WARM_START = os.environ.get("PAGER_WARM_START", "1") == "1"  # come back to the last screen after a restart
+STATUS_BAR = os.environ.get("PAGER_STATUS_BAR", "1") == "1"  # Wi-Fi state in the top right corner
 
 menu_items = [
     "Keypad",
@@ -31,29 +51,9 @@ menu_items = [
     "Shutdown"
 ]
 
-# ---------------- SSH-SAFE INPUT ----------------
-def get_key():
-    fd = sys.stdin.fileno()
-    old_settings = termios.tcgetattr(fd)
-    try:
-        tty.setraw(fd)
-        ch = sys.stdin.read(1)
-        if ch == '\x1b':
-            ch2 = sys.stdin.read(1)
-            if ch2 == '[':
-                ch3 = sys.stdin.read(1)
-                if ch3 == 'A': return "up"
-                elif ch3 == 'B': return "down"
-                elif ch3 == 'D': return "left"
-                elif ch3 == 'C': return "right"
-            return ''
-        return ch
-    finally:
-        termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
-
 # ---------------- MENU HANDLERS ----------------
 def handle_keypad():
-    print("Keypad selected (not implemented)")
+    keypad_screen(disp, Font)
 
 def handle_contacts():
     # Launch Contacts menu
@@ -66,12 +66,24 @@ def handle_network():
     network_manager(disp, Font)
 
 def handle_destroy_id():
-    print("Destroy ID selected (not implemented)")
+    # Wiping the vault key is the erase, the files left are ciphertext and only unlinked
+    vault.destroy()
+    cleanup_connections(forget=True)  # saved networks and their profiles
+    for path in (CONTACTS_FILE, CONTACTS_FILE + ".tmp"):
+        if os.path.exists(path):
+            os.remove(path)
+    shutil.rmtree(chatstore.CHAT_DIR, ignore_errors=True)
+    contactstore.invalidate()
+    nav.invalidate("Contacts")
+    warmstart.discard()
+    if ENCRYPT_STORES:
+        vault.unlock(login.passcode)  # fresh key for whatever is stored from now on
+    print("Destroy ID selected: vault key, contacts, chats and saved networks wiped")
 
 def handle_shutdown():
     print("Shutting down...")
-    cleanup_connections()
-    raise KeyboardInterrupt  # exit menu
+    warmstart.discard()  # switched off on purpose, the next start is a cold one
+    raise KeyboardInterrupt  # exit menu, cleanup_connections() on the way out keeps saved networks
 
 menu_handlers = [
     handle_keypad,
@@ -82,82 +94,74 @@ menu_handlers = [
     handle_shutdown
 ]
 
-# ---------------- DRAW MENU ----------------
-def draw_menu(selected_index, scroll_index):
-    image = Image.new("RGB", (screen_width, screen_height), "BLACK")
-    draw = ImageDraw.Draw(image)
-    start_y = top_padding
-
-    for i in range(visible_items):
-        item_index = scroll_index + i
-        if item_index >= len(menu_items):
-            break
-        item = menu_items[item_index]
-        y_top = start_y + i * line_height
-        y_bottom = y_top + line_height
-
-        if item_index == selected_index:
-            draw.rectangle([0, y_top, screen_width, y_bottom], fill="WHITE")
-            draw.text((4, y_top + 6), item, fill="BLACK", font=Font)
-            draw.text((screen_width - 20, y_top + 6), ">", fill="BLACK", font=Font)
-        else:
-            draw.text((4, y_top + 6), item, fill="WHITE", font=Font)
-
-    # Scroll triangles
-    triangle_size = 10
-    center_x = screen_width // 2
-    padding = 32
-    if scroll_index > 0:
-        top_y = padding + triangle_size
-        draw.polygon([
-            (center_x, top_y - triangle_size),
-            (center_x - triangle_size, top_y),
-            (center_x + triangle_size, top_y)
-        ], fill="WHITE")
-    if scroll_index + visible_items < len(menu_items):
-        bottom_y = screen_height - padding - triangle_size
-        draw.polygon([
-            (center_x, bottom_y + triangle_size),
-            (center_x - triangle_size, bottom_y),
-            (center_x + triangle_size, bottom_y)
-        ], fill="WHITE")
-
-    rotated_image = image.rotate(rotation)
-    disp.ShowImage(rotated_image)
+# ---------------- VIEW ----------------
+padding = 32  # scroll triangles sit between here and the rows
+menu_list = ListView((0, padding, screen_width, screen_height - padding + 1), Font,
+                     visible_items, line_height, top=top_padding, arrows=True)
+menu_list.set_items(menu_items.__getitem__, len(menu_items))
+menu_view = View(disp, menu_list)
 
 # ---------------- MENU LOOP ----------------
 def menu_loop():
-    selected_index = 0
-    scroll_index = 0
-    draw_menu(selected_index, scroll_index)
+    nav.enter("Main")
+    screen = nav.stack[-1]
+    resume = nav.resume_state("Main")  # warm restart: selection as it was
+    if resume is not None:
+        menu_list.select(resume["selected"], resume["scroll"])
+    else:
+        menu_list.select(0, 0)
+
+    screen.resume = {"selected": menu_list.selected, "scroll": menu_list.scroll}
+
+    child = nav.resume_next()
+    if child in menu_items:
+        # Straight back into the screen that was open, the menu draws when it is left
+        nav.call(disp, child, menu_handlers[menu_items.index(child)])
+        menu_view.update()
+    elif resume is not None and screen.restore(disp):
+        menu_view.adopt()  # the snapshot frame is on screen already
+    else:
+        menu_view.update()
 
     while True:
+        screen.resume = {"selected": menu_list.selected, "scroll": menu_list.scroll}
         key = get_key()
         if key == "\x03":  # Ctrl+C
             break
         elif key in ("\r", " "):
-            # Call corresponding handler
-            menu_handlers[selected_index]()
+            # Call corresponding handler, the menu frame comes back from cache afterwards
+            nav.call(disp, menu_items[menu_list.selected], menu_handlers[menu_list.selected])
         elif key == "up":
-            if selected_index > 0:
-                selected_index -= 1
-                if selected_index < scroll_index:
-                    scroll_index -= 1
+            menu_list.up()
         elif key == "down":
-            if selected_index < len(menu_items)-1:
-                selected_index += 1
-                if selected_index >= scroll_index + visible_items:
-                    scroll_index += 1
+            menu_list.down()
 
-        draw_menu(selected_index, scroll_index)
-        time.sleep(0.05)
+        menu_view.update()  # only what changed; nothing after a restore from cache
 
 # ---------------- RUN ----------------
-if __name__ == "__main__":
+def main():
     try:
-        cleanup_connections()  # Clean up on startup
+        if not network.REMEMBER_NETWORKS:
+            cleanup_connections()  # Clean up on startup
+        if RENDER_PROCESS:
+            ui.start_renderer()
+        if RECORD_FILE:
+            ui.start_recording(RECORD_FILE)
+        if WATCH_CONTACTS:
+            contactwatch.start(CONTACTS_FILE)
         # 1️⃣ Login first
         if login_handle(correct_password="123456"):
+            if network.REMEMBER_NETWORKS:
+                known_networks.unlock(login.passcode)
+                cleanup_connections()  # after unlock: the profiles of saved networks stay
+            if ENCRYPT_STORES and vault.unlock(login.passcode):
+                contactstore.seal(CONTACTS_FILE)
+                contactstore.invalidate()  # anything read while locked came out empty
+            if WARM_START:
+                warmstart.load(disp)  # last frame right away, screens resume in menu_loop
+                warmstart.start([CONTACTS_FILE])
+            if STATUS_BAR:
+                netstatus.start()
             # 2️⃣ Only show main menu if login succeeds
             menu_loop()
         else:
@@ -166,4 +170,12 @@ if __name__ == "__main__":
         print("\nExiting safely")
     finally:
         cleanup_connections()  # Clean up on exit
+        contactwatch.stop()
+        warmstart.stop()
+        netstatus.stop()
+        glyphcache.flush()  # glyphs first drawn this session
+        ui.stop_renderer()
         disp.module_exit()
+
+if __name__ == "__main__":
+    main()
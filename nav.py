@@ -0,0 +1,121 @@
+import ui
+import anim
+
+# ---------------- SCREENS ----------------
+class Screen:
+    """A screen's state object and the last frame it showed, kept between visits."""
+
+    def __init__(self, name):
+        self.name = name
+        self.state = None
+        self.image = None
+        self.encoded = None
+        self.valid = False  # cleared by invalidate(), set again when the screen is redrawn
+        self.resume = None  # JSON-able state to re-enter the screen after a warm restart, see warmstart
+
+    def invalidate(self):
+        self.valid = False
+        self.state = None
+        self.image = None
+        self.encoded = None
+
+    def save_frame(self):
+        self.image, self.encoded = ui.snapshot()
+        self.valid = self.image is not None
+
+    def restore(self, disp):
+        """Show the cached frame again. Returns False when the screen has to redraw."""
+        if not self.valid or self.image is None:
+            return False
+        ui.restore(disp, self.image, self.encoded)
+        return True
+
+_screens = {}
+stack = []
+_listeners = []  # called after every change of the stack
+
+def screen(name):
+    if name not in _screens:
+        _screens[name] = Screen(name)
+    return _screens[name]
+
+def invalidate(name):
+    """Mark a screen's data as changed, so going back to it redraws instead of restoring."""
+    screen(name).invalidate()
+
+def subscribe(fn):
+    _listeners.append(fn)
+
+def unsubscribe(fn):
+    if fn in _listeners:
+        _listeners.remove(fn)
+
+def _changed():
+    for fn in _listeners:
+        fn()
+
+# ---------------- NAVIGATION ----------------
+def enter(name):
+    """Put the root screen on the stack."""
+    stack[:] = [screen(name)]
+    _changed()
+
+def call(disp, name, fn, *args):
+    """Run sub-screen fn(*args) on top of the current screen, then restore the current
+    screen's frame in one transfer. Returns False if it was invalidated and needs a redraw."""
+    parent = stack[-1] if stack else None
+    resuming = resume_next() == name
+    if not resuming:
+        _resume.clear()
+    if resuming and parent is not None:
+        parent.valid = False  # re-entered without being drawn, redraws when we get back
+    elif parent is not None:
+        parent.save_frame()
+        anim.transition_next(parent.image, 1)  # the child's first frame slides in
+    child = screen(name)
+    stack.append(child)
+    _changed()
+    try:
+        fn(*args)
+    finally:
+        stack.pop()
+        _resume.clear()
+        _changed()
+        anim.cancel_transition()  # the child showed nothing
+        last = ui.current_image()
+        if parent is None or last is not parent.image:
+            child.save_frame()  # re-entering the child can start from here
+    if parent is None:
+        return False
+    # The parent's frame slides back in, restored from cache or redrawn by the caller
+    anim.transition_next(last, -1)
+    return parent.restore(disp)
+
+# ---------------- WARM RESTART ----------------
+_resume = []  # [(name, state)] still to re-enter after a warm restart, outermost first
+_warm = {"image": None, "encoded": None}  # frame of the last entry, already on the panel
+
+def resume(entries, image, encoded):
+    """Have the screens of entries [(name, state)] re-enter themselves, in order, with the
+    last one taking over image as its frame. See resume_state()."""
+    _resume[:] = entries
+    _warm.update(image=image, encoded=encoded)
+
+def resume_next():
+    """Name of the next screen to re-enter, None when no warm restart is going on."""
+    return _resume[0][0] if _resume else None
+
+def resume_state(name):
+    """The saved resume state of screen name if a warm restart re-enters it now, else None.
+    A screen with nothing on top of it after this (resume_next() is None) finds the
+    snapshot frame in its cache: its restore() succeeds without sending anything."""
+    if resume_next() != name:
+        _resume.clear()
+        return None
+    state = _resume.pop(0)[1]
+    if not _resume:
+        entry = screen(name)
+        entry.image, entry.encoded = _warm["image"], _warm["encoded"]
+        entry.valid = True
+        _warm.update(image=None, encoded=None)
+    return state
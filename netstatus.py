@@ -0,0 +1,179 @@
+import os
+import logging
+import subprocess
+
+import ui
+import network
+
+# Wi-Fi state in a corner of every screen. One 'nmcli monitor' runs for the whole session
+# and its output is read from the ui event loop as it arrives; nothing is polled. nmcli is
+# only started again for the signal strength when the device (re)connects, and the box is
+# sent alone, and only when what it shows changed.
+
+# ---------------- CONFIG ----------------
+BOX = (212, 22, 236, 36)  # top right corner of the visible part of the screen
+RESTART_DELAY = 5  # seconds before a monitor that exited is started again
+DEVICE_STATES = {
+    "connected": "connected",
+    "connecting": "connecting",
+    "deactivating": "connecting",
+    "disconnected": "disconnected",
+    "unavailable": "disconnected",
+    "unmanaged": "disconnected",
+    "failed": "disconnected",
+}
+
+_state = {"wifi": None, "signal": 0, "limited": False, "device": None}  # wifi: DEVICE_STATES value
+_monitor = {"proc": None, "buf": b"", "timer": None}
+_queries = {}  # args -> Popen of the one-shot nmcli calls in flight
+
+# ---------------- DRAWING ----------------
+def paint(draw, box):
+    """Four signal bars, outlined while not connected, crossed out while disconnected."""
+    wifi = _state["wifi"]
+    if wifi is None:
+        return  # not known yet
+    x0, y0, x1, y1 = box
+    draw.rectangle([x0, y0, x1 - 1, y1 - 1], fill="BLACK")
+    lit = min(_state["signal"] // 25 + 1, 4) if wifi == "connected" else 0
+    fill = "GRAY" if _state["limited"] else "WHITE"
+    for i in range(4):
+        x = x0 + 1 + i * 6
+        top = y1 - 1 - (y1 - y0 - 2) * (i + 1) // 4
+        if i < lit:
+            draw.rectangle([x, top, x + 3, y1 - 1], fill=fill)
+        else:
+            draw.rectangle([x, top, x + 3, y1 - 1], outline="GRAY")
+    if wifi == "disconnected":
+        draw.line([x0, y1 - 1, x1 - 1, y0], fill="WHITE", width=2)
+
+def _set(**values):
+    changed = False
+    for name, value in values.items():
+        if _state[name] != value:
+            _state[name] = value
+            changed = True
+    if changed:
+        ui.update_status()
+
+# ---------------- PARSING ----------------
+def _on_line(line):
+    """One line of 'nmcli monitor'."""
+    device = _state["device"]
+    if device and line.startswith(device + ": "):
+        wifi = DEVICE_STATES.get(line[len(device) + 2:].split(" ", 1)[0])
+        if wifi is None:
+            return  # "using connection ...", "device removed"
+        _set(wifi=wifi)
+        if wifi == "connected":
+            _query_signal()
+    elif line.startswith("Connectivity is now '"):
+        _set(limited=line.split("'")[1] != "full")
+    elif device is None and line.endswith(": device created"):
+        _query_devices()  # a USB dongle plugged in after startup
+
+def _on_devices(lines):
+    for line in lines:
+        device, kind, state = (network.split_terse(line) + ["", ""])[:3]
+        if kind == "wifi":
+            _state["device"] = device
+            _set(wifi=DEVICE_STATES.get(state.split(" ", 1)[0], "disconnected"))
+            if _state["wifi"] == "connected":
+                _query_signal()
+            return
+    _set(wifi="disconnected")  # no Wi-Fi device
+
+def _on_signal(lines):
+    for line in lines:
+        in_use, signal = (network.split_terse(line) + [""])[:2]
+        if in_use.strip() == "*" and signal.isdigit():
+            _set(signal=int(signal))
+            return
+
+# ---------------- NMCLI ----------------
+def _query(args, done):
+    """Run nmcli args in the background; done(lines) once it exited. A query still running
+    is not started twice."""
+    key = tuple(args)
+    if key in _queries:
+        return
+    try:
+        proc = subprocess.Popen([network.NMCLI] + args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except OSError as e:
+        logging.info("nmcli not started: %s", e)
+        return
+    _queries[key] = proc
+    chunks = []
+    fd = proc.stdout.fileno()
+
+    def on_readable():
+        data = os.read(fd, 4096)
+        if data:
+            chunks.append(data)
+            return
+        ui.remove_reader(fd)
+        proc.stdout.close()
+        del _queries[key]
+        if proc.wait() == 0:
+            done(b"".join(chunks).decode(errors="replace").splitlines())
+
+    ui.add_reader(fd, on_readable)
+
+def _query_devices():
+    _query(["-t", "-f", "DEVICE,TYPE,STATE", "device"], _on_devices)
+
+def _query_signal():
+    _query(["-t", "-f", "IN-USE,SIGNAL", "device", "wifi", "list", "--rescan", "no"], _on_signal)
+
+def _on_monitor_readable():
+    proc = _monitor["proc"]
+    data = os.read(proc.stdout.fileno(), 4096)
+    if not data:
+        # NetworkManager went away or nmcli was killed: start over in a while
+        _stop_monitor()
+        _monitor["timer"] = ui.call_later(RESTART_DELAY, start)
+        return
+    # Lines arrive in pieces; a partial one waits in buf for the rest
+    lines = (_monitor["buf"] + data).split(b"\n")
+    _monitor["buf"] = lines.pop()
+    for line in lines:
+        _on_line(line.decode(errors="replace").rstrip("\r"))
+
+def _stop_monitor():
+    proc = _monitor["proc"]
+    if proc is None:
+        return
+    ui.remove_reader(proc.stdout.fileno())
+    if proc.poll() is None:
+        proc.terminate()
+    proc.stdout.close()
+    proc.wait()
+    _monitor["proc"] = None
+    _monitor["buf"] = b""
+
+# ---------------- LIFECYCLE ----------------
+def start():
+    """Show the status bar and follow NetworkManager for the rest of the session."""
+    _monitor["timer"] = None
+    if _monitor["proc"] is not None:
+        return
+    try:
+        proc = subprocess.Popen([network.NMCLI, "monitor"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except OSError as e:
+        logging.info("Status bar disabled: %s", e)
+        return
+    _monitor["proc"] = proc
+    ui.add_reader(proc.stdout.fileno(), _on_monitor_readable)
+    ui.set_status_bar(BOX, paint)
+    _query_devices()  # the state before the first event
+
+def stop():
+    ui.cancel(_monitor["timer"])
+    _monitor["timer"] = None
+    _stop_monitor()
+    for key, proc in list(_queries.items()):
+        ui.remove_reader(proc.stdout.fileno())
+        proc.kill()
+        proc.stdout.close()
+        proc.wait()
+        del _queries[key]
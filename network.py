@@ -1,27 +1,70 @@
+import os
+import logging
 import subprocess
 import time
-from PIL import Image, ImageDraw
-import sys, tty, termios
+from concurrent.futures import ThreadPoolExecutor
+import known_networks
+from ui import get_key, toast, flush
+from widgets import ListView, View, Label, TextField, Button
 
 # ----------- CONFIG -----------
 LINE_HEIGHT = 40
 TOP_PAD = 60
 VISIBLE = 4
 
+NMCLI = os.environ.get("PAGER_NMCLI", "nmcli")  # point at fake_nmcli.py off-device
+SCAN_CACHE_TTL = 0      # seconds a scan result may be reused, 0 = always rescan
+CLEANUP_WORKERS = 4     # parallel 'nmcli connection delete' calls (bench_network.py: ~2x faster than 1)
+REMEMBER_NETWORKS = os.environ.get("PAGER_REMEMBER_NETWORKS") == "1"  # keep profiles + encrypted credentials for one-key reconnect
+
+
+# ----------- COMMAND RUNNER -----------
+def subprocess_runner(args):
+    """Run nmcli with args. Returns (returncode, stdout, stderr) as text."""
+    res = subprocess.run([NMCLI] + args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return res.returncode, res.stdout.decode(errors="replace"), res.stderr.decode(errors="replace")
+
+runner = subprocess_runner
+
+def set_runner(fn):
+    """Replace the nmcli runner (fn takes an argument list, returns (code, out, err))."""
+    global runner
+    runner = fn
+
+def nmcli(*args):
+    flush()  # frames still in the render worker go out before we block on nmcli
+    return runner(list(args))
+
+def split_terse(line):
+    """Split a line of 'nmcli -t' output, honouring escaped '\\:' and '\\\\'."""
+    fields = []
+    field = ""
+    escaped = False
+    for ch in line:
+        if escaped:
+            field += ch
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif ch == ":":
+            fields.append(field)
+            field = ""
+        else:
+            field += ch
+    fields.append(field)
+    return fields
+
 
 # ----------- CONNECTION CLEANUP -----------
 def get_connection_profiles():
     """Get all connection profile names using nmcli."""
-    result = subprocess.run(
-        ['nmcli', '-t', 'connection', 'show'],
-        stdout=subprocess.PIPE
-    )
+    code, out, _ = nmcli('-t', 'connection', 'show')
     profiles = []
-    if result.returncode == 0:
-        for line in result.stdout.decode().splitlines():
+    if code == 0:
+        for line in out.splitlines():
             if not line:
                 continue
-            parts = line.split(':')
+            parts = split_terse(line)
             if len(parts) >= 1:
                 profile_name = parts[0]
                 profiles.append(profile_name)
@@ -29,166 +72,131 @@ def get_connection_profiles():
 
 def delete_profile(profile_name):
     """Delete a connection profile."""
-    result = subprocess.run(
-        ['nmcli', 'connection', 'delete', profile_name],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
-    )
-    return result.returncode == 0
-
-def cleanup_connections():
-    """Remove all connection profiles except 'preconfigured' and 'lo'."""
-    profiles = get_connection_profiles()
-    for profile in profiles:
-        if profile not in ("preconfigured", "lo"):
+    code, _, _ = nmcli('connection', 'delete', profile_name)
+    return code == 0
+
+def cleanup_connections(forget=False):
+    """Remove connection profiles except 'preconfigured' and 'lo'. While REMEMBER_NETWORKS is on,
+    saved networks keep their credentials and profiles unless forget is set (Destroy ID). With
+    the cache still locked (no login, wrong passcode) no profile is removed: which of them
+    belong to saved networks is only known to the encrypted cache."""
+    keep = {"preconfigured", "lo"}
+    if forget or not REMEMBER_NETWORKS or not known_networks.available():
+        known_networks.purge()
+    elif known_networks.is_unlocked():
+        keep.update(known_networks.saved())
+    else:
+        return
+    profiles = [p for p in get_connection_profiles() if p not in keep]
+    if CLEANUP_WORKERS > 1 and len(profiles) > 1:
+        with ThreadPoolExecutor(max_workers=CLEANUP_WORKERS) as pool:
+            list(pool.map(delete_profile, profiles))
+    else:
+        for profile in profiles:
             delete_profile(profile)
+    _scan_cache["time"] = 0
 
 # ----------- WIFI SCAN -----------
-def scan_wifi():
-    """Always perform a fresh scan and return clean list."""
-    result = subprocess.run(
-        ['nmcli', '-t', '-f', 'SSID,SECURITY,SIGNAL', 'dev', 'wifi', 'list', '--rescan', 'yes'],
-        stdout=subprocess.PIPE
-    )
+_scan_cache = {"time": 0, "networks": []}
+
+def scan_wifi(max_age=None):
+    """Scan and return clean list. Reuses a scan younger than max_age (default SCAN_CACHE_TTL)."""
+    if max_age is None:
+        max_age = SCAN_CACHE_TTL
+    if max_age > 0 and time.monotonic() - _scan_cache["time"] < max_age:
+        return list(_scan_cache["networks"])
+
+    code, out, _ = nmcli('-t', '-f', 'SSID,SECURITY,SIGNAL', 'dev', 'wifi', 'list', '--rescan', 'yes')
 
     networks = []
-    if result.returncode == 0:
-        for line in result.stdout.decode().splitlines():
+    if code == 0:
+        for line in out.splitlines():
             if not line:
                 continue
-            ssid, security, signal = (line.split(':') + ["", "", ""])[:3]
+            ssid, security, signal = (split_terse(line) + ["", "", ""])[:3]
 
             # Skip blank SSIDs (noise entries)
             if not ssid.strip():
                 continue
 
             networks.append((ssid, security, signal))
-    return networks
+        _scan_cache["time"] = time.monotonic()
+        _scan_cache["networks"] = networks
+    return list(networks)
 
 
 # ----------- CONNECT -----------
 def connect_to(ssid, password=""):
     if not password:  # Open network
-        cmd = ['nmcli', 'device', 'wifi', 'connect', ssid]
+        cmd = ['device', 'wifi', 'connect', ssid]
     else:  # Secured network
-        cmd = ['nmcli', 'device', 'wifi', 'connect', ssid, 'password', password]
-
-    res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    print("CMD:", cmd)
-    print("STDOUT:", res.stdout.decode())
-    print("STDERR:", res.stderr.decode())
-    print("RETURN CODE:", res.returncode)
-    
-    return res.returncode == 0
-
-# ----------- INPUT -----------
-def get_key():
-    fd = sys.stdin.fileno()
-    old = termios.tcgetattr(fd)
-    try:
-        tty.setraw(fd)
-        ch = sys.stdin.read(1)
-
-        if ch == '\x1b':  # arrow keys
-            if sys.stdin.read(1) == '[':
-                ch2 = sys.stdin.read(1)
-                return {"A": "up", "B": "down", "C": "right", "D": "left"}.get(ch2, "")
-            return ""
-        return ch
-    finally:
-        termios.tcsetattr(fd, termios.TCSADRAIN, old)
-
-
-# ----------- MENU DRAW -----------
-def draw_menu(disp, networks, selected, scroll):
-    img = Image.new("RGB", (240, 280), "BLACK")
-    draw = ImageDraw.Draw(img)
-
-    for i in range(VISIBLE):
-        idx = scroll + i
-        if idx >= len(networks):
-            break
-
-        ssid, sec, sig = networks[idx]
-        y = TOP_PAD + i * LINE_HEIGHT
-
-        label = f"{ssid} [{'Open' if sec in ('', '--') else 'Sec'}]"
-
-        if idx == selected:
-            draw.rectangle([0, y, 240, y + LINE_HEIGHT], fill="WHITE")
-            draw.text((4, y + 6), label, fill="BLACK", font=disp.Font)
-            draw.text((220, y + 6), ">", fill="BLACK", font=disp.Font)
-        else:
-            draw.text((4, y + 6), label, fill="WHITE", font=disp.Font)
-
-    disp.ShowImage(img.rotate(90))
+        cmd = ['device', 'wifi', 'connect', ssid, 'password', password]
+
+    code, _, err = nmcli(*cmd)
+    if code != 0:
+        # Never the whole command: it carries the password
+        logging.info("nmcli device wifi connect %s failed (%d): %s", ssid, code, err.strip())
+    return code == 0
+
+def connection_up(profile_name):
+    """Activate a retained profile without a new 'device wifi connect'."""
+    code, _, _ = nmcli('connection', 'up', 'id', profile_name)
+    return code == 0
+
+def reconnect(ssid, password):
+    """Reconnect to a known network: retained profile first, saved credentials second."""
+    if connection_up(ssid) or connect_to(ssid, password):
+        return True
+    known_networks.forget(ssid)  # stale password, ask again next time
+    return False
+
+# ----------- MENU VIEW -----------
+def network_label(networks, idx):
+    ssid, sec, _ = networks[idx]
+    if known_networks.lookup(ssid) is not None:
+        return f"{ssid} [Saved]"
+    return f"{ssid} [{'Open' if sec in ('', '--') else 'Sec'}]"
+
+def build_menu(disp):
+    network_list = ListView((0, TOP_PAD, 240, TOP_PAD + VISIBLE * LINE_HEIGHT + 1), disp.Font, VISIBLE, LINE_HEIGHT)
+    return network_list, View(disp, network_list)
 
 
 # ----------- PASSWORD ENTRY -----------
 def prompt_password(disp, ssid):
-    password = ""
-    input_active = True  # True = input field, False = button
-    cursor_visible = True
-    toggle = time.time()
+    box_y = TOP_PAD + 50
+    btn_y = box_y + LINE_HEIGHT + 20
+    field = TextField((10, box_y, 231, box_y + LINE_HEIGHT + 1), disp.Font, mask="*")
+    button = Button((10, btn_y, 231, btn_y + LINE_HEIGHT + 1), "Connect", disp.Font)
+    view = View(disp, Label((10, TOP_PAD, 240, TOP_PAD + LINE_HEIGHT), "Password", disp.Font), field, button)
 
     while True:
-        if time.time() - toggle > 0.5:
-            cursor_visible = not cursor_visible
-            toggle = time.time()
-
-        img = Image.new("RGB", (240, 280), "BLACK")
-        draw = ImageDraw.Draw(img)
-
-        title = f"Password"
-        draw.text((10, TOP_PAD), title, fill="WHITE", font=disp.Font)
-
-        # Input box
-        box_y = TOP_PAD + 50
-        if input_active:
-            draw.rectangle([10, box_y, 230, box_y + LINE_HEIGHT], fill="WHITE")
-            show = ("*" * len(password)) + ("|" if cursor_visible else "")
-            draw.text((14, box_y + 6), show, fill="BLACK", font=disp.Font)
-        else:
-            draw.rectangle([10, box_y, 230, box_y + LINE_HEIGHT], outline="WHITE")
-            show = "*" * len(password)
-            draw.text((14, box_y + 6), show, fill="WHITE", font=disp.Font)
-
-        # Connect button
-        btn_y = box_y + LINE_HEIGHT + 20
-        btn_text = "Connect"
-        if not input_active:
-            draw.rectangle([10, btn_y, 230, btn_y + LINE_HEIGHT], fill="WHITE")
-            draw.text((14, btn_y + 6), btn_text, fill="BLACK", font=disp.Font)
-        else:
-            draw.rectangle([10, btn_y, 230, btn_y + LINE_HEIGHT], outline="WHITE")
-            draw.text((14, btn_y + 6), btn_text, fill="WHITE", font=disp.Font)
-
-        disp.ShowImage(img.rotate(90))
+        # Only the field and button repaint; the caret blinks on its own timer
+        button.focus(not field.active)
+        view.update()
 
         key = get_key()
         if key == "up":
-            input_active = True
+            field.activate(True)
         elif key == "down":
-            input_active = False
+            field.activate(False)
         elif key in ("\r", " "):
-            if not input_active:  # Button pressed
-                return password
+            if not field.active:  # Button pressed
+                field.stop()
+                return field.text
         elif key in ("\x1b", "left"):
+            field.stop()
             return None
-        elif input_active:
+        elif field.active:
             if key == "\x7f":
-                password = password[:-1]
+                field.set(field.text[:-1])
             elif key and key.isprintable():
-                password += key
+                field.set(field.text + key)
 
 
 # ----------- NOTIFICATION -----------
 def notify(disp, msg):
-    img = Image.new("RGB", (240, 280), "BLACK")
-    draw = ImageDraw.Draw(img)
-    draw.text((20, 130), msg, fill="WHITE", font=disp.Font)
-    disp.ShowImage(img.rotate(90))
-    time.sleep(1.5)
+    toast(disp, msg, disp.Font, 1.5)
 
 
 # ----------- MAIN MENU LOOP -----------
@@ -200,10 +208,9 @@ def network_manager(disp, font):
         notify(disp, "No networks")
         return
 
-    sel = 0
-    scroll = 0
-
-    draw_menu(disp, networks, sel, scroll)
+    network_list, view = build_menu(disp)
+    network_list.set_items(lambda idx: network_label(networks, idx), len(networks))
+    view.update()
 
     while True:
         key = get_key()
@@ -211,29 +218,31 @@ def network_manager(disp, font):
         if key in ("left", "\x1b"):
             return
 
-        if key == "up" and sel > 0:
-            sel -= 1
-            if sel < scroll:
-                scroll -= 1
+        if key == "up":
+            network_list.up()
 
-        elif key == "down" and sel < len(networks) - 1:
-            sel += 1
-            if sel >= scroll + VISIBLE:
-                scroll += 1
+        elif key == "down":
+            network_list.down()
 
         elif key in ("\r", " "):
-            ssid, sec, _ = networks[sel]
-            if sec in ("", "--"):
+            ssid, sec, _ = networks[network_list.selected]
+            saved = known_networks.lookup(ssid) if REMEMBER_NETWORKS else None
+            pwd = ""
+            if saved is not None:
+                success = reconnect(ssid, saved)
+            elif sec in ("", "--"):
                 success = connect_to(ssid)
             else:
                 pwd = prompt_password(disp, ssid)
                 success = connect_to(ssid, pwd) if pwd else False
 
+            if success and REMEMBER_NETWORKS and saved is None:
+                known_networks.remember(ssid, pwd)
+
             notify(disp, "Connected ✓" if success else "Failed ✗")
 
             # Always full rescan so hotspot appears again
-            networks = scan_wifi()
-            sel = 0
-            scroll = 0
+            networks = scan_wifi(max_age=0)
+            network_list.set_items(lambda idx: network_label(networks, idx), len(networks))
 
-        draw_menu(disp, networks, sel, scroll)
+        view.update()
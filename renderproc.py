@@ -0,0 +1,93 @@
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from PIL import Image
+
+from lib import rgb565
+
+# Shared memory layout: one RGB888 input frame, then two RGB565 output frames.
+# The worker encodes frame N+1 into one output slot while the main process
+# sends frame N from the other.
+
+class RenderProcess:
+    """Rotation and RGB565 encoding in a worker process, so the main process only
+    handles input and SPI transfers. Frames come back through on_frame(encoded, seq)
+    from the ui event loop."""
+
+    def __init__(self, width, height, rotation, on_frame):
+        self.width = width
+        self.height = height
+        self.rgb_size = width * height * 3
+        self.frame_size = width * height * 2
+        self.on_frame = on_frame
+        self.shm = shared_memory.SharedMemory(create=True, size=self.rgb_size + 2 * self.frame_size)
+        self.conn, child = multiprocessing.Pipe()
+        # fork: the worker must not import the screens again (login.py sets up the panel on import)
+        ctx = multiprocessing.get_context("fork")
+        self.proc = ctx.Process(target=_worker, args=(self.shm.name, child, width, height, rotation), daemon=True)
+        self.proc.start()
+        child.close()
+        self.busy = False
+        self.slot = 0
+        self.pending = None  # (image, seq) waiting for the worker
+
+    def fileno(self):
+        return self.conn.fileno()
+
+    def submit(self, image, seq):
+        """Queue image for encoding. While the worker is busy only the newest frame is kept."""
+        if self.busy:
+            self.pending = (image, seq)
+            return
+        self.shm.buf[:self.rgb_size] = image.tobytes()
+        self.conn.send((seq, self.slot))
+        self.slot = 1 - self.slot
+        self.busy = True
+
+    def frame(self, slot):
+        start = self.rgb_size + slot * self.frame_size
+        return self.shm.buf[start:start + self.frame_size]
+
+    def on_readable(self):
+        """Worker finished a frame: start the next one, then send this one."""
+        seq, slot = self.conn.recv()
+        self.busy = False
+        if self.pending is not None:
+            self.submit(*self.pending)
+            self.pending = None
+        self.on_frame(self.frame(slot), seq)
+
+    def close(self):
+        try:
+            self.conn.send(None)
+            self.proc.join(1)
+        except (BrokenPipeError, OSError):
+            pass
+        if self.proc.is_alive():
+            self.proc.terminate()
+        self.conn.close()
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _worker(shm_name, conn, width, height, rotation):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    rgb_size = width * height * 3
+    frame_size = width * height * 2
+    try:
+        while True:
+            msg = conn.recv()
+            if msg is None:
+                break
+            seq, slot = msg
+            image = Image.frombuffer("RGB", (width, height), bytes(shm.buf[:rgb_size]), "raw", "RGB", 0, 1)
+            rotated = np.asarray(image.rotate(rotation))
+            out = np.ndarray((height, width, 2), dtype=np.uint8, buffer=shm.buf,
+                             offset=rgb_size + slot * frame_size)
+            rgb565.encode(rotated, out=out)
+            del out
+            conn.send((seq, slot))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        shm.close()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Play a recorded session back against the virtual display and report how it performed.
+
+Record on the device (or anywhere with a terminal):
+
+    PAGER_RECORD=session.jsonl python3 mainmenu.py
+
+then replay it, e.g. ten times faster against a big address book:
+
+    python3 replay.py session.jsonl --speed 10 --contacts big_contacts.json
+
+The whole app runs as mainmenu.main() does, from login on, in a scratch
+directory with a copy of the contacts file and fake_nmcli.py as nmcli, so a
+replay never touches the real data or radio. The idle dimmer is off. For every
+key it measures the time until the first frame went out and until the UI waited
+for input again, plus the frames and SPI bytes it caused. --speed 0 replays
+without any pauses between keys.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class Replay:
+    """ui.key_source that hands out the recorded keys at their (scaled) times and measures each one."""
+
+    def __init__(self, events, disp, speed):
+        self.events = events
+        self.disp = disp
+        self.speed = speed
+        self.i = 0
+        self.due = None
+        self.open = None      # measurement of the key being handled
+        self.results = []
+
+    def _close(self):
+        if self.open is None:
+            return
+        m = self.open
+        self.open = None
+        disp = self.disp
+        frames = disp.frame_times[m["frame_index"]:] + disp.region_times[m["region_index"]:]
+        self.results.append({
+            "key": m["key"],
+            "first_frame_ms": (min(frames) - m["start"]) * 1000 if frames else None,
+            "done_ms": (time.perf_counter() - m["start"]) * 1000,
+            "frames": disp.frames_sent - m["frames"],
+            "bytes": disp.bytes_sent - m["bytes"],
+        })
+
+    def __call__(self, timeout):
+        self._close()  # the UI is waiting for input again, the previous key is handled
+        if self.i >= len(self.events):
+            raise KeyboardInterrupt  # end of session, unwinds like Shutdown does
+        event = self.events[self.i]
+        if self.due is None:
+            gap = event["t"] - (self.events[self.i - 1]["t"] if self.i else 0)
+            self.due = time.perf_counter() + (gap / self.speed if self.speed else 0)
+        wait = self.due - time.perf_counter()
+        if timeout is not None and timeout < wait:
+            time.sleep(timeout)
+            return None
+        if wait > 0:
+            time.sleep(wait)
+        self.i += 1
+        self.due = None
+        disp = self.disp
+        self.open = {"key": event["key"], "start": time.perf_counter(),
+                     "frame_index": len(disp.frame_times), "region_index": len(disp.region_times),
+                     "frames": disp.frames_sent, "bytes": disp.bytes_sent}
+        return event["key"]
+
+
+def load_session(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def report(results, disp, elapsed, per_event):
+    if per_event:
+        print("%5s  %-8s %10s %10s %7s %10s" % ("#", "key", "first ms", "done ms", "frames", "bytes"))
+        for n, r in enumerate(results):
+            first = "%10.1f" % r["first_frame_ms"] if r["first_frame_ms"] is not None else "%10s" % "-"
+            print("%5d  %-8s %s %10.1f %7d %10d" % (n, repr(r["key"]), first, r["done_ms"], r["frames"], r["bytes"]))
+    done = [r["done_ms"] for r in results]
+    first = [r["first_frame_ms"] for r in results if r["first_frame_ms"] is not None]
+    print("events %d  wall %.2f s  frames %d (%d full, %d regions)  SPI bytes %d" % (
+        len(results), elapsed, disp.frames_sent, len(disp.frame_times), len(disp.region_times), disp.bytes_sent))
+    for name, values in (("key to first frame", first), ("key to idle", done)):
+        if values:
+            values = sorted(values)
+            print("%-20s median %8.1f ms   p95 %8.1f   max %8.1f" % (
+                name, statistics.median(values), values[int(len(values) * 0.95) - 1 if len(values) > 1 else 0],
+                values[-1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("session", help="JSON lines written with PAGER_RECORD")
+    parser.add_argument("--speed", type=float, default=1.0, help="time compression, 0 = no pauses")
+    parser.add_argument("--contacts", default=os.path.join(HERE, "Contacts.json"))
+    parser.add_argument("--render-process", action="store_true", help="encode frames in the worker process")
+    parser.add_argument("--per-event", action="store_true", help="print a line for every key")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory")
+    args = parser.parse_args()
+
+    events = load_session(args.session)
+    workdir = tempfile.mkdtemp(prefix="pager-replay-")
+    shutil.copy(args.contacts, os.path.join(workdir, "Contacts.json"))
+    os.environ.update({
+        "PAGER_DISPLAY": "virtual",
+        "PAGER_NMCLI": os.path.join(HERE, "fake_nmcli.py"),
+        "FAKE_NMCLI_STATE": os.path.join(workdir, "nmcli_state.json"),
+        "PAGER_RENDER_PROCESS": "1" if args.render_process else "0",
+    })
+    os.environ.pop("PAGER_RECORD", None)
+    os.chdir(workdir)
+    sys.path.insert(0, HERE)
+
+    import ui
+    ui.DIM_AFTER = 0
+    import mainmenu
+    player = Replay(events, mainmenu.disp, args.speed)
+    ui.key_source = player
+
+    start = time.perf_counter()
+    try:
+        mainmenu.main()
+    finally:
+        player._close()
+        elapsed = time.perf_counter() - start
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    report(player.results, mainmenu.disp, elapsed, args.per_event)
+    if player.i < len(events):
+        print("session ended early: %d of %d keys used" % (player.i, len(events)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+from functools import lru_cache
+
+ELLIPSIS = "…"
+
+# Every function here is memoised per (font, text, width): after the first frame
+# a screen that shows the same strings does no text measurement at all.
+
+# ---------------- MEASURE ----------------
+@lru_cache(maxsize=2048)
+def text_size(font, text):
+    """(width, height) of the inked area of text, as draw.textbbox() reports it."""
+    left, top, right, bottom = font.getbbox(text)
+    return right - left, bottom - top
+
+@lru_cache(maxsize=2048)
+def text_width(font, text):
+    """Advance width of text, i.e. where the next character would start."""
+    return font.getlength(text)
+
+@lru_cache(maxsize=1024)
+def centered_x(font, text, width=240):
+    return (width - text_size(font, text)[0]) // 2
+
+# ---------------- FIT ----------------
+@lru_cache(maxsize=1024)
+def ellipsize(font, text, width):
+    """text, or its longest prefix plus an ellipsis that fits width pixels."""
+    if text_width(font, text) <= width:
+        return text
+    lo, hi = 0, len(text)
+    while lo < hi:  # longest prefix that fits together with the ellipsis
+        mid = (lo + hi + 1) // 2
+        if text_width(font, text[:mid] + ELLIPSIS) <= width:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo] + ELLIPSIS
+
+def _split_word(font, word, width):
+    """Break a word wider than width (onion addresses) into pieces that fit."""
+    pieces = []
+    while text_width(font, word) > width:
+        lo, hi = 1, len(word) - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if text_width(font, word[:mid]) <= width:
+                lo = mid
+            else:
+                hi = mid - 1
+        pieces.append(word[:lo])
+        word = word[lo:]
+    return pieces, word
+
+@lru_cache(maxsize=1024)
+def wrap(font, text, width, max_lines=None):
+    """Lines of text that fit width pixels, breaking at spaces and inside over-long words.
+    With max_lines the last kept line ends in an ellipsis when text does not fit."""
+    lines = []
+    line = ""
+    for word in text.split(" "):
+        candidate = word if not line else line + " " + word
+        if text_width(font, candidate) <= width:
+            line = candidate
+            continue
+        if line:
+            lines.append(line)
+        pieces, line = _split_word(font, word, width)
+        lines.extend(pieces)
+    lines.append(line)
+
+    if max_lines is not None and len(lines) > max_lines:
+        lines = lines[:max_lines]
+        lines[-1] = ellipsize(font, lines[-1] + ELLIPSIS, width)
+    return tuple(lines)
+
+def scroll_window(lines, first, count):
+    """Visible slice of wrapped lines for a scroll position. Returns (lines, more_above, more_below)."""
+    first = max(0, min(first, len(lines) - count))
+    return lines[first:first + count], first > 0, first + count < len(lines)
@@ -0,0 +1,534 @@
+import os
+import sys
+import json
+import time
+import select
+import termios
+import tty
+from PIL import Image, ImageDraw
+
+# ---------------- CONFIG ----------------
+rotation = 90
+screen_width = 240
+screen_height = 280
+ESC_TIMEOUT = 0.05  # a lone ESC is a key, ESC [ X is an arrow
+
+key_source = None  # callable(timeout) -> key or None, replaces the terminal (benchmarks, replay)
+
+# Power: dim the backlight after DIM_AFTER idle seconds, put the panel to sleep after SLEEP_AFTER (0 = never)
+BRIGHTNESS = 60
+DIM_BRIGHTNESS = 10
+DIM_AFTER = float(os.environ.get("PAGER_DIM_AFTER", "30"))
+SLEEP_AFTER = float(os.environ.get("PAGER_SLEEP_AFTER", "120"))
+SLEEP_MODE = os.environ.get("PAGER_SLEEP_MODE", "sleep")  # "sleep": 0x10 and backlight off, "idle": 0x39 dimmed
+
+# ---------------- TIMERS ----------------
+_timers = []  # [deadline, callback] pairs, run from get_key()
+
+def call_later(delay, callback):
+    """Run callback after delay seconds, from inside the event loop. Returns a handle for cancel()."""
+    timer = [time.monotonic() + delay, callback]
+    _timers.append(timer)
+    return timer
+
+def cancel(timer):
+    if timer in _timers:
+        _timers.remove(timer)
+
+def next_deadline():
+    return min((t[0] for t in _timers), default=None)
+
+def run_timers():
+    now = time.monotonic()
+    due = [t for t in _timers if t[0] <= now]
+    for timer in due:
+        _timers.remove(timer)
+        timer[1]()
+
+# ---------------- READERS ----------------
+_readers = {}  # fd -> callback, watched next to the keyboard (render worker, file watchers, ...)
+
+def add_reader(fd, callback):
+    """Call callback() from the event loop whenever fd is readable."""
+    _readers[fd] = callback
+
+def remove_reader(fd):
+    _readers.pop(fd, None)
+
+def _dispatch(ready):
+    for fd in ready:
+        callback = _readers.get(fd)
+        if callback is not None:
+            callback()
+
+# ---------------- INPUT ----------------
+def _read_char(fd, timeout):
+    ready, _, _ = select.select([fd], [], [], timeout)
+    if not ready:
+        return None
+    return os.read(fd, 1).decode(errors="ignore")
+
+def read_key(timeout=None):
+    """Wait up to timeout seconds (None = forever) for one decoded key. Returns None on timeout."""
+    if key_source is not None:
+        if _readers:
+            _dispatch(select.select(list(_readers), [], [], 0)[0])
+        return key_source(timeout)
+
+    fd = sys.stdin.fileno()
+    old = termios.tcgetattr(fd)
+    try:
+        tty.setraw(fd)
+        ready, _, _ = select.select([fd] + list(_readers), [], [], timeout)
+        _dispatch(ready)
+        if fd not in ready:
+            return None
+        ch = os.read(fd, 1).decode(errors="ignore")
+        if ch == '\x1b':
+            if _read_char(fd, ESC_TIMEOUT) != '[':
+                return '\x1b'
+            ch3 = _read_char(fd, ESC_TIMEOUT)
+            return {"A": "up", "B": "down", "C": "right", "D": "left"}.get(ch3, "")
+        return ch
+    finally:
+        termios.tcsetattr(fd, termios.TCSADRAIN, old)
+
+def input_pending():
+    """True when a key is waiting to be read. Animations give way to it."""
+    if key_source is not None:
+        pending = getattr(key_source, "pending", None)
+        return bool(pending and pending())
+    return bool(select.select([sys.stdin], [], [], 0)[0])
+
+_recording = None  # (file, start) while the session's keys are being logged
+
+def start_recording(path):
+    """Log every key get_key() hands out to path as JSON lines {"t": seconds since start, "key": key}.
+    replay.py plays such a file back. The file holds this session only: appended sessions would
+    restart at t=0 and replay as one broken timeline. It contains everything typed, passcode included."""
+    global _recording
+    _recording = (open(path, "w"), time.monotonic())
+
+def _record(key):
+    f, start = _recording
+    f.write(json.dumps({"t": round(time.monotonic() - start, 4), "key": key}) + "\n")
+    f.flush()
+
+def get_key():
+    """Block until a key arrives. Timers (toasts, blinking, ...) and readers keep running meanwhile.
+    A key that wakes the panel from sleep is swallowed."""
+    while True:
+        if _power["timer"] is None and _power["state"] == "on":
+            _arm_idle()
+        run_timers()
+        deadline = next_deadline()
+        timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+        key = read_key(timeout)
+        if key is not None:
+            if wake():
+                continue
+            _arm_idle()
+            if _recording is not None:
+                _record(key)
+            return key
+
+# ---------------- FRAMES ----------------
+_frame = {"disp": None, "image": None, "encoded": None, "seq": 0, "overlay": False}  # last screen presented, without overlays
+_renderer = None  # RenderProcess when rendering runs in a worker process
+_transition = None  # callable(disp, image, encoded) -> bool that animates the next frame in, see anim
+
+def present(disp, image):
+    """Show a 240x280 screen image. Active overlays (status bar, toast) are composited on top."""
+    _frame["disp"] = disp
+    _frame["image"] = image
+    _frame["encoded"] = None
+    _frame["seq"] += 1
+    if _toast["msg"] and _toast["expires"] <= time.monotonic():
+        cancel(_toast["timer"])
+        _toast["msg"] = None
+    _frame["overlay"] = bool(_toast["msg"])
+    if _power["state"] == "asleep":
+        _power["stale"] = True  # sent by wake(), the panel keeps showing nothing until then
+        return
+    if _start_transition(disp, image, None):
+        return
+    image = _overlaid(image)
+    if _renderer is not None:
+        # Rotation and encoding happen in the worker, _on_rendered() sends the result
+        _renderer.submit(image, _frame["seq"])
+        return
+    # The driver encodes into its own transfer buffers; snapshot() keeps a copy only when
+    # a screen is left, so ordinary frames allocate no RGB565 bytes
+    disp.ShowImage(image.rotate(rotation))
+
+def snapshot():
+    """(image, encoded) of the frame on screen, for restore() later. encoded may be None."""
+    image, disp = _frame["image"], _frame["disp"]
+    if image is not None and _frame["encoded"] is None and hasattr(disp, "EncodeImage"):
+        _frame["encoded"] = disp.EncodeImage(_with_status(image).rotate(rotation))
+    return image, _frame["encoded"]
+
+def restore(disp, image, encoded):
+    """Put a snapshot() back on screen. One transfer, unless an overlay needs compositing,
+    none when it is the frame on screen already."""
+    if image is not None and image is _frame["image"] and not _power["stale"]:
+        expect_transition(None)
+        return
+    if encoded is None or _toast["msg"]:
+        present(disp, image)
+        return
+    _frame["disp"] = disp
+    _frame["image"] = image
+    _frame["encoded"] = encoded
+    _frame["seq"] += 1  # drop frames still in the render worker
+    _frame["overlay"] = False
+    if _power["state"] == "asleep":
+        _power["stale"] = True
+        return
+    if _start_transition(disp, image, encoded):
+        return
+    disp.ShowEncoded(encoded)
+    _send_status(disp)
+
+def repaint():
+    if _frame["image"] is not None:
+        present(_frame["disp"], _frame["image"])
+
+def current_image():
+    """The screen image last presented or restored, without overlays."""
+    return _frame["image"]
+
+def set_frame(disp, image):
+    """Make image the current frame without sending it, for animations that send it later."""
+    _frame["disp"] = disp
+    _frame["image"] = image
+    _frame["encoded"] = None
+    _frame["seq"] += 1
+    _frame["overlay"] = bool(_toast["msg"])
+
+def resend():
+    """Send the current frame again, from its encoding when there is one."""
+    if _frame["encoded"] is not None and not _toast["msg"] and _power["state"] != "asleep":
+        _frame["disp"].ShowEncoded(_frame["encoded"])
+        _send_status(_frame["disp"])
+    else:
+        repaint()
+
+def show(disp, image, box=None):
+    """Send an in-between image, e.g. an animation frame, without making it the current
+    frame. box limits the transfer to that part of the screen."""
+    if _power["state"] == "asleep":
+        return
+    flush()  # the render worker's frames must not land on top of this one
+    image = _overlaid(image)
+    if box is None or not hasattr(disp, "ShowImageRegion"):
+        disp.ShowImage(image.rotate(rotation))
+    else:
+        _send_region(disp, image, box)
+
+# ---------------- TRANSITIONS ----------------
+def expect_transition(start):
+    """Let start(disp, image, encoded) bring the next presented or restored frame on screen.
+    start returns False to have the frame sent as usual."""
+    global _transition
+    _transition = start
+
+def _start_transition(disp, image, encoded):
+    global _transition
+    start, _transition = _transition, None
+    if start is None or _toast["msg"]:
+        return False
+    return start(disp, image, encoded)
+
+# ---------------- RENDER PROCESS ----------------
+def start_renderer():
+    """Move rotation and RGB565 encoding of every frame into a worker process."""
+    global _renderer
+    from renderproc import RenderProcess
+    _renderer = RenderProcess(screen_width, screen_height, rotation, _on_rendered)
+    add_reader(_renderer.fileno(), _renderer.on_readable)
+
+def stop_renderer():
+    global _renderer
+    if _renderer is None:
+        return
+    flush()
+    remove_reader(_renderer.fileno())
+    _renderer.close()
+    _renderer = None
+
+def _on_rendered(encoded, seq):
+    if seq != _frame["seq"]:
+        return  # something newer was shown meanwhile
+    if not _frame["overlay"]:
+        _frame["encoded"] = bytes(encoded)
+    _frame["disp"].ShowEncoded(encoded)
+
+def flush():
+    """Wait until frames in the render worker reached the panel. Call before blocking work."""
+    while _renderer is not None and _renderer.busy:
+        select.select([_renderer.fileno()], [], [])
+        _renderer.on_readable()
+
+# ---------------- POWER ----------------
+_power = {"state": "on", "timer": None, "stale": False}  # state: on, dim, asleep
+_parked = []  # callbacks of frame producers that paused while the panel slept, run by wake()
+
+def _arm_idle():
+    """Restart the idle countdown, called for every key."""
+    cancel(_power["timer"])
+    _power["timer"] = call_later(DIM_AFTER, _dim) if DIM_AFTER > 0 else None
+
+def _dim():
+    _power["timer"] = None
+    disp = _frame["disp"]
+    if disp is None:
+        return
+    disp.bl_DutyCycle(DIM_BRIGHTNESS)
+    _power["state"] = "dim"
+    if SLEEP_AFTER > DIM_AFTER:
+        _power["timer"] = call_later(SLEEP_AFTER - DIM_AFTER, _sleep)
+
+def _sleep():
+    _power["timer"] = None
+    disp = _frame["disp"]
+    flush()
+    if SLEEP_MODE == "idle":
+        disp.IdleMode(True)
+    else:
+        disp.bl_DutyCycle(0)
+        disp.Sleep()  # frame memory is kept, waking needs no transfer unless the frame changed
+    _power["state"] = "asleep"
+    _power["stale"] = False
+
+def asleep():
+    return _power["state"] == "asleep"
+
+def on_wake(callback):
+    """Run callback at the next wake(). Timers that produce frames (caret blink, chat
+    updates) park here instead of rendering for a panel that is off."""
+    if callback not in _parked:
+        _parked.append(callback)
+
+def cancel_wake(callback):
+    if callback in _parked:
+        _parked.remove(callback)
+
+def wake():
+    """Leave dim or sleep state. Returns True if the panel was asleep.
+    Frames presented while asleep were only recorded; the last one goes out here in one transfer."""
+    state = _power["state"]
+    if state == "on":
+        return False
+    disp = _frame["disp"]
+    if state == "asleep":
+        # Still asleep while they run: what they present goes out once, with the restore below
+        parked = _parked[:]
+        del _parked[:]
+        for callback in parked:
+            callback()
+    _power["state"] = "on"
+    if state == "asleep":
+        if SLEEP_MODE == "idle":
+            disp.IdleMode(False)
+        else:
+            disp.Wake()
+        if _power["stale"]:
+            restore(disp, *snapshot())
+        _power["stale"] = False
+    disp.bl_DutyCycle(BRIGHTNESS)
+    return state == "asleep"
+
+def rotate_box(box):
+    """Where box (x0, y0, x1, y1) of a screen image lands after image.rotate(rotation)."""
+    x0, y0, x1, y1 = box
+    w, h = screen_width, screen_height
+    d = (h - w) // 2  # rotate() keeps the canvas size, so 90/270 shift by half the difference
+    if rotation == 90:
+        return (y0 - d, w + d - x1, y1 - d, w + d - x0)
+    if rotation == 180:
+        return (w - x1, h - y1, w - x0, h - y0)
+    if rotation == 270:
+        return (h - d - y1, x0 + d, h - d - y0, x1 + d)
+    return box
+
+def present_region(disp, box):
+    """Send only box of the current frame to the panel, e.g. after a caret blink."""
+    if _power["state"] == "asleep":
+        _power["stale"] = True
+        return
+    if _toast["msg"] or not hasattr(disp, "ShowImageRegion"):
+        repaint()  # overlays may cover box, keep it simple
+        return
+    image = _frame["image"]
+    if _status["paint"] is not None and _overlaps(box, _status["box"]):
+        image = _with_status(image)
+    _send_region(disp, image, box)
+
+def _send_region(disp, image, box):
+    piece = image.crop(box).rotate(rotation, expand=True)
+    x0, y0, x1, y1 = rotate_box(box)
+    # Clip to the panel, rotate() cuts the corners off a non-square screen
+    cx0, cy0 = max(x0, 0), max(y0, 0)
+    cx1, cy1 = min(x1, screen_width), min(y1, screen_height)
+    if cx0 >= cx1 or cy0 >= cy1:
+        return
+    piece = piece.crop((cx0 - x0, cy0 - y0, cx1 - x0, cy1 - y0))
+    disp.ShowImageRegion(piece, cx0, cy0)
+
+def _overlaps(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+def _overlaid(image):
+    """image with the status bar and toast drawn over it, a copy when there is any."""
+    overlaid = _with_status(image)
+    if _toast["msg"]:
+        if overlaid is image:
+            overlaid = image.copy()
+        draw_toast(ImageDraw.Draw(overlaid))
+    return overlaid
+
+# ---------------- STATUS BAR ----------------
+# A small box drawn over every frame. Unlike the toast it is part of the encodings
+# snapshot() keeps; a frame sent from one gets the box sent again right after, in case
+# the state changed since (the same pixels otherwise).
+_status = {"box": None, "paint": None}  # paint(draw, box) draws the current state
+
+def set_status_bar(box, paint):
+    """Keep paint(draw, box) drawn over the screen, None removes the bar."""
+    old = _status["box"]
+    _status["box"] = box
+    _status["paint"] = paint
+    if paint is not None:
+        update_status()
+    elif old is not None and _frame["image"] is not None:
+        present_region(_frame["disp"], old)
+
+def _with_status(image):
+    if _status["paint"] is None or image is None:
+        return image
+    image = image.copy()
+    _status["paint"](ImageDraw.Draw(image), _status["box"])
+    return image
+
+def _send_status(disp):
+    if _status["paint"] is not None and hasattr(disp, "ShowImageRegion"):
+        _send_region(disp, _overlaid(_frame["image"]), _status["box"])
+
+def update_status():
+    """The bar's state changed: send its box alone."""
+    disp = _frame["disp"]
+    if _status["paint"] is None or disp is None or _frame["image"] is None:
+        return
+    if _power["state"] == "asleep":
+        _power["stale"] = True
+        return
+    flush()  # a frame still in the render worker carries the old state
+    if not hasattr(disp, "ShowImageRegion"):
+        repaint()
+        return
+    _send_status(disp)
+
+# ---------------- TOAST ----------------
+_toast = {"msg": None, "font": None, "expires": 0, "timer": None}
+
+def draw_toast(draw):
+    msg, font = _toast["msg"], _toast["font"]
+    bbox = draw.textbbox((0, 0), msg, font=font)
+    w = bbox[2] - bbox[0]
+    h = bbox[3] - bbox[1]
+    x = (screen_width - w) // 2
+    y = (screen_height - h) // 2
+    draw.rectangle([min(x - 10, 10), y - 14, max(x + w + 10, screen_width - 10), y + h + 14],
+                   fill="BLACK", outline="WHITE", width=2)
+    draw.text((x, y - bbox[1]), msg, fill="WHITE", font=font)
+
+def toast(disp, msg, font, duration=1.5, redraw=True):
+    """Show msg over the current screen for duration seconds without blocking input.
+    Pass redraw=False when the caller presents a new frame right after anyway."""
+    cancel(_toast["timer"])
+    _toast["msg"] = msg
+    _toast["font"] = font
+    _toast["expires"] = time.monotonic() + duration
+    _toast["timer"] = call_later(duration, _expire_toast)
+    if _frame["image"] is None or _frame["disp"] is not disp:
+        _frame["disp"] = disp
+        _frame["image"] = blank_image()
+    if redraw:
+        repaint()
+
+def _expire_toast():
+    _toast["msg"] = None
+    _toast["timer"] = None
+    repaint()
+
+def toast_active():
+    return _toast["msg"] is not None
+
+def wait_toast():
+    """Block until the current toast expired. Only for exits where nothing else is drawn."""
+    flush()
+    while toast_active() and _toast["timer"]:
+        time.sleep(max(_toast["expires"] - time.monotonic(), 0))
+        run_timers()
+
+# ---------------- CARET ----------------
+class Caret:
+    """Blinking text cursor. Blinks from the event loop and repaints only its own rectangle."""
+
+    def __init__(self, period=0.5):
+        self.period = period
+        self.visible = True
+        self.timer = None
+        self.disp = None
+        self.image = None       # frame the caret was drawn into
+        self.box = None
+        self.fill = None
+        self.background = None  # pixels under the caret
+
+    def draw(self, disp, image, text_end, y, fill):
+        """Place the caret right after text ending at x=text_end on a text row starting at y.
+        Call while building the frame, before present()."""
+        x = min(int(text_end) + 2, screen_width - 14)
+        self.disp = disp
+        self.image = image
+        self.box = (x, y + 8, x + 2, y + 34)
+        self.fill = fill
+        self.background = image.crop(self.box)
+        if self.visible:
+            self._paint()
+        if self.timer is None:
+            self.timer = call_later(self.period, self._blink)
+
+    def _blink(self):
+        self.timer = None
+        if _frame["image"] is not self.image:
+            return  # screen moved on without a caret, stop blinking
+        if asleep():
+            on_wake(self._resume)
+            return
+        self.visible = not self.visible
+        if self.visible:
+            self._paint()
+        else:
+            self.image.paste(self.background, self.box[:2])
+        _frame["encoded"] = None  # frame changed under the cached encoding
+        present_region(self.disp, self.box)
+        self.timer = call_later(self.period, self._blink)
+
+    def _resume(self):
+        if self.timer is None and self.image is not None and _frame["image"] is self.image:
+            self.timer = call_later(self.period, self._blink)
+
+    def _paint(self):
+        x0, y0, x1, y1 = self.box
+        ImageDraw.Draw(self.image).rectangle([x0, y0, x1 - 1, y1 - 1], fill=self.fill)
+
+    def stop(self):
+        cancel(self.timer)
+        cancel_wake(self._resume)
+        self.timer = None
+        self.image = None
+
+def blank_image():
+    return Image.new("RGB", (screen_width, screen_height), "BLACK")
@@ -0,0 +1,109 @@
+import os
+import json
+import base64
+import hashlib
+import logging
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # stores stay in plaintext without the cryptography package
+    Fernet = None
+
+# Contacts and chat logs are encrypted under one random data key. Only the data key is
+# encrypted with the passcode, so wiping this small file makes every store unreadable at
+# once; the stores themselves never have to be overwritten. Contacts.json is decrypted
+# whole when the contact store is loaded, chat logs a page at a time as they are shown.
+
+# ---------------- CONFIG ----------------
+VAULT_FILE = "vault.key"
+KDF_ROUNDS = 100000
+TOKEN_PREFIX = b"gAAAAA"  # every Fernet token starts like this, plaintext JSON never does
+
+_fernet = None  # data key of this session, set by unlock()
+
+# ---------------- KEY ----------------
+def available():
+    return Fernet is not None
+
+def _wrapping_key(passcode, salt):
+    key = hashlib.pbkdf2_hmac("sha256", passcode.encode(), salt, KDF_ROUNDS)
+    return Fernet(base64.urlsafe_b64encode(key))
+
+def unlock(passcode):
+    """Unwrap the data key with the login passcode, creating one on first use. The key
+    stays in memory for the session. Returns False when encryption cannot be used."""
+    global _fernet
+    if not available() or passcode is None:
+        return False
+    stored = _read_file()
+    if stored:
+        try:
+            wrapping = _wrapping_key(passcode, base64.b64decode(stored["salt"]))
+            data_key = wrapping.decrypt(stored["key"].encode())
+        except (InvalidToken, ValueError, KeyError):
+            logging.warning("Vault key could not be unwrapped")
+            return False
+    else:
+        salt = os.urandom(16)
+        data_key = Fernet.generate_key()
+        token = _wrapping_key(passcode, salt).encrypt(data_key).decode()
+        _write_file({"salt": base64.b64encode(salt).decode(), "key": token})
+    _fernet = Fernet(data_key)
+    return True
+
+def is_unlocked():
+    return _fernet is not None
+
+def lock():
+    global _fernet
+    _fernet = None
+
+# ---------------- STORAGE ----------------
+def _read_file():
+    if not os.path.exists(VAULT_FILE):
+        return None
+    with open(VAULT_FILE, "r") as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            return None
+
+def _write_file(stored):
+    tmp = VAULT_FILE + ".tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump(stored, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, VAULT_FILE)
+
+# ---------------- DATA ----------------
+def encrypt(data):
+    """Token for data (bytes). Only while unlocked."""
+    return _fernet.encrypt(data)
+
+def decrypt(token):
+    """data of an encrypt() token. Raises ValueError when it cannot be decrypted."""
+    if _fernet is None:
+        raise ValueError("vault is locked")
+    try:
+        return _fernet.decrypt(token)
+    except InvalidToken:
+        raise ValueError("not encrypted with this vault's key")
+
+def is_token(data):
+    return data.lstrip()[:len(TOKEN_PREFIX)] == TOKEN_PREFIX
+
+# ---------------- ERASE ----------------
+def destroy():
+    """Crypto-erase: forget the data key and overwrite its wrapped copy. Everything
+    encrypted under it is unreadable from here on, however large."""
+    lock()
+    if not os.path.exists(VAULT_FILE):
+        return
+    size = os.path.getsize(VAULT_FILE)
+    with open(VAULT_FILE, "r+b") as f:
+        f.write(os.urandom(size))
+        f.flush()
+        os.fsync(f.fileno())
+    os.remove(VAULT_FILE)
@@ -0,0 +1,142 @@
+import os
+import json
+import zlib
+import struct
+import logging
+from PIL import Image
+
+import ui
+import nav
+import vault
+
+# After a crash or a service restart the pager comes back where it was: right after login
+# the last frame goes out in one transfer and the open screens re-enter themselves from
+# their saved state, drawing nothing (see nav.resume()). The snapshot is written after
+# every screen change: the stack of screens that can be resumed, their state, and the
+# frame of the topmost one. Written atomically, encrypted while the vault is unlocked.
+
+# ---------------- CONFIG ----------------
+WARM_FILE = os.environ.get("PAGER_WARM_FILE", "warm.snapshot")
+SETTLE = 0.3  # seconds after a screen change before the snapshot is written
+FORMAT = 1
+MAGIC = b"PWRM"
+HEADER = struct.Struct("<4sHIII")  # magic, format, lengths of the JSON, image and encoding
+
+_watch = {"paths": (), "timer": None}
+
+# ---------------- RECORDING ----------------
+def start(paths=()):
+    """Write a snapshot after every screen change from now on. A snapshot is only resumed
+    while the files in paths (the data its screens show) are unchanged."""
+    _watch["paths"] = tuple(paths)
+    nav.subscribe(_schedule)
+
+def stop():
+    nav.unsubscribe(_schedule)
+    ui.cancel(_watch["timer"])
+    _watch["timer"] = None
+
+def _schedule():
+    # Debounced: a burst of screen changes is written once, after the new screen drew
+    ui.cancel(_watch["timer"])
+    _watch["timer"] = ui.call_later(SETTLE, save)
+
+def _stamp(paths):
+    stamps = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stamps.append([path, st.st_mtime_ns, st.st_size])
+        except OSError:
+            stamps.append([path, None, None])
+    return stamps
+
+def _resumable():
+    """([(name, state)], image, encoded) for the longest bottom part of the stack whose
+    screens can be resumed and whose top has its frame; None when there is none."""
+    entries = []
+    frames = []
+    for depth, screen in enumerate(nav.stack):
+        if screen.resume is None:
+            break
+        entries.append((screen.name, screen.resume))
+        if depth == len(nav.stack) - 1:
+            frames.append(ui.snapshot())
+        elif screen.valid:
+            frames.append((screen.image, screen.encoded))
+        else:
+            frames.append((None, None))  # redraws when it is back on top
+    while frames and frames[-1][0] is None:
+        entries.pop()
+        frames.pop()
+    if not entries:
+        return None
+    return entries, frames[-1][0], frames[-1][1]
+
+def save():
+    """Write the snapshot now."""
+    _watch["timer"] = None
+    snapshot = _resumable()
+    if snapshot is None:
+        discard()  # the old one would resume somewhere else
+        return
+    entries, image, encoded = snapshot
+    head = json.dumps({"stack": entries, "size": image.size, "depends": _stamp(_watch["paths"])}).encode()
+    pixels = zlib.compress(image.tobytes(), 1)  # mostly black, a few KB
+    encoded = zlib.compress(encoded, 1) if encoded is not None else b""
+    data = HEADER.pack(MAGIC, FORMAT, len(head), len(pixels), len(encoded)) + head + pixels + encoded
+    if vault.is_unlocked():
+        data = vault.encrypt(data)
+    tmp = WARM_FILE + ".tmp"
+    try:
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, WARM_FILE)
+    except OSError as e:
+        logging.warning("Warm-start snapshot not written: %s", e)
+
+def discard():
+    """Forget the snapshot, the next start is a cold one (shutdown, Destroy ID)."""
+    ui.cancel(_watch["timer"])
+    _watch["timer"] = None
+    try:
+        os.remove(WARM_FILE)
+    except FileNotFoundError:
+        pass
+
+# ---------------- RESUMING ----------------
+def _read():
+    with open(WARM_FILE, "rb") as f:
+        data = f.read()
+    if vault.is_token(data):
+        data = vault.decrypt(data)  # ValueError when locked or under another key
+    magic, version, head_len, pixels_len, encoded_len = HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT:
+        raise ValueError("not a snapshot of this version")
+    pos = HEADER.size
+    head = json.loads(data[pos:pos + head_len])
+    pos += head_len
+    image = Image.frombytes("RGB", tuple(head["size"]), zlib.decompress(data[pos:pos + pixels_len]))
+    pos += pixels_len
+    encoded = zlib.decompress(data[pos:pos + encoded_len]) if encoded_len else None
+    return head, image, encoded
+
+def load(disp):
+    """Show the snapshot's frame and have its screens resume. Call after login; returns
+    False (cold start) when there is no usable snapshot."""
+    if not os.path.exists(WARM_FILE):
+        return False
+    try:
+        head, image, encoded = _read()
+    except (OSError, ValueError, KeyError, struct.error, zlib.error) as e:
+        logging.warning("Warm-start snapshot ignored: %s", e)
+        discard()
+        return False
+    depends = head["depends"]
+    if _stamp(path for path, _, _ in depends) != depends:
+        discard()  # the screens would show data that changed meanwhile
+        return False
+    nav.resume([tuple(entry) for entry in head["stack"]], image, encoded)
+    ui.restore(disp, image, encoded)
+    return True
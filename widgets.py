@@ -0,0 +1,323 @@
+from PIL import Image, ImageDraw
+
+import ui
+import anim
+from textlayout import text_size, text_width, centered_x
+
+# A screen is a View holding widgets with fixed boxes. Changing a widget only marks it
+# dirty; View.update() repaints the dirty widgets into a copy of the last frame and sends
+# just their boxes. Only a frame that is not ours any more (another screen, first draw)
+# is drawn and sent whole.
+
+# ---------------- WIDGETS ----------------
+class Widget:
+    """Something drawn inside box = (x0, y0, x1, y1), x1/y1 exclusive: a rectangle
+    [10, 90, 230, 130] as the screens drew it is the box (10, 90, 231, 131)."""
+
+    def __init__(self, box):
+        self.box = box
+        self.dirty = True
+        self.visible = True
+
+    def invalidate(self):
+        self.dirty = True
+
+    def show(self, visible=True):
+        if visible != self.visible:
+            self.visible = visible
+            self.dirty = True
+
+    def _set(self, **values):
+        """Assign attributes, marking the widget dirty only if one really changed."""
+        for name, value in values.items():
+            if getattr(self, name) != value:
+                setattr(self, name, value)
+                self.dirty = True
+
+    def paint(self, view, image, draw):
+        pass
+
+    def frame_replaced(self, old, new):
+        """The view's frame was copied to new for a partial update; widgets holding on to
+        the frame image (carets) follow it."""
+        pass
+
+class Label(Widget):
+    def __init__(self, box, text, font, fill="WHITE", align="left"):
+        super().__init__(box)
+        self.text = text
+        self.font = font
+        self.fill = fill
+        self.align = align
+
+    def set(self, text, fill=None):
+        self._set(text=text, fill=fill or self.fill)
+
+    def paint(self, view, image, draw):
+        x0, y0, x1, _ = self.box
+        x = x0 + centered_x(self.font, self.text, x1 - x0) if self.align == "center" else x0
+        draw.text((x, y0), self.text, fill=self.fill, font=self.font)
+
+class Button(Widget):
+    """Outlined, filled while focused."""
+
+    def __init__(self, box, text, font, align="left"):
+        super().__init__(box)
+        self.text = text
+        self.font = font
+        self.align = align
+        self.focused = False
+
+    def set(self, text):
+        self._set(text=text)
+
+    def focus(self, focused=True):
+        self._set(focused=focused)
+
+    def paint(self, view, image, draw):
+        x0, y0, x1, y1 = self.box
+        if self.focused:
+            draw.rectangle([x0, y0, x1 - 1, y1 - 1], fill="WHITE")
+        else:
+            draw.rectangle([x0, y0, x1 - 1, y1 - 1], outline="WHITE")
+        x = x0 + (x1 - x0 - text_size(self.font, self.text)[0]) // 2 if self.align == "center" else x0 + 6
+        draw.text((x, y0 + 6), self.text, fill="BLACK" if self.focused else "WHITE", font=self.font)
+
+class TextField(Widget):
+    """Input box; filled and with a blinking caret while active. mask replaces every
+    character on screen (passwords)."""
+
+    def __init__(self, box, font, text="", mask=None):
+        super().__init__(box)
+        self.font = font
+        self.text = text
+        self.mask = mask
+        self.active = True
+        self.caret = ui.Caret()
+
+    def set(self, text):
+        self._set(text=text)
+
+    def activate(self, active=True):
+        self._set(active=active)
+
+    def show(self, visible=True):
+        super().show(visible)
+        if not visible:
+            self.caret.stop()
+
+    def shown(self):
+        return self.mask * len(self.text) if self.mask else self.text
+
+    def paint(self, view, image, draw):
+        x0, y0, x1, y1 = self.box
+        fill = "BLACK" if self.active else "WHITE"
+        if self.active:
+            draw.rectangle([x0, y0, x1 - 1, y1 - 1], fill="WHITE")
+        else:
+            draw.rectangle([x0, y0, x1 - 1, y1 - 1], outline="WHITE")
+        shown = self.shown()
+        draw.text((x0 + 4, y0 + 6), shown, fill=fill, font=self.font)
+        if self.active and self.visible:
+            self.caret.draw(view.disp, image, x0 + 4 + text_width(self.font, shown), y0, fill)
+        else:
+            self.caret.stop()
+
+    def frame_replaced(self, old, new):
+        if self.caret.image is old:
+            self.caret.image = new
+
+    def stop(self):
+        self.caret.stop()
+
+class Checkbox(Widget):
+    def __init__(self, box, text, font, checked=False):
+        super().__init__(box)
+        self.text = text
+        self.font = font
+        self.checked = checked
+
+    def toggle(self):
+        self.checked = not self.checked
+        self.dirty = True
+
+    def paint(self, view, image, draw):
+        x0, y0, _, y1 = self.box
+        size = y1 - y0 - 1
+        draw.rectangle([x0, y0, x0 + size, y0 + size], outline="WHITE")
+        if self.checked:
+            draw.line([x0 + 2, y0 + 4, x0 + size - 2, y0 + size - 4], fill="WHITE", width=2)
+            draw.line([x0 + 2, y0 + size - 4, x0 + size - 2, y0 + 4], fill="WHITE", width=2)
+        draw.text((x0 + size + 10, y0 + 6), self.text, fill="WHITE", font=self.font)
+
+class ListView(Widget):
+    """rows items of a list at a time, the selected one highlighted with a ">" marker.
+    label(i) gives item i, so a list of any size is never copied. With arrows the box
+    also holds scroll hints above and below the rows."""
+
+    def __init__(self, box, font, rows=4, row_height=40, top=None, arrows=False):
+        super().__init__(box)
+        self.font = font
+        self.rows = rows
+        self.row_height = row_height
+        self.top = box[1] if top is None else top  # y of the first row
+        self.arrows = arrows
+        self.label = None
+        self.count = 0
+        self.selected = 0
+        self.scroll = 0
+        self.moved_from = None  # (selected, scroll) before up()/down(), for the slide
+
+    def set_items(self, label, count, selected=0, scroll=0):
+        self.label = label
+        self.count = count
+        self.selected = selected
+        self.scroll = scroll
+        self.moved_from = None
+        self.dirty = True
+
+    def select(self, selected, scroll=None):
+        """Jump to selected, scrolling only as far as needed to show it."""
+        selected = max(min(selected, self.count - 1), 0)
+        if scroll is None:
+            scroll = min(max(self.scroll, selected - self.rows + 1), selected)
+        self._set(selected=selected, scroll=scroll)
+        self.moved_from = None
+
+    def up(self):
+        self._move(self.selected - 1)
+
+    def down(self):
+        self._move(self.selected + 1)
+
+    def _move(self, selected):
+        if not 0 <= selected < self.count:
+            return
+        if self.moved_from is None:
+            self.moved_from = (self.selected, self.scroll)
+        self.selected = selected
+        if selected < self.scroll:
+            self.scroll = selected
+        elif selected >= self.scroll + self.rows:
+            self.scroll = selected - self.rows + 1
+        self.dirty = True
+
+    def paint(self, view, image, draw):
+        self.paint_rows(draw, self.selected, self.scroll)
+
+    def paint_rows(self, draw, selected, scroll):
+        x0, _, x1, _ = self.box
+        for i in range(self.rows):
+            idx = scroll + i
+            if idx >= self.count:
+                break
+            y = self.top + i * self.row_height
+            if idx == selected:
+                draw.rectangle([x0, y, x1 - 1, y + self.row_height], fill="WHITE")
+                draw.text((x0 + 4, y + 6), self.label(idx), fill="BLACK", font=self.font)
+                draw.text((x1 - 20, y + 6), ">", fill="BLACK", font=self.font)
+            else:
+                draw.text((x0 + 4, y + 6), self.label(idx), fill="WHITE", font=self.font)
+        if self.arrows:
+            self._paint_arrows(draw, scroll)
+
+    def _paint_arrows(self, draw, scroll):
+        size = 10
+        center = (self.box[0] + self.box[2]) // 2
+        if scroll > 0:
+            y = self.box[1] + size
+            draw.polygon([(center, y - size), (center - size, y), (center + size, y)], fill="WHITE")
+        if scroll + self.rows < self.count:
+            y = self.box[3] - 1 - size
+            draw.polygon([(center, y + size), (center - size, y), (center + size, y)], fill="WHITE")
+
+# ---------------- VIEW ----------------
+class View:
+    """The retained widget tree of one screen."""
+
+    def __init__(self, disp, *widgets, size=(240, 280)):
+        self.disp = disp
+        self.size = size
+        self.widgets = list(widgets)
+        self.image = None  # last frame this view presented
+
+    def add(self, widget):
+        self.widgets.append(widget)
+        return widget
+
+    def invalidate(self):
+        """Draw everything again on the next update(), e.g. after another screen was shown."""
+        self.image = None
+
+    def adopt(self):
+        """The panel shows this view as it is (restored from a cached frame): nothing to draw."""
+        self.image = ui.current_image()
+        for widget in self.widgets:
+            widget.dirty = False
+
+    def _compose(self, base, widgets):
+        image = base.copy() if base is not None else Image.new("RGB", self.size, "BLACK")
+        draw = ImageDraw.Draw(image)
+        if base is not None:
+            # All boxes first: a widget hidden in a box another one now shows must not erase it
+            for widget in widgets:
+                draw.rectangle(_inclusive(widget.box), fill="BLACK")
+        for widget in widgets:
+            if widget.visible:
+                widget.paint(self, image, draw)
+            widget.dirty = False
+        return image
+
+    def update(self):
+        """Bring the screen up to date. Sends only the boxes of dirty widgets while the
+        panel still shows this view's last frame, nothing when nothing changed."""
+        ours = self.image is not None and ui.current_image() is self.image
+        dirty = [w for w in self.widgets if w.dirty] if ours else self.widgets
+        if not dirty:
+            return
+        moved = [w for w in dirty if isinstance(w, ListView) and w.moved_from is not None]
+        if ours and len(dirty) == 1 and moved:
+            self._slide(moved[0])
+            return
+        for widget in moved:
+            widget.moved_from = None
+        if ours:
+            # A widget inside a box that is cleared goes with it (a message over an empty list)
+            dirty += [w for w in self.widgets if not w.dirty and w.visible
+                      and any(_overlaps(w.box, d.box) for d in dirty)]
+        if not ours:
+            self.image = self._compose(None, self.widgets)
+            ui.present(self.disp, self.image)
+            return
+        old, self.image = self.image, self._compose(self.image, dirty)
+        for widget in self.widgets:
+            widget.frame_replaced(old, self.image)
+        ui.set_frame(self.disp, self.image)
+        for widget in dirty:
+            ui.present_region(self.disp, widget.box)
+
+    def _slide(self, listview):
+        """Let anim slide the selection bar and scroll the rows of listview."""
+        base = self.image
+        previous, listview.moved_from = listview.moved_from, None
+
+        def render(selected, scroll):
+            image = base.copy()
+            draw = ImageDraw.Draw(image)
+            draw.rectangle(_inclusive(listview.box), fill="BLACK")
+            listview.paint_rows(draw, selected, scroll)
+            return image
+
+        listview.dirty = False
+        anim.list_move(self.disp, render, previous, (listview.selected, listview.scroll),
+                       listview.top, listview.row_height, listview.rows, listview.box[2])
+        old, self.image = self.image, ui.current_image()
+        for widget in self.widgets:
+            widget.frame_replaced(old, self.image)
+
+def _overlaps(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+def _inclusive(box):
+    x0, y0, x1, y1 = box
+    return [x0, y0, x1 - 1, y1 - 1]